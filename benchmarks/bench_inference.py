@@ -0,0 +1,79 @@
+"""
+网络推理基准：逐车 FeedForwardNetwork.activate（旧） vs BatchNetwork 批量推理（新）。
+
+    python -m benchmarks.bench_inference [--pop 200] [--mutations 0 5 20] [--frames 200]
+
+基因组由固定种子的 NEAT 初始种群生成，再各自随机变异若干次（出现隐藏节点、网络形状各不相同）；
+输入是随机的雷达读数（与 CarBatch.get_data 同样取整）。两条路径的输出必须在浮点误差内一致。
+"""
+import argparse
+import random
+import time
+
+import neat
+import numpy as np
+
+from src.batch_net import BatchNetwork
+
+
+def make_nets(config_path: str, pop_size: int, mutations: int, seed: int):
+    random.seed(seed)
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+    config.pop_size = pop_size
+    population = neat.Population(config)
+    nets = []
+    for _, g in population.population.items():
+        for _ in range(mutations):
+            g.mutate(config.genome_config)
+        nets.append(neat.nn.FeedForwardNetwork.create(g, config))
+    return nets
+
+
+def bench(nets, frames: int, max_input: int, seed: int, tol: float) -> bool:
+    rng = np.random.default_rng(seed)
+    n_in = len(nets[0].input_nodes)
+    inputs = rng.integers(0, max_input + 1, size=(frames, len(nets), n_in))
+
+    t0 = time.perf_counter()
+    compiled = BatchNetwork(nets)
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    old = [[net.activate(row) for net, row in zip(nets, frame)] for frame in inputs.tolist()]
+    t_old = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    new = [compiled.activate_batch(frame) for frame in inputs]
+    t_new = time.perf_counter() - t0
+
+    max_diff = float(np.max(np.abs(np.asarray(old) - np.asarray(new))))
+    ok = max_diff <= tol
+    print(f"groups {len(compiled.groups):4d} + fallback {len(compiled.fallback):3d} | "
+          f"compile {build * 1e3:6.1f} ms | per-car {t_old / frames * 1e3:7.2f} ms/frame | "
+          f"batch {t_new / frames * 1e3:6.2f} ms/frame | x{t_old / t_new:5.1f} | "
+          f"max diff {max_diff:.1e} {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pop", type=int, default=200)
+    parser.add_argument("--mutations", type=int, nargs="*", default=[0, 5, 20], help="每个基因组随机变异的次数")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--max-input", type=int, default=10, help="雷达输入上限（RADAR_MAX_LEN / 归一化分母）")
+    parser.add_argument("--config", default="./config_modified.txt")
+    parser.add_argument("--tol", type=float, default=1e-9)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ok = True
+    for m in args.mutations:
+        print(f"mutations {m:3d} | ", end="")
+        ok &= bench(make_nets(args.config, args.pop, m, args.seed), args.frames, args.max_input, args.seed, args.tol)
+    if not ok:
+        raise SystemExit("batched outputs differ from FeedForwardNetwork.activate")
+
+
+if __name__ == "__main__":
+    main()
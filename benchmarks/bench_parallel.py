@@ -0,0 +1,87 @@
+"""
+并行评估扩展性基准：同一批基因组分别用 1..N 个 worker 评估。
+
+    python -m benchmarks.bench_parallel [--workers 1 2 4 8] [--pop 120] [--seconds 30] [--fitness progress --laps 2]
+
+基因组由固定种子的 NEAT 初始种群生成；每个 worker 数下的 fitness 必须与单进程完全一致。
+startup 为建进程池（主进程编译地图、拷进共享内存）+ 第一次评估（worker 挂上共享数据）的时间。
+"""
+import argparse
+import os
+import random
+import time
+
+import neat
+
+from src.parallel_eval import ParallelEvaluator
+from src.settings import SimSettings
+
+
+def make_genomes(config_path: str, pop_size: int, seed: int):
+    random.seed(seed)
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+    config.pop_size = pop_size
+    population = neat.Population(config)
+    return config, list(population.population.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="*", default=None, help="默认 1, 2, 4 ... 直到 CPU 核数")
+    parser.add_argument("--pop", type=int, default=120)
+    parser.add_argument("--seconds", type=float, default=30, help="每代最多仿真多少秒（游戏时间）")
+    parser.add_argument("--map", default=os.path.join("maps", "K1_Real.png"))
+    parser.add_argument("--start", type=int, nargs=2, default=None, help="默认按地图的 MAP_PROFILES")
+    parser.add_argument("--angle", type=int, default=None)
+    parser.add_argument("--radar-max-len", type=int, default=None)
+    parser.add_argument("--norm", type=int, default=None, help="雷达输入归一化分母")
+    parser.add_argument("--fitness", default="speed", choices=("speed", "progress"))
+    parser.add_argument("--laps", type=int, default=0, help="跑完这么多圈就停车（0 = 不按圈数结束）")
+    parser.add_argument("--config", default="./config_modified.txt")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workers = args.workers
+    if not workers:
+        workers, w = [], 1
+        while w <= os.cpu_count():
+            workers.append(w)
+            w *= 2
+
+    # 其余参数同 env_settings，起点 / 朝向 / 雷达长度 / 归一化默认按地图，命令行给了就覆盖
+    overrides = dict(start_position=args.start and tuple(args.start), starting_angle=args.angle,
+                     radar_max_len=args.radar_max_len, input_normalization_denominator=args.norm)
+    settings = SimSettings.from_env(map=args.map).replace(**{k: v for k, v in overrides.items() if v is not None})
+    track_kwargs = settings.track_kwargs()
+    car_kwargs = settings.car_kwargs()
+    sim_kwargs = dict(normalization_denominator=settings.input_normalization_denominator,
+                      speed_norm=settings.speed_norm, max_frames=int(settings.fps * args.seconds),
+                      fitness=args.fitness, target_laps=args.laps)
+
+    reference = None
+    base_time = None
+    for n in workers:
+        config, genomes = make_genomes(args.config, args.pop, args.seed)
+        t0 = time.perf_counter()
+        with ParallelEvaluator(n, config, track_kwargs, car_kwargs, sim_kwargs) as evaluator:
+            evaluator.evaluate(genomes[:n], config)  # 预热：worker 启动 + 挂上共享的赛道数据
+            startup = time.perf_counter() - t0
+            shared_mb = evaluator.shared_track.nbytes / 2 ** 20
+            t0 = time.perf_counter()
+            evaluator.evaluate(genomes, config)
+            elapsed = time.perf_counter() - t0
+
+        fitness = [g.fitness for _, g in genomes]
+        if reference is None:
+            reference, base_time = fitness, elapsed
+        same = fitness == reference
+        print(f"workers {n:3d} | startup {startup:5.2f} s, shared {shared_mb:.0f} MB | "
+              f"{elapsed:7.2f} s | {args.pop / elapsed:7.1f} genomes/s | "
+              f"speedup x{base_time / elapsed:5.2f} | {'deterministic' if same else 'FITNESS MISMATCH'}")
+        if not same:
+            raise SystemExit("fitness depends on worker count")
+
+
+if __name__ == "__main__":
+    main()
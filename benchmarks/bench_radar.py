@@ -0,0 +1,90 @@
+"""
+雷达基准：逐像素射线步进（旧） vs 距离场跳步（新）。
+
+    python -m benchmarks.bench_radar [--samples 2000] [--maps maps/K1_Real.png ...]
+
+在每张地图的可行驶区域里用固定种子随机撒车（位置 + 朝向），
+两条路径的读数必须一致（允许 ±1 px），并打印每束雷达的平均耗时。
+"""
+import argparse
+import glob
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from env_settings import CAR_IMAGE
+from src.my_env import Car, Track
+from src.settings import SimSettings
+
+
+def random_cars(track: Track, settings: SimSettings, n: int, radar_max_len: int, seed: int):
+    """在非墙像素上随机放车（中心点），朝向随机。"""
+    rng = random.Random(seed)
+    w, h = track.wall_mask.shape
+    size_x, size_y = settings.car_size_x, settings.car_size_y
+    cars = []
+    while len(cars) < n:
+        cx = rng.randrange(size_x, w - size_x)
+        cy = rng.randrange(size_y, h - size_y)
+        if track.wall_mask[cx, cy]:
+            continue
+        car_kwargs = dict(settings.car_kwargs(), start_position=[cx - size_x / 2, cy - size_y / 2],
+                          radar_max_len=radar_max_len, start_facing_angle=rng.uniform(0, 360))
+        car = Car(index=len(cars), car_img=CAR_IMAGE, **car_kwargs)
+        car.center = [cx, cy]
+        cars.append(car)
+    return cars
+
+
+def time_radar(method, cars):
+    t0 = time.perf_counter()
+    readings = []
+    for car in cars:
+        car.clear_radars()
+        for d in car.radar_angles:
+            method(d, car)
+        readings.append(car.radar_dists[:car.radar_count])
+    return time.perf_counter() - t0, readings
+
+
+def bench_map(path: str, samples: int, radar_max_len: int, seed: int) -> bool:
+    w, h = pygame.image.load(path).get_size()
+    t0 = time.perf_counter()
+    settings = SimSettings.from_env(map=path, width=w, height=h, track_cache_dir=None)
+    track = settings.make_track()
+    build = time.perf_counter() - t0
+
+    cars = random_cars(track, settings, samples, radar_max_len, seed)
+    t_old, old = time_radar(track.check_radar_pixelwise, cars)
+    t_new, new = time_radar(track.check_radar, cars)
+
+    beams = samples * len(cars[0].radar_angles)
+    max_diff = max(abs(a - b) for ro, rn in zip(old, new) for a, b in zip(ro, rn))
+    ok = max_diff <= 1
+    print(f"{os.path.basename(path):14s} build {build * 1e3:7.1f} ms | "
+          f"pixelwise {t_old / beams * 1e6:8.1f} us/beam | "
+          f"distance field {t_new / beams * 1e6:7.1f} us/beam | "
+          f"x{t_old / t_new:5.1f} | max diff {max_diff} px {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--maps", nargs="*", default=sorted(glob.glob(os.path.join("maps", "*.png"))))
+    parser.add_argument("--samples", type=int, default=1000, help="每张地图随机撒多少辆车")
+    parser.add_argument("--radar-max-len", type=int, default=800)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pygame.init()
+    ok = all([bench_map(p, args.samples, args.radar_max_len, args.seed) for p in args.maps])
+    if not ok:
+        raise SystemExit("radar readings differ between pixelwise and distance-field paths")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+模拟器热点基准套件（无头，可复现）：
+
+    python -m benchmarks.bench_suite                     # 全部地图 x 种群 30..1000，与基线的校验值比较
+    python -m benchmarks.bench_suite --quick             # 少量种群 / 帧数，快速自检
+    python -m benchmarks.bench_suite --tolerance 0.3     # 另外检查耗时：比基线慢 30% 以上算回归
+    python -m benchmarks.bench_suite --save-baseline     # 把本次结果写成基线
+
+测的东西：
+  每张地图  check_radar / check_collision / update_car_kinematics（单车）/ update_batch_kinematics（批量），
+            以及整代吞吐（run_headless，种群由 topN_genomes.pkl + winner.pkl 循环填满）
+  与地图无关  Car.__init__（冷 / 热缓存）、rotate_center（精确旋转 / 角度缓存）
+
+所有随机摆车、随机指令都用固定种子；每项除了耗时还有一个结果校验值（雷达读数和、存活数、fitness 和 ...）。
+起点 / 朝向 / 雷达长度 / 输入归一化按 MAP_PROFILES（与训练相同），其余参数取 env_settings。
+与基线（默认 benchmarks/baseline.json，仓库里带一份）比较时，校验值不同算回归；
+给了 --tolerance 时耗时超过基线 (1 + tolerance) 倍也算回归（耗时和机器有关，换机器后先 --save-baseline 一次）。
+有回归或没有基线时以非零状态退出。校验值取决于 --seed / --samples / --kin-frames，基线里记着这几个参数。
+"""
+import argparse
+import copy
+import glob
+import json
+import os
+import pickle
+import platform
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import neat
+import numpy as np
+import pygame
+
+from env_settings import (
+    CAR_IMAGE,
+    CAR_SIZE_X,
+    CAR_SIZE_Y
+)
+from src import assets
+from src.my_env import Car, CarBatch, Track
+from src.settings import SimSettings
+from src.simulation import build_population, run_headless
+
+
+# 这几个参数决定校验值，和基线不一致时校验值没法比
+CHECK_ARGS = ("seed", "samples", "kin_frames")
+
+
+def best_of(repeat: int, func):
+    """跑 repeat 次取最短耗时；返回 (秒, 最后一次的结果)。"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def map_settings(path: str) -> SimSettings:
+    """按地图的 MAP_PROFILES 取参数；不读写磁盘缓存，每次都计入真正的地图编译。"""
+    w, h = pygame.image.load(path).get_size()
+    return SimSettings.from_env(map=path, width=w, height=h, track_cache_dir=None)
+
+
+def car_kwargs(settings: SimSettings, start_position, angle):
+    return dict(settings.car_kwargs(), start_position=list(start_position), start_facing_angle=angle)
+
+
+def random_poses(track: Track, n: int, seed: int):
+    """在离墙至少半个车身的像素上随机放车，返回 [(中心x, 中心y, 朝向)]。"""
+    rng = random.Random(seed)
+    w, h = track.wall_mask.shape
+    margin = CAR_SIZE_X // 2 + 1
+    poses = []
+    while len(poses) < n:
+        cx = rng.randrange(CAR_SIZE_X, w - 2 * CAR_SIZE_X)
+        cy = rng.randrange(CAR_SIZE_Y, h - 2 * CAR_SIZE_Y)
+        if track.wall_dist[cx, cy] >= margin:
+            poses.append((cx, cy, rng.uniform(0, 360)))
+    return poses
+
+
+def make_cars(settings: SimSettings, poses):
+    cars = []
+    for i, (cx, cy, angle) in enumerate(poses):
+        car = Car(index=i, car_img=CAR_IMAGE,
+                  **car_kwargs(settings, [cx - CAR_SIZE_X / 2, cy - CAR_SIZE_Y / 2], angle))
+        car.center = [cx, cy]
+        cars.append(car)
+    return cars
+
+
+def make_batch(settings: SimSettings, poses):
+    batch = CarBatch(len(poses), **car_kwargs(settings, [0, 0], 0))
+    for i, (cx, cy, angle) in enumerate(poses):
+        batch.x[i] = cx - CAR_SIZE_X / 2
+        batch.y[i] = cy - CAR_SIZE_Y / 2
+        batch.angle[i] = angle
+    batch.center_x[:] = batch.x + CAR_SIZE_X / 2
+    batch.center_y[:] = batch.y + CAR_SIZE_Y / 2
+    return batch
+
+
+def load_genomes(config, args):
+    """种群来源：保存的 topN + winner；文件都不在时用固定种子的 NEAT 初始种群。"""
+    pool = []
+    for path in (args.topn, args.winner):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                loaded = pickle.load(f)
+            pool.extend(loaded if isinstance(loaded, list) else [loaded])
+    if not pool:
+        random.seed(args.seed)
+        config.pop_size = max(args.pops)
+        pool = list(neat.Population(config).population.values())
+    return pool
+
+
+# ===================== 各项基准 =====================
+
+def bench_map(path: str, config, pool, args, results: dict):
+    name = os.path.basename(path)
+    settings = map_settings(path)
+    t0 = time.perf_counter()
+    track = settings.make_track()
+    print(f"{name}: track build {(time.perf_counter() - t0) * 1e3:.0f} ms")
+    poses = random_poses(track, args.samples, args.seed)
+
+    # 雷达
+    cars = make_cars(settings, poses)
+
+    def radar():
+        total = 0
+        for car in cars:
+            car.clear_radars()
+            for d in car.radar_angles:
+                track.check_radar(d, car)
+            total += sum(car.radar_dists[:car.radar_count])
+        return total
+    seconds, check = best_of(args.repeat, radar)
+    record(results, f"{name}/radar", seconds / (len(cars) * len(cars[0].radar_angles)), "us/beam", check)
+
+    # 碰撞（先用单车动力学算出四角，再只计时 check_collision）
+    cars = make_cars(settings, poses)
+    for car in cars:
+        track.update_car_kinematics(car, 0.0, 0.0)
+
+    def collision():
+        # 单次只有几 us，多转几圈让计时稳定
+        for _ in range(20):
+            for car in cars:
+                track.check_collision(car)
+        return sum(not car.alive for car in cars)
+    seconds, check = best_of(args.repeat, collision)
+    record(results, f"{name}/collision", seconds / (20 * len(cars)), "us/car", check)
+
+    # 单车 / 批量动力学：同样的起点、同样的随机指令
+    rng = np.random.default_rng(args.seed)
+    commands = rng.uniform(-1.0, 1.0, size=(args.kin_frames, len(poses), 2))
+
+    def scalar_kinematics():
+        cars = make_cars(settings, poses)
+        steps = 0
+        for frame in commands.tolist():
+            for car, (steer, accel) in zip(cars, frame):
+                if car.alive:
+                    track.update_car_kinematics(car, steer, accel)
+                    steps += 1
+        return steps, round(sum(car.distance for car in cars), 6)
+    seconds, (steps, check) = best_of(args.repeat, scalar_kinematics)
+    record(results, f"{name}/kinematics", seconds / max(steps, 1), "us/car-step", check)
+
+    def batch_kinematics():
+        batch = make_batch(settings, poses)
+        steps = 0
+        for frame in commands:
+            steps += int(batch.alive.sum())
+            track.update_batch_kinematics(batch, frame[:, 0], frame[:, 1])
+        return steps, round(float(batch.distance.sum()), 6)
+    seconds, (steps, check) = best_of(args.repeat, batch_kinematics)
+    record(results, f"{name}/batch_kinematics", seconds / max(steps, 1), "us/car-step", check)
+
+    # 整代吞吐（从地图的起点出发；帧数影响校验值，所以记在名字里）
+    for n in args.pops:
+        def generation():
+            genomes = [(i, copy.deepcopy(pool[i % len(pool)])) for i in range(n)]
+            nets, batch, _ = build_population(genomes, config, settings.car_kwargs())
+            run_headless(track, batch, nets, genomes, settings.input_normalization_denominator,
+                         settings.speed_norm, max_frames=args.frames)
+            return int(batch.time.sum()), round(sum(g.fitness for _, g in genomes), 6)
+        seconds, (steps, check) = best_of(args.repeat, generation)
+        record(results, f"{name}/generation/pop{n}/{args.frames}f", seconds / max(steps, 1), "us/car-step", check,
+               extra=f"{steps / seconds:10.0f} car-steps/s")
+
+
+def bench_global(args, results: dict):
+    pygame.display.set_mode((1, 1))  # convert_alpha 需要显示模式（dummy 驱动下不会开窗口）
+    n = args.samples
+    kwargs = car_kwargs(SimSettings.from_env(), [0, 0], 0)
+
+    def car_init():
+        return sum(Car(index=i, car_img=CAR_IMAGE, **kwargs).sprite.get_width() for i in range(n))
+
+    def car_init_cold():
+        assets._base_images.clear()
+        assets._tinted_sprites.clear()
+        assets._labels.clear()
+        return car_init()
+    seconds, check = best_of(args.repeat, car_init_cold)
+    record(results, "car_init/cold", seconds / n, "us/car", check)
+    seconds, check = best_of(args.repeat, car_init)
+    record(results, "car_init/warm", seconds / n, "us/car", check)
+
+    sprites = [assets.get_car_sprite(CAR_IMAGE, (CAR_SIZE_X, CAR_SIZE_Y), (i * 7 % 256, 80, 160)) for i in range(10)]
+    angles = np.random.default_rng(args.seed).uniform(0, 360, size=args.samples).tolist()
+    for label, step in (("exact", 0), ("cached", 1.0)):
+        cache = assets.RotatedSpriteCache(step)
+        cache.get(sprites[0], 0.0)
+
+        def rotate():
+            return sum(cache.get(sprites[i % len(sprites)], a).get_width() for i, a in enumerate(angles))
+        rotate()  # 预热缓存
+        seconds, check = best_of(args.repeat, rotate)
+        record(results, f"rotate_center/{label}", seconds / len(angles), "us/call", check)
+
+
+def record(results: dict, key: str, seconds_per_unit: float, unit: str, check, extra: str = ""):
+    value = seconds_per_unit * 1e6
+    results[key] = dict(value=round(value, 4), unit=unit, check=check)
+    print(f"  {key:40s} {value:10.3f} {unit:12s} check {check} {extra}")
+
+
+# ===================== 与基线比较 =====================
+
+def compare(results: dict, baseline: dict, tolerance: float = None) -> list[str]:
+    """校验值不同算回归；tolerance 不为 None 时耗时超过基线 (1 + tolerance) 倍也算。"""
+    failures = []
+    for key, r in results.items():
+        b = baseline.get(key)
+        if b is None:
+            continue
+        if r["check"] != b["check"]:
+            failures.append(f"{key}: result changed {b['check']} -> {r['check']}")
+        if tolerance is not None and r["value"] > b["value"] * (1 + tolerance):
+            failures.append(f"{key}: {b['value']:.3f} -> {r['value']:.3f} {r['unit']} "
+                            f"(+{(r['value'] / b['value'] - 1) * 100:.0f}%)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--maps", nargs="*", default=sorted(glob.glob(os.path.join("maps", "*.png"))))
+    parser.add_argument("--pops", type=int, nargs="*", default=[30, 100, 300, 1000])
+    parser.add_argument("--frames", type=int, default=600, help="整代基准每代最多仿真的帧数")
+    parser.add_argument("--samples", type=int, default=500, help="雷达 / 碰撞 / 动力学 / Car.__init__ 用的车数")
+    parser.add_argument("--kin-frames", type=int, default=60, help="动力学基准的帧数")
+    parser.add_argument("--repeat", type=int, default=3, help="每项跑几次取最快")
+    parser.add_argument("--quick", action="store_true", help="种群 30 / 100、300 帧、各跑 2 次")
+    parser.add_argument("--config", default="./config_modified.txt")
+    parser.add_argument("--topn", default="topN_genomes.pkl")
+    parser.add_argument("--winner", default="winner.pkl")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=os.path.join("benchmarks", "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="比基线慢多少（比例）算回归，如 0.3；默认只比较校验值")
+    parser.add_argument("--output", default=None, help="把本次结果另存为 JSON")
+    args = parser.parse_args()
+    if args.quick:
+        args.pops, args.frames, args.repeat = [30, 100], 300, 2
+
+    pygame.init()
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation, args.config)
+    pool = load_genomes(config, args)
+
+    results = {}
+    bench_global(args, results)
+    for path in args.maps:
+        bench_map(path, config, pool, args, results)
+
+    meta = dict(python=platform.python_version(), machine=platform.machine(), processor=platform.processor(),
+                numpy=np.__version__, pygame=pygame.version.ver, time=time.strftime("%Y-%m-%d %H:%M:%S"),
+                args={k: v for k, v in vars(args).items() if k not in ("save_baseline", "output")})
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(dict(meta=meta, results=results), f, indent=1, ensure_ascii=False)
+
+    stored = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+    same_checks = stored is not None and all(stored["meta"]["args"].get(k) == getattr(args, k) for k in CHECK_ARGS)
+
+    if args.save_baseline:
+        # 只覆盖本次测到的项，其它地图 / 种群的基线保留（校验参数变了就整份重写）
+        baseline = stored["results"] if same_checks else {}
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(dict(meta=meta, results=baseline), f, indent=1, ensure_ascii=False)
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    if stored is None:
+        raise SystemExit(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+    if not same_checks:
+        recorded = ", ".join(f"--{k.replace('_', '-')} {stored['meta']['args'].get(k)}" for k in CHECK_ARGS)
+        raise SystemExit(f"{args.baseline} was recorded with {recorded}; rerun with the same values")
+    baseline = stored["results"]
+    failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print("REGRESSIONS:")
+        for line in failures:
+            print("  " + line)
+        raise SystemExit(f"{len(failures)} benchmark regression(s) against {args.baseline}")
+    within = "match" if args.tolerance is None else f"within {args.tolerance:.0%} of"
+    print(f"all {sum(k in baseline for k in results)} benchmarks {within} {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
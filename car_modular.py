@@ -1,5 +1,7 @@
-import math
+import argparse
+import random
 import sys
+import time
 
 import neat
 import pygame
@@ -9,135 +11,332 @@ from env_settings import (
     CAR_IMAGE,
     FPS,
     MAX_SIM_SECONDS,
-    WHEELBASE_PX,
-    MAX_STEER_DEG,
-    V_MIN, 
-    V_MAX,
     SPEED_NORM,
-    V_TURN_FLOOR,
-    TURN_EXP,
-    LIMIT_SMOOTH_ALPHA,
     TEXT_COLOR,
-    START_POSITION,
-    STARTING_ANGLE,
     WIDTH, 
     HEIGHT,
-    CAR_SIZE_X, 
-    CAR_SIZE_Y,
-    BORDER_COLOR,
-    RADAR_MAX_LEN,
     INPUT_NORMALIZATION_DENOMINATOR,
     PLOT_RADAR,
-    TOP_N_GENO
+    DIRTY_RENDERING,
+    ASYNC_RENDER,
+    RENDER_QUEUE_SIZE,
+    TOP_N_GENO,
+    HEADLESS,
+    RENDER_EVERY_N_GENERATIONS,
+    RENDER_EVERY_N_FRAMES,
+    MAX_GENERATION_CPU_SECONDS,
+    NUM_WORKERS,
+    SEED,
+    STALL_WINDOW_SECONDS,
+    STALL_RADIUS_PX,
+    PROFILE,
+    PROFILE_OUTPUT,
+    FITNESS,
+    TARGET_LAPS,
+    NUM_SECTORS,
+    NUM_GENERATIONS,
+    CHECKPOINT_DIR,
+    CHECKPOINT_EVERY_N_GENERATIONS,
+    CHECKPOINT_EVERY_SECONDS,
+    CHECKPOINT_KEEP,
+    EXTRA_MAPS,
+    MAP_GATE_LAPS,
+    FITNESS_CACHE_SIZE,
+    FITNESS_CACHE_PATH
 )
 
-from src.my_env import (
-    Car,
-    Track
+from src.my_env import Track
+from src.settings import SimSettings
+from src.simulation import (
+    StallMonitor,
+    make_lap_tracker,
+    build_population,
+    step_population,
+    run_headless,
+    generation_summary,
+    format_summary
 )
+from src.parallel_eval import (
+    ParallelEvaluator,
+    MultiMapEvaluator
+)
+from src.renderer import DirtyRenderer
+from src.viewer import (
+    SnapshotQueue,
+    SimulationThread,
+    make_snapshot,
+    apply_snapshot
+)
+from src.profiling import (
+    make_profiler,
+    format_profile
+)
+from src.fitness_cache import (
+    FitnessCache,
+    settings_fingerprint
+)
+from src.checkpoint import (
+    TrainingCheckpointer,
+    latest_checkpoint,
+    restore_checkpoint
+)
+
+
+# 仿真参数（env_settings 的当前值，见 src/settings.py）
+SETTINGS = SimSettings.from_env()
+TRACK_KWARGS = SETTINGS.track_kwargs()
+# 所有车共用的构造参数
+CAR_KWARGS = SETTINGS.car_kwargs()
+
+# 停滞检测参数（run_headless / 并行评估共用）
+STALL_KWARGS = dict(
+    stall_window_frames=int(FPS * STALL_WINDOW_SECONDS),
+    stall_radius_px=STALL_RADIUS_PX
+)
+
+# 奖励方式与按圈结束（run_headless / 并行评估共用，见 make_lap_tracker）
+LAP_KWARGS = dict(
+    fitness=FITNESS,
+    target_laps=TARGET_LAPS,
+    n_sectors=NUM_SECTORS
+)
+
+
+
+def map_stage(map_path: str) -> dict:
+    """一张地图的评估参数（起点 / 朝向 / 雷达按 MAP_PROFILES），多地图评估用。"""
+    return SETTINGS.for_map(map_path).stage()
 
 
 # ===================== 仿真主循环（NEAT 回调） =====================
 current_generation = 0
+# 入口处创建：EXTRA_MAPS 非空时为 MultiMapEvaluator，否则 NUM_WORKERS > 1 时为 ParallelEvaluator
+evaluator = None
+multi_map = bool(EXTRA_MAPS)
+fitness_cache = None  # 入口处创建的 FitnessCache（FITNESS_CACHE_SIZE > 0 且不限 CPU 时间时）
+profiler = make_profiler(PROFILE, PROFILE_OUTPUT)  # 并行评估的代在 worker 里跑，不计时
 
-def run_simulation(genomes, config):
-    nets = []
-    cars = []
+def draw_preview(renderer, track, cars, fonts, still_alive, elapsed_seconds, best_laps=None):
+    generation_font, alive_font = fonts
+    renderer.begin()
+    for car in cars:
+        if car.is_alive():
+            renderer.draw_car(track, car, PLOT_RADAR)
 
-    pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT)) # , pygame.FULLSCREEN)
-
-    track = Track(
-        map=MAP,
-        map_width=WIDTH,
-        map_height=HEIGHT,
-        v_turn_floor=V_TURN_FLOOR,
-        turn_exp=TURN_EXP,
-        limit_smooth_alpha=LIMIT_SMOOTH_ALPHA,
-        border_color=BORDER_COLOR
-    )
+    renderer.text("generation", f"Generation: {current_generation}", generation_font, TEXT_COLOR,
+                  center=(900, 420))
+    renderer.text("alive", f"Still Alive: {still_alive}", alive_font, TEXT_COLOR, center=(900, 470))
+    renderer.text("time", f"Time: {elapsed_seconds:.1f} s", alive_font, TEXT_COLOR, center=(900, 500))
+    if best_laps is not None:
+        renderer.text("best", f"Best: {best_laps:.2f} laps", alive_font, TEXT_COLOR, center=(900, 530))
+    renderer.update()
 
-    for idx, (gid, g) in enumerate(genomes):
-        net = neat.nn.FeedForwardNetwork.create(g, config)
-        nets.append(net)
-        g.fitness = 0.0
-
-        car = Car(
-            index=gid, # gid 是完全对应某一辆车 跨代不变的标识
-            car_img=CAR_IMAGE,
-            car_size_x=CAR_SIZE_X,
-            car_size_y=CAR_SIZE_Y,
-            wheelbase_px=WHEELBASE_PX,
-            max_steer_deg=MAX_STEER_DEG,
-            start_position=START_POSITION,
-            radar_max_len=RADAR_MAX_LEN,
-            v_min=V_MIN,
-            v_max=V_MAX,
-            start_facing_angle=STARTING_ANGLE
-        )
-        cars.append(car)
 
+def run_async_preview(track, batch, nets, genomes, cars, renderer, fonts, max_frames, laps=None) -> dict:
+    """
+    预览代的异步版本（ASYNC_RENDER）：仿真线程不限速地跑 run_headless（和无头代同一条路径、结果相同），
+    每 RENDER_EVERY_N_FRAMES 帧发一个快照；主线程按 FPS 画最新的快照，画不过来就跳帧。
+    """
+    queue = SnapshotQueue(RENDER_QUEUE_SIZE)
+    index = [car.index for car in cars]
+
+    def publish(counter, still_alive, laps):
+        if counter % RENDER_EVERY_N_FRAMES or not queue.wants_frames:
+            return
+        queue.publish(make_snapshot(counter * track.dt, batch.x, batch.y, batch.angle, batch.alive, index,
+                                    still_alive=still_alive,
+                                    best_laps=None if laps is None else float(laps.best.max())))
+
+    sim = SimulationThread(
+        queue, run_headless,
+        track, batch, nets, genomes,
+        INPUT_NORMALIZATION_DENOMINATOR, SPEED_NORM,
+        max_frames=max_frames,
+        max_cpu_seconds=MAX_GENERATION_CPU_SECONDS,
+        profiler=profiler,
+        on_frame=publish,
+        laps=laps,
+        **STALL_KWARGS,
+        **LAP_KWARGS
+    )
+    sim.start()
     clock = pygame.time.Clock()
-    generation_font = pygame.font.SysFont("Arial", 30)
-    alive_font = pygame.font.SysFont("Arial", 20)
+    while not queue.done:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                # 关掉窗口只是不看了：不再出快照，这一代照常跑完（和无头代一样计入训练）
+                queue.stop()
+                pygame.display.quit()
+                break
+            if event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+        snapshot = queue.latest(timeout=1.0 / FPS)
+        if snapshot is None:
+            continue
+        apply_snapshot(cars, snapshot)
+        hud = snapshot["hud"]
+        draw_preview(renderer, track, cars, fonts, hud["still_alive"], snapshot["frame"] / FPS, hud["best_laps"])
+        clock.tick(FPS)
+    summary = sim.result()
+    print(f"Generation {current_generation} preview: shown {queue.shown}/{queue.published} frames")
+    return summary
+
+
+def report_maps(n_genomes: int):
+    """多地图评估：过关数 + 其余每张图一行统计。"""
+    print(f"  {evaluator.last_passed}/{n_genomes} genomes reached {MAP_GATE_LAPS} laps on {MAP}")
+    for path, summary in zip(EXTRA_MAPS, evaluator.last_summaries[1:]):
+        print(f"  {path}: {'skipped' if summary is None else format_summary(summary)}")
+
+
+def cache_settings() -> dict:
+    """影响 fitness 的全部参数（地图按内容另算），用作 fitness 缓存的参数指纹。"""
+    stages = []
+    for path in [MAP, *EXTRA_MAPS]:
+        stage = map_stage(path)
+        track_kwargs = {k: v for k, v in stage["track_kwargs"].items() if k not in ("map", "cache_dir")}
+        stages.append((track_kwargs, stage["car_kwargs"], stage["sim_kwargs"]))
+    return dict(
+        stages=stages,
+        gate_laps=MAP_GATE_LAPS if multi_map else None
+    )
 
+
+def run_simulation(genomes, config):
     global current_generation
     current_generation += 1
 
+    # 无头模式下只有每 RENDER_EVERY_N_GENERATIONS 代开窗口预览一次
+    render = (not HEADLESS) or (
+        RENDER_EVERY_N_GENERATIONS > 0 and current_generation % RENDER_EVERY_N_GENERATIONS == 0
+    )
+
+    # 缓存里有的基因组（上一代原样留下来的精英等）直接取 fitness；预览代照常全部跑一遍（画面里要看到它们）
+    todo = genomes
+    if fitness_cache is not None and not render:
+        todo = fitness_cache.apply(genomes)
+        if len(todo) < len(genomes):
+            print(f"Generation {current_generation}: {len(genomes) - len(todo)}/{len(genomes)} genomes cached")
+    if todo:
+        evaluate_generation(todo, config, render)
+    if fitness_cache is not None:
+        fitness_cache.update(todo)
+
+
+def evaluate_generation(genomes, config, render: bool):
+    profiler.start_generation()
+    if not render and evaluator is not None:
+        evaluator.evaluate(genomes, config)
+        print(f"Generation {current_generation}: {format_summary(evaluator.last_summary)}")
+        if multi_map:
+            report_maps(len(genomes))
+        return
+
+    pygame.init()
+    if render:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT)) # , pygame.FULLSCREEN)
+
+    track = Track(headless=not render, **TRACK_KWARGS)
+
+    nets, batch, cars = build_population(genomes, config, CAR_KWARGS, car_img=CAR_IMAGE, render=render)
+    max_frames = FPS * MAX_SIM_SECONDS
+
+    if not render:
+        summary = run_headless(
+            track, batch, nets, genomes,
+            INPUT_NORMALIZATION_DENOMINATOR, SPEED_NORM,
+            max_frames=max_frames,
+            max_cpu_seconds=MAX_GENERATION_CPU_SECONDS,
+            profiler=profiler,
+            **STALL_KWARGS,
+            **LAP_KWARGS
+        )
+        print(f"Generation {current_generation}: {format_summary(summary)}")
+        if profiler.enabled:
+            print(f"Generation {current_generation} profile: "
+                  f"{format_profile(profiler.end_generation(current_generation, 'headless'))}")
+        return
+
+    fonts = (pygame.font.SysFont("Arial", 30), pygame.font.SysFont("Arial", 20))
+    renderer = DirtyRenderer(screen, track.map_surface, dirty=DIRTY_RENDERING)
+
+    # 多地图评估时预览的是第一张图，之后其余地图按这一局的进度筛选、无头评估
+    laps = make_lap_tracker(track, batch, max_frames=max_frames, track_progress=multi_map, **LAP_KWARGS)
+
+    if ASYNC_RENDER:
+        summary = run_async_preview(track, batch, nets, genomes, cars, renderer, fonts, max_frames, laps)
+        print(f"Generation {current_generation}: {format_summary(summary)}")
+        if multi_map:
+            evaluator.evaluate_rest(genomes, laps.best.tolist(), summary)
+            report_maps(len(genomes))
+        if profiler.enabled:
+            print(f"Generation {current_generation} profile: "
+                  f"{format_profile(profiler.end_generation(current_generation, 'async'))}")
+        if HEADLESS:
+            pygame.display.quit()
+        return
+
+    monitor = StallMonitor(batch, int(FPS * STALL_WINDOW_SECONDS), STALL_RADIUS_PX)
+    t0 = time.perf_counter()
+    clock = pygame.time.Clock()
+
     counter = 0
+    viewing = True
 
     while True:
-        for event in pygame.event.get():
+        for event in pygame.event.get() if viewing else ():
             if event.type == pygame.QUIT:
-                sys.exit(0)
+                # 和异步预览一样：关掉窗口只是不看了，这一代不再画、不限速地跑完并照常计入训练
+                viewing = False
+                pygame.display.quit()
+                break
+            if event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
 
-        still_alive = 0
-        # —— 行为与动力学 —— #
-        for i, car in enumerate(cars):
-            steer_cmd, accel_cmd = nets[i].activate(car.get_data(INPUT_NORMALIZATION_DENOMINATOR, SPEED_NORM))  # 输出2维：转向, 加速度
-            steer_cmd = max(-1.0, min(1.0, steer_cmd))
-            accel_cmd = max(-1.0, min(1.0, accel_cmd))
-
-            # —— 存活、更新、奖励 —— #
-            if car.is_alive():
-                still_alive += 1
-                track.update_car_kinematics(car, steer_cmd, accel_cmd)
-                genomes[i][1].fitness += track.get_reward(car)
+        # —— 行为与动力学 / 存活、更新、奖励 —— #
+        still_alive = step_population(track, batch, nets, genomes, INPUT_NORMALIZATION_DENOMINATOR, SPEED_NORM,
+                                      monitor, profiler, laps)
 
         if still_alive == 0:
             break
 
         counter += 1
-        if counter >= FPS * MAX_SIM_SECONDS:
+        if counter * track.dt >= max_frames:
             break
 
-        # —— 渲染 —— #
-        screen.blit(track.map_surface, (0, 0))
-        for car in cars:
-            if car.is_alive():
-                track.draw_car(screen, car=car, plot_radar=PLOT_RADAR)
-
-        text = generation_font.render(f"Generation: {current_generation}", True, TEXT_COLOR)
-        text_rect = text.get_rect()
-        text_rect.center = (900, 420)
-        screen.blit(text, text_rect)
-
-        text = alive_font.render(f"Still Alive: {still_alive}", True, TEXT_COLOR)
-        text_rect = text.get_rect()
-        text_rect.center = (900, 470)
-        screen.blit(text, text_rect)
-
-        elapsed_seconds = counter / FPS
-        text = alive_font.render(f"Time: {elapsed_seconds:.1f} s", True, TEXT_COLOR)
-        text_rect = text.get_rect()
-        text_rect.center = (900, 500)
-        screen.blit(text, text_rect)
-
-        pygame.display.flip()
+        # 预览时只每 N 帧画一次
+        if counter % RENDER_EVERY_N_FRAMES or not viewing:
+            continue
+
+        # —— 渲染（只重画车和变了的 HUD） —— #
+        t = profiler.tic()
+        batch.write_back(cars)
+        draw_preview(renderer, track, cars, fonts, still_alive, counter * track.dt / FPS,
+                     None if laps is None else laps.best.max())
+        t = profiler.toc("render", t)
         clock.tick(FPS)
+        profiler.toc("tick", t)
+
+    summary = generation_summary(batch, counter * track.dt, max_frames, time.perf_counter() - t0, laps)
+    print(f"Generation {current_generation}: {format_summary(summary)}")
+    if multi_map:
+        evaluator.evaluate_rest(genomes, laps.best.tolist(), summary)
+        report_maps(len(genomes))
+    if profiler.enabled:
+        print(f"Generation {current_generation} profile: "
+              f"{format_profile(profiler.end_generation(current_generation, 'render'))}")
+
+    # 无头训练中的预览代结束后关掉窗口，避免下一代无人处理事件导致窗口“未响应”
+    if HEADLESS:
+        pygame.display.quit()
 
 # ===================== 入口 =====================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NEAT 训练")
+    parser.add_argument("--resume", nargs="?", const="latest", default=None,
+                        help=f"从断点续训；不带路径时取 {CHECKPOINT_DIR} 里最新的一个")
+    args = parser.parse_args()
+
     # 载入 NEAT 配置（需把 num_outputs=2，对应 [steer, accel]）
     config_path = "./config_modified.txt"
     config = neat.config.Config(neat.DefaultGenome,
@@ -146,12 +345,60 @@ if __name__ == "__main__":
                                 neat.DefaultStagnation,
                                 config_path)
 
-    population = neat.Population(config)
+    if args.resume:
+        checkpoint_path = latest_checkpoint(CHECKPOINT_DIR) if args.resume == "latest" else args.resume
+        if checkpoint_path is None:
+            sys.exit(f"no checkpoint found in {CHECKPOINT_DIR}")
+        # 种群、统计和随机数状态都从断点恢复，SEED 不再起作用
+        population, stats = restore_checkpoint(checkpoint_path, config)
+        current_generation = population.generation
+        print(f"Resuming from {checkpoint_path} at generation {population.generation}")
+    else:
+        if SEED is not None:
+            random.seed(SEED)
+        population = neat.Population(config)
+        stats = neat.StatisticsReporter()
+        population.add_reporter(stats)
     population.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    population.add_reporter(stats)
 
-    winner = population.run(run_simulation, 1000)   # 返回当代里 fitness 最高的基因组
+    checkpointer = TrainingCheckpointer(
+        population, stats, CHECKPOINT_DIR,
+        every_n_generations=CHECKPOINT_EVERY_N_GENERATIONS,
+        every_seconds=CHECKPOINT_EVERY_SECONDS,
+        keep=CHECKPOINT_KEEP
+    )
+    population.add_reporter(checkpointer)
+
+    if FITNESS_CACHE_SIZE > 0 and not MAX_GENERATION_CPU_SECONDS:
+        # 限了 CPU 时间的代结果不可复现，不能缓存
+        fitness_cache = FitnessCache(settings_fingerprint([MAP, *EXTRA_MAPS], **cache_settings()),
+                                     capacity=FITNESS_CACHE_SIZE, path=FITNESS_CACHE_PATH)
+
+    # CPU 预算也交给 worker 里的 run_headless（并行时每个分片各自计时）
+    budget = dict(max_cpu_seconds=MAX_GENERATION_CPU_SECONDS)
+    if multi_map:
+        stages = [map_stage(path) for path in [MAP, *EXTRA_MAPS]]
+        for stage in stages:
+            stage["sim_kwargs"].update(budget)
+        evaluator = MultiMapEvaluator(NUM_WORKERS, config, stages, gate_laps=MAP_GATE_LAPS)
+    elif NUM_WORKERS > 1:
+        evaluator = ParallelEvaluator(
+            NUM_WORKERS, config, TRACK_KWARGS, CAR_KWARGS, sim_kwargs=dict(SETTINGS.sim_kwargs(), **budget)
+        )
+
+    try:
+        # 返回当代里 fitness 最高的基因组
+        winner = population.run(run_simulation, NUM_GENERATIONS - population.generation)
+    except (KeyboardInterrupt, SystemExit):
+        # Ctrl-C / 关窗口：当前这一代还没评估完，存下它开始时的状态，续训时重新评估
+        if evaluator is not None:
+            evaluator.terminate()
+            evaluator = None
+        print(f"Interrupted, saved {checkpointer.save()}; continue with: python car_modular.py --resume")
+        raise
+    finally:
+        if evaluator is not None:
+            evaluator.close()
 
     import pickle, copy
     # —— 保存全局最优 winner —— 
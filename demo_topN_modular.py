@@ -1,45 +1,50 @@
-import math
-import sys
 import pickle
 from typing import List
 
 import neat
+import numpy as np
 import pygame
 
 # ===================== 与训练保持一致的参数 =====================
 from env_settings import (
-    MAP,
     CAR_IMAGE,
     FPS,
     MAX_SIM_SECONDS,
-    WHEELBASE_PX,
-    MAX_STEER_DEG,
-    V_MIN, 
-    V_MAX,
     SPEED_NORM,
-    ACCEL_PER_STEP,
-    V_TURN_FLOOR,
-    TURN_EXP,
-    BRAKE_PER_STEP,
-    LIMIT_SMOOTH_ALPHA,
-    ALPHA_STEER,
     TEXT_COLOR,
-    START_POSITION,
-    STARTING_ANGLE,
     WIDTH, 
     HEIGHT,
-    CAR_SIZE_X, 
-    CAR_SIZE_Y,
-    BORDER_COLOR,
-    RADAR_MAX_LEN,
     INPUT_NORMALIZATION_DENOMINATOR,
     PLOT_RADAR,
+    PROFILE,
+    PROFILE_OUTPUT,
+    DEMO_TARGET_LAPS,
+    NUM_SECTORS,
+    TRAIL_CAPACITY,
+    DIRTY_RENDERING,
+    ASYNC_RENDER,
+    RENDER_QUEUE_SIZE
 )
 
-from src.my_env import (
-    Car,
-    Track
+from src.my_env import Car
+from src.progress import LapTracker
+from src.trails import TrailRecorder
+from src.renderer import DirtyRenderer
+from src.settings import SimSettings
+from src.viewer import (
+    SnapshotQueue,
+    SimulationThread,
+    FramePacer,
+    make_snapshot,
+    apply_snapshot
 )
+from src.profiling import (
+    make_profiler,
+    format_profile
+)
+
+# Track / Car 的构造参数和训练一样取自 SimSettings（见 src/settings.py）
+SETTINGS = SimSettings.from_env()
 
 
 # ============ 工具：从文件加载基因组 ============
@@ -70,118 +75,168 @@ def demo_topN(genomes: List[neat.genome.DefaultGenome], config):
     title_font = pygame.font.SysFont("Arial", 28)
 
     # 赛道与底图
-    track = Track(
-        map=MAP,
-        map_width=WIDTH,
-        map_height=HEIGHT,
-        v_turn_floor=V_TURN_FLOOR,
-        turn_exp=TURN_EXP,
-        limit_smooth_alpha=LIMIT_SMOOTH_ALPHA,
-        border_color=BORDER_COLOR
-    )
-
-    # 每辆车的网络、实例与轨迹层
-    nets  = []
-    cars  = []
-    trails = []  # 每辆车一个独立的 trail surface，避免颜色混杂
-    trail_colors = []  # 每辆车轨迹颜色（用车身色+不透明黑边效果也可，这里直接黑）
-
-    for g in genomes:
-        net = neat.nn.FeedForwardNetwork.create(g, config)
-        nets.append(net)
-
-        # 用 genome.key 作为稳定 index => 颜色 & 车身编号都稳定
-        car = Car(
-            index=g.key,
-            car_img=CAR_IMAGE,
-            car_size_x=CAR_SIZE_X,
-            car_size_y=CAR_SIZE_Y,
-            wheelbase_px=WHEELBASE_PX,
-            max_steer_deg=MAX_STEER_DEG,
-            start_position=START_POSITION,     # 注意：大家同点起步；如需错位，可在此处添加偏移
-            radar_max_len=RADAR_MAX_LEN,
-            v_min=V_MIN,
-            v_max=V_MAX,
-            start_facing_angle=STARTING_ANGLE
-        )
-        cars.append(car)
-
-        # 为每辆车建一层轨迹画布（透明）
-        t = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        trails.append(t)
-        trail_colors.append((*car.sprite.get_at((car.car_size_x//2, car.car_size_y//2))[:3], 255))
-
-    running = True
-    counter = 0
+    track = SETTINGS.make_track(headless=False)
 
-    while running:
-        # 事件处理
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_ESCAPE]:
-            running = False
+    # 用 genome.key 作为稳定 index => 颜色 & 车身编号都稳定
+    def make_car(index):
+        # 注意：大家同点起步；如需错位，可在此处覆盖 start_position
+        return Car(index=index, car_img=CAR_IMAGE, **SETTINGS.car_kwargs())
+
+    # 每辆车的网络与实例
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+    cars = [make_car(g.key) for g in genomes]
+    # 画在屏幕上的车：同步时就是仿真的车；异步时另建一份，按快照摆位姿
+    view_cars = [make_car(g.key) for g in genomes] if ASYNC_RENDER else cars
 
-        # == 所有车一步物理 ==
+    # 轨迹：所有车共用一张轨迹层，颜色用车身色
+    trails = TrailRecorder(len(cars), (WIDTH, HEIGHT), capacity=TRAIL_CAPACITY,
+                           colors=[car.color for car in cars])
+
+    # 圈数：DEMO_TARGET_LAPS > 0 时跑完这么多圈的车停在原地，不再推进
+    laps = LapTracker(track.progress_index(cars[0].center, cars[0].angle), len(cars), *cars[0].center,
+                      target_laps=DEMO_TARGET_LAPS, n_sectors=NUM_SECTORS)
+
+    # 底图 + 轨迹层，每帧只重画车和变了的 HUD
+    renderer = DirtyRenderer(screen, track.map_surface, overlays=[trails.layer], dirty=DIRTY_RENDERING)
+
+    counter = 0
+    still_alive = len(cars)
+    profiler = make_profiler(PROFILE, PROFILE_OUTPUT)
+
+    # == 所有车一步物理；返回 False 表示演示结束（全部退场 / 到时间） ==
+    def step() -> bool:
+        nonlocal counter, still_alive
         still_alive = 0
+        profiler.frame(sum(car.is_alive() for car in cars) if profiler.enabled else 0)
         for i, car in enumerate(cars):
-            if not car.is_alive():
+            if not car.is_alive() or laps.finished[i]:
                 continue
 
+            t = profiler.tic()
             steer_cmd, accel_cmd = nets[i].activate(car.get_data(INPUT_NORMALIZATION_DENOMINATOR, SPEED_NORM))
             steer_cmd = max(-1.0, min(1.0, steer_cmd))
             accel_cmd = max(-1.0, min(1.0, accel_cmd))
+            profiler.toc("inference", t)
 
             track.update_car_kinematics(
                 car,
                 steer_cmd,
-                accel_cmd
+                accel_cmd,
+                profiler
             )
             if car.is_alive():
                 still_alive += 1
 
-                # 记录轨迹并画到自己的轨迹层
-                if not hasattr(car, "trail"):
-                    car.trail = []
-                car.trail.append((int(car.center[0]), int(car.center[1])))
-                if len(car.trail) > 1:
-                    pygame.draw.line(trails[i], trail_colors[i], car.trail[-2], car.trail[-1], 2)
+        moved = np.array([i for i, car in enumerate(cars) if car.is_alive() and not laps.finished[i]], dtype=np.int64)
+        if len(moved):
+            _, finished = laps.update(moved, [c.center[0] for c in cars], [c.center[1] for c in cars],
+                                      [c.time for c in cars])
+            still_alive -= int(finished.sum())
 
         counter += 1
-        if still_alive == 0 or counter >= FPS * MAX_SIM_SECONDS:
-            running = False
+        return not (still_alive == 0 or counter * track.dt >= FPS * MAX_SIM_SECONDS)
+
+    def hud_values() -> dict:
+        return dict(still_alive=still_alive, finished=int(laps.finished.sum()), best_laps=float(laps.best.max()))
 
-        # == 渲染 ==
-        screen.blit(track.map_surface, (0, 0))
-        # 先把所有轨迹层贴上来
-        for t in trails:
-            screen.blit(t, (0, 0))
+    # 记录轨迹；停住的车不重复记（异步时跳过的快照也先摆一遍车、记进来，见 SnapshotQueue 的 keep_skipped）
+    def record_trails():
+        for i, car in enumerate(view_cars):
+            if car.is_alive():
+                trails.record(i, car.center[0], car.center[1])
+
+    # == 渲染（同步时画仿真的车，异步时画按快照摆好的 view_cars） ==
+    def draw(frame: float, hud: dict):
+        record_trails()
+
+        renderer.begin()
+        # 先画轨迹（只画这一帧新增的线段，轨迹层上这些地方重新贴一次）
+        renderer.restore(trails.update_layer())
 
         # 再画车（车会盖在轨迹上）
-        for car in cars:
+        for car in view_cars:
             if car.is_alive():
-                track.draw_car(screen, car=car, plot_radar=PLOT_RADAR)
+                renderer.draw_car(track, car, PLOT_RADAR)
 
         # HUD
-        elapsed_seconds = counter / FPS
-        title = title_font.render(f"Top-{len(genomes)} Demo", True, TEXT_COLOR)
-        screen.blit(title, title.get_rect(topright=(WIDTH-20, 20)))
+        elapsed_seconds = frame / FPS
+        renderer.text("title", f"Top-{len(genomes)} Demo", title_font, TEXT_COLOR, topright=(WIDTH-20, 20))
 
         hud_lines = [
             f"Time: {elapsed_seconds:.1f}s",
-            f"Alive: {still_alive}/{len(genomes)}",
+            f"Alive: {hud['still_alive']}/{len(genomes)}",
+            f"Finished: {hud['finished']}  best {hud['best_laps']:.2f} laps",
             "ESC to exit",
         ]
         y = 60
-        for line in hud_lines:
-            t = hud_font.render(line, True, TEXT_COLOR)
-            screen.blit(t, (WIDTH-20 - t.get_width(), y))
+        for k, line in enumerate(hud_lines):
+            renderer.text(k, line, hud_font, TEXT_COLOR, topright=(WIDTH-20, y))
             y += 24
 
-        pygame.display.flip()
-        clock.tick(FPS)
+        renderer.update()
+
+    def quit_requested() -> bool:
+        closed = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                closed = True
+            if event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+        return closed or pygame.key.get_pressed()[pygame.K_ESCAPE]
+
+    if ASYNC_RENDER:
+        # 仿真线程按 FPS 自己定速，主线程只画最新的快照，画不过来就跳帧
+        queue = SnapshotQueue(RENDER_QUEUE_SIZE, keep_skipped=True)
+        pacer = FramePacer(FPS)
+
+        def simulate():
+            while queue.wants_frames:
+                running = step()
+                queue.publish(make_snapshot(counter * track.dt,
+                                            [c.position[0] for c in cars], [c.position[1] for c in cars],
+                                            [c.angle for c in cars], [c.is_alive() for c in cars],
+                                            [c.index for c in cars], **hud_values()))
+                if not running:
+                    return
+                pacer.wait()
+
+        sim = SimulationThread(queue, simulate)
+        sim.start()
+        while not queue.done:
+            if quit_requested():
+                queue.stop()
+                break
+            snapshot = queue.latest(timeout=1.0 / FPS)
+            if snapshot is None:
+                continue
+            t = profiler.tic()
+            for skipped in snapshot["skipped"]:
+                apply_snapshot(view_cars, skipped)
+                record_trails()
+            apply_snapshot(view_cars, snapshot)
+            draw(snapshot["frame"], snapshot["hud"])
+            profiler.toc("render", t)
+            clock.tick(FPS)
+        sim.result()
+        print(f"Top-{len(genomes)} demo: shown {queue.shown}/{queue.published} frames")
+    else:
+        running = True
+        while running:
+            # 事件处理
+            if quit_requested():
+                running = False
+
+            if not step():
+                running = False
+
+            t = profiler.tic()
+            draw(counter * track.dt, hud_values())
+            t = profiler.toc("render", t)
+            clock.tick(FPS)
+            profiler.toc("tick", t)
 
+    if profiler.enabled:
+        print(f"Top-{len(genomes)} demo profile: {format_profile(profiler.end_generation(0, 'demo_topN'))}")
     pygame.quit()
 
 
@@ -1,43 +1,49 @@
-import math
 import pickle
 
 import neat
+import numpy as np
 import pygame
 
 # ===================== 与训练保持一致的参数 =====================
 from env_settings import (
-    MAP,
     CAR_IMAGE,
     FPS,
     MAX_SIM_SECONDS,
-    WHEELBASE_PX,
-    MAX_STEER_DEG,
-    V_MIN, 
-    V_MAX,
     SPEED_NORM,
-    ACCEL_PER_STEP,
-    V_TURN_FLOOR,
-    TURN_EXP,
-    BRAKE_PER_STEP,
-    LIMIT_SMOOTH_ALPHA,
-    ALPHA_STEER,
     TEXT_COLOR,
-    START_POSITION,
-    STARTING_ANGLE,
     WIDTH, 
     HEIGHT,
-    CAR_SIZE_X, 
-    CAR_SIZE_Y,
-    BORDER_COLOR,
-    RADAR_MAX_LEN,
     INPUT_NORMALIZATION_DENOMINATOR,
-    PLOT_RADAR
+    PLOT_RADAR,
+    PROFILE,
+    PROFILE_OUTPUT,
+    DEMO_TARGET_LAPS,
+    NUM_SECTORS,
+    TRAIL_CAPACITY,
+    DIRTY_RENDERING,
+    ASYNC_RENDER,
+    RENDER_QUEUE_SIZE
 )
 
-from src.my_env import (
-    Car,
-    Track
+from src.my_env import Car
+from src.progress import LapTracker
+from src.trails import TrailRecorder
+from src.renderer import DirtyRenderer
+from src.settings import SimSettings
+from src.viewer import (
+    SnapshotQueue,
+    SimulationThread,
+    FramePacer,
+    make_snapshot,
+    apply_snapshot
 )
+from src.profiling import (
+    make_profiler,
+    format_profile
+)
+
+# Track / Car 的构造参数和训练一样取自 SimSettings（见 src/settings.py）
+SETTINGS = SimSettings.from_env()
 
 
 # ===================== 单车演示 =====================
@@ -48,99 +54,160 @@ def demo_winner(winner_id, best_net, config):
     generation_font = pygame.font.SysFont("Arial", 30)
     info_font = pygame.font.SysFont("Arial", 20)
 
-    trail_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)  # 创建轨迹层（带透明通道）
-
-    car = Car(
-        index=winner_id,
-        car_img=CAR_IMAGE,
-        car_size_x=CAR_SIZE_X,
-        car_size_y=CAR_SIZE_Y,
-        wheelbase_px=WHEELBASE_PX,
-        max_steer_deg=MAX_STEER_DEG,
-        start_position=START_POSITION,
-        radar_max_len=RADAR_MAX_LEN,
-        v_min=V_MIN,
-        v_max=V_MAX,
-        start_facing_angle=STARTING_ANGLE
-    )
-
-    track = Track(
-        map=MAP,
-        map_width=WIDTH,
-        map_height=HEIGHT,
-        v_turn_floor=V_TURN_FLOOR,
-        turn_exp=TURN_EXP,
-        limit_smooth_alpha=LIMIT_SMOOTH_ALPHA,
-        border_color=BORDER_COLOR
-    )
-    counter = 0
+    trails = TrailRecorder(1, (WIDTH, HEIGHT), capacity=TRAIL_CAPACITY)  # 轨迹层（带透明通道）：加速白色、刹车红色
 
-    running = True
-    while running:
-        # 事件
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-        # 按 ESC 退出
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_ESCAPE]:
-            running = False
+    def make_car():
+        return Car(index=winner_id, car_img=CAR_IMAGE, **SETTINGS.car_kwargs())
 
-        # 网络输出
+    car = make_car()
+    # 画在屏幕上的车：同步时就是仿真的车；异步时另建一辆，按快照摆位姿
+    view_car = make_car() if ASYNC_RENDER else car
+
+    track = SETTINGS.make_track(headless=False)
+    # 圈数 / 分段计时；DEMO_TARGET_LAPS > 0 时跑完这么多圈演示结束
+    laps = LapTracker(track.progress_index(car.center, car.angle), 1, *car.center,
+                      target_laps=DEMO_TARGET_LAPS, n_sectors=NUM_SECTORS)
+    lap_goal = f" / {DEMO_TARGET_LAPS}" if DEMO_TARGET_LAPS > 0 else ""
+    car_idx = np.zeros(1, dtype=np.int64)
+    counter = 0
+    steer_cmd = accel_cmd = 0.0
+    profiler = make_profiler(PROFILE, PROFILE_OUTPUT)
+    # 底图 + 轨迹层，每帧只重画车和变了的 HUD
+    renderer = DirtyRenderer(screen, track.map_surface, overlays=[trails.layer], dirty=DIRTY_RENDERING)
+
+    # 网络输出 + 物理 & 碰撞；返回 False 表示演示结束（撞墙 / 跑完 / 到时间）
+    def step() -> bool:
+        nonlocal counter, steer_cmd, accel_cmd
+        profiler.frame(1)
+        t = profiler.tic()
         steer_cmd, accel_cmd = best_net.activate(car.get_data(INPUT_NORMALIZATION_DENOMINATOR, SPEED_NORM))
         steer_cmd = max(-1.0, min(1.0, steer_cmd))
         accel_cmd = max(-1.0, min(1.0, accel_cmd))
+        profiler.toc("inference", t)
 
-        # 物理 & 碰撞
         track.update_car_kinematics(
                 car,
                 steer_cmd,
-                accel_cmd
+                accel_cmd,
+                profiler
             )
-        if not car.is_alive():
+        running = car.is_alive()
+        _, finished = laps.update(car_idx, [car.center[0]], [car.center[1]], [car.time])
+        if finished[0]:
             running = False
 
         counter += 1
-        if counter >= FPS * MAX_SIM_SECONDS:
+        if counter * track.dt >= FPS * MAX_SIM_SECONDS:
             running = False
+        return running
 
-        # 绘制
-        if not hasattr(car, "trail"):
-            car.trail = []
-        car.trail.append((int(car.center[0]), int(car.center[1])))
-        if len(car.trail) > 1:
-            if accel_cmd >= 0.0:
-                pygame.draw.line(trail_surf, (255, 255, 255, 255), car.trail[-2], car.trail[-1], 2)
-            else:
-                pygame.draw.line(trail_surf, (255, 0, 0, 255), car.trail[-2], car.trail[-1], 2)
+    def hud_values() -> dict:
+        return dict(
+            speed=car.speed,
+            v_limit=car._vlimit_smooth,
+            steer_cmd=steer_cmd,
+            accel_cmd=accel_cmd,
+            laps_done=int(laps.laps_done[0]),
+            best_laps=float(laps.best[0]),
+            sectors=laps.sector_times(0)[-NUM_SECTORS:]
+        )
 
-        screen.blit(track.map_surface, (0, 0))
-        screen.blit(trail_surf, (0, 0))
+    # 轨迹：白色加速、红色刹车（异步时跳过的快照也先摆一遍车、记进来，见 SnapshotQueue 的 keep_skipped）
+    def record_trail(hud: dict):
+        trails.record(0, view_car.center[0], view_car.center[1],
+                      (255, 255, 255) if hud["accel_cmd"] >= 0.0 else (255, 0, 0))
 
-        track.draw_car(screen, car=car, plot_radar=PLOT_RADAR)
+    # 绘制（同步时画仿真的车，异步时画按快照摆好的 view_car）
+    def draw(frame: float, hud: dict):
+        record_trail(hud)
+
+        renderer.begin()
+        renderer.restore(trails.update_layer())
+
+        renderer.draw_car(track, view_car, PLOT_RADAR)
 
         # HUD
         # text = generation_font.render("Winner Demo", True, TEXT_COLOR)
         # r = text.get_rect(); r.center = (900, 420)
         # screen.blit(text, r)
 
-        elapsed_seconds = counter / FPS
+        elapsed_seconds = frame / FPS
         hud_lines = [
             f"Time: {elapsed_seconds:.1f} s",
-            f"Speed: {car.speed:.2f} px/frame",
-            f"V_limit: {car._vlimit_smooth:.2f}",
-            f"Steer cmd: {steer_cmd:.2f}",
+            f"Speed: {hud['speed']:.2f} px/frame",
+            f"V_limit: {hud['v_limit']:.2f}",
+            f"Steer cmd: {hud['steer_cmd']:.2f}",
+            f"Lap: {hud['laps_done']}{lap_goal}  ({hud['best_laps']:.2f})",
+            "Sectors: " + " ".join(f"{t / FPS:.1f}" for t in hud["sectors"]),
         ]
         y = 420
-        for line in hud_lines:
-            t = info_font.render(line, True, TEXT_COLOR)
-            rect = t.get_rect(); rect.center = (900, y)
-            screen.blit(t, rect)
+        for k, line in enumerate(hud_lines):
+            renderer.text(k, line, info_font, TEXT_COLOR, center=(900, y))
             y += 30
 
-        pygame.display.flip()
-        clock.tick(FPS)
+        renderer.update()
+
+    def quit_requested() -> bool:
+        closed = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                closed = True
+            if event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+        # 按 ESC 退出
+        return closed or pygame.key.get_pressed()[pygame.K_ESCAPE]
+
+    if ASYNC_RENDER:
+        # 仿真线程按 FPS 自己定速，主线程只画最新的快照，画不过来就跳帧
+        queue = SnapshotQueue(RENDER_QUEUE_SIZE, keep_skipped=True)
+        pacer = FramePacer(FPS)
+
+        def simulate():
+            while queue.wants_frames:
+                running = step()
+                queue.publish(make_snapshot(counter * track.dt, [car.position[0]], [car.position[1]], [car.angle],
+                                            [car.is_alive()], [car.index], **hud_values()))
+                if not running:
+                    return
+                pacer.wait()
+
+        sim = SimulationThread(queue, simulate)
+        sim.start()
+        while not queue.done:
+            if quit_requested():
+                queue.stop()
+                break
+            snapshot = queue.latest(timeout=1.0 / FPS)
+            if snapshot is None:
+                continue
+            t = profiler.tic()
+            for skipped in snapshot["skipped"]:
+                apply_snapshot([view_car], skipped)
+                record_trail(skipped["hud"])
+            apply_snapshot([view_car], snapshot)
+            draw(snapshot["frame"], snapshot["hud"])
+            profiler.toc("render", t)
+            clock.tick(FPS)
+        sim.result()
+        print(f"Winner demo: shown {queue.shown}/{queue.published} frames")
+    else:
+        running = True
+        while running:
+            # 事件
+            if quit_requested():
+                running = False
+
+            if not step():
+                running = False
+
+            t = profiler.tic()
+            draw(counter * track.dt, hud_values())
+            t = profiler.toc("render", t)
+            clock.tick(FPS)
+            profiler.toc("tick", t)
 
+    if profiler.enabled:
+        print(f"Winner demo profile: {format_profile(profiler.end_generation(0, 'demo_winner'))}")
     pygame.quit()
 
 # ===================== 入口：加载 winner 并演示 =====================
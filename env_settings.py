@@ -1,8 +1,9 @@
 import math
+import os
 
 
 # ===================== 基本设置 =====================
-MAP = 'maps\\K1_Real.png'
+MAP = os.path.join('maps', 'K1_Real.png')
 CAR_IMAGE = 'car.png'
 
 MAX_SIM_SECONDS = 2500
@@ -13,7 +14,8 @@ dt = 1.0 / FPS
 V_MIN = 2
 V_MAX = 4.5
 SPEED_NORM = 0.2
-ACCEL_PER_STEP     = V_MAX / (1.6 * FPS)    # 1.6 秒 0->V_MAX, 加速度（每帧速度增长量）。这里设定为“1.65秒内从 0 加到 V_MAX”。
+ACCEL_SECONDS      = 1.6                    # 从 0 加到 V_MAX 用的秒数
+ACCEL_PER_STEP     = V_MAX / (ACCEL_SECONDS * FPS)    # 加速度（每帧速度增长量），由 V_MAX / FPS / ACCEL_SECONDS 推出
 
 """
 含义：打满方向（最大转向角）时允许的最低最高速度。
@@ -51,9 +53,10 @@ TURN_EXP           = 1.6     # 曲线形状：越大弯内越慢；1.6~2.5 之
 
 越小 → 会滑行更久再慢慢降下来（更自然）。
 
-✅ 如果你希望弯中速度保持更高，可以略减小这个，比如 1.0 * ACCEL_PER_STEP。
+✅ 如果你希望弯中速度保持更高，可以略减小这个，比如 BRAKE_RATIO = 1.0。
 """
-BRAKE_PER_STEP     = 2.0 * ACCEL_PER_STEP   # 超限时每帧自动减速量（平滑降速的力度）
+BRAKE_RATIO        = 2.0                    # 自动减速是加速度的几倍
+BRAKE_PER_STEP     = BRAKE_RATIO * ACCEL_PER_STEP   # 超限时每帧自动减速量（平滑降速的力度）
 
 
 """
@@ -85,32 +88,89 @@ LIMIT_SMOOTH_ALPHA = 0.4     # 限速的低通平滑（0~1，越大响应越快
 ALPHA_STEER        = 0.5     # 转向平滑（低通滤波）系数
 
 # 画面/碰撞
-if "K1_Real.png" in MAP:
-    WIDTH, HEIGHT = 1920, 1080
-    TEXT_COLOR   = (255, 255, 255)
-    START_POSITION   = [950, 630]
-    STARTING_ANGLE   = 180
-    # 车模型参数（像素为单位）
-    CAR_SIZE_X, CAR_SIZE_Y = 60, 60
-    WHEELBASE_PX   = 50.0      # 轴距（按你的车图大小和地图比例调）
-    MAX_STEER_DEG  = 30.0      # 最大前轮转角（物理转向角，不是航向变化）
-    MAX_STEER_RAD  = math.radians(MAX_STEER_DEG)
-    RADAR_MAX_LEN = 600
-    INPUT_NORMALIZATION_DENOMINATOR = 60 #  RADAR_MAX_LEN/INPUT_NORMALIZATION_DENOMINATOR 我发现不一定输入一定要在 0,1之间，如果限制在0,1之间，车的速度涨的很慢
-else:
-    WIDTH, HEIGHT = 1920, 1080
-    TEXT_COLOR   = (0, 0, 0) # other map
-    START_POSITION   = [830, 920]
-    STARTING_ANGLE   = 0
-    CAR_SIZE_X, CAR_SIZE_Y = 60, 60
-    WHEELBASE_PX   = 50.0      # 轴距（按你的车图大小和地图比例调）
-    MAX_STEER_DEG  = 30.0      # 最大前轮转角（物理转向角，不是航向变化）
-    MAX_STEER_RAD  = math.radians(MAX_STEER_DEG)
-    RADAR_MAX_LEN = 800
-    INPUT_NORMALIZATION_DENOMINATOR = 80 #  RADAR_MAX_LEN/INPUT_NORMALIZATION_DENOMINATOR 我发现不一定输入一定要在 0,1之间，如果限制在0,1之间，车的速度涨的很慢
+WIDTH, HEIGHT = 1920, 1080
+# 车模型参数（像素为单位）
+CAR_SIZE_X, CAR_SIZE_Y = 60, 60
+WHEELBASE_PX   = 50.0      # 轴距（按你的车图大小和地图比例调）
+MAX_STEER_DEG  = 30.0      # 最大前轮转角（物理转向角，不是航向变化）
+MAX_STEER_RAD  = math.radians(MAX_STEER_DEG)
+
+# 每张地图自己的 HUD 文字颜色 / 起点 / 朝向 / 雷达长度，按文件名查，没列出的用 "default"
+# （K1_1920.png 是 1920x1920 的，起点还没标定）
+# input_normalization_denominator：RADAR_MAX_LEN/INPUT_NORMALIZATION_DENOMINATOR 我发现不一定输入一定要在 0,1之间，如果限制在0,1之间，车的速度涨的很慢
+_K1_PROFILE = dict(
+    text_color=(255, 255, 255),
+    start_position=[950, 630],
+    starting_angle=180,
+    radar_max_len=600,
+    input_normalization_denominator=60
+)
+MAP_PROFILES = {
+    "K1_Real.png": _K1_PROFILE,
+    "K1_.png": _K1_PROFILE,
+    "K1.png": _K1_PROFILE,
+    "default": dict(
+        text_color=(0, 0, 0),
+        start_position=[830, 920],
+        starting_angle=0,
+        radar_max_len=800,
+        input_normalization_denominator=80
+    ),
+}
+
+
+def map_profile(map_path: str) -> dict:
+    name = os.path.basename(map_path.replace("\\", "/"))
+    return MAP_PROFILES.get(name, MAP_PROFILES["default"])
+
+
+_profile = map_profile(MAP)
+TEXT_COLOR = _profile["text_color"]
+START_POSITION = _profile["start_position"]
+STARTING_ANGLE = _profile["starting_angle"]
+RADAR_MAX_LEN = _profile["radar_max_len"]
+INPUT_NORMALIZATION_DENOMINATOR = _profile["input_normalization_denominator"]
 
 
 PLOT_RADAR = False
+SPRITE_ANGLE_STEP = 1.0  # 车贴图旋转缓存的角度量化步长（度）；0 = 每帧精确旋转、不缓存
 BORDER_COLOR = (255, 255, 255, 255)  # 碰撞的颜色（白色）
+TRAIL_CAPACITY = 4096  # demo 里每辆车轨迹环形缓冲保留的点数（超出后覆盖最旧的点，已画出的轨迹不受影响）
+DIRTY_RENDERING = True  # 只重画车 / HUD 变了的区域并 display.update(rects)；False = 每帧整张地图重画 + flip
+ASYNC_RENDER = False  # 仿真放到后台线程、画面按显示帧率取最新快照（落后就跳帧）；训练预览代不再被 FPS 限速
+RENDER_QUEUE_SIZE = 2  # 异步渲染时仿真线程和画面之间的快照队列长度（满了丢最旧的，仿真从不等画面）
 
 TOP_N_GENO = 100
+
+
+# ===================== 训练加速（无头模式） =====================
+HEADLESS = False                  # True: 训练时不开窗口、不渲染、不限帧，只按 CPU 速度跑
+RENDER_EVERY_N_GENERATIONS = 0    # 无头模式下每 N 代开窗口预览一次（0 = 从不预览）
+RENDER_EVERY_N_FRAMES = 1         # 渲染时每 N 帧画一次（>1 时预览会以 N 倍速播放）
+MAX_GENERATION_CPU_SECONDS = None # 每代的 CPU 时间预算（秒），None = 不限；设置后结果不再严格可复现；并行 / 多地图评估时按每个分片计
+NUM_WORKERS = 1                   # >1 时无头代用多进程并行评估（预览代仍在主进程里画）
+SEED = None                       # 固定随机种子后训练可复现（与 NUM_WORKERS 无关）
+STALL_WINDOW_SECONDS = 5          # 每个窗口内离窗口起点最远不超过 STALL_RADIUS_PX 的车判为停滞并淘汰（0 = 不检测）
+STALL_RADIUS_PX = 200             # 打满方向原地转圈的半径约 87 px，正常前进 5 秒至少走 600 px
+SIM_DT = 1.0                      # 每个仿真步推进多少帧（网络每步推理一次，>1 时用更少的推理 / 雷达跑完同样的游戏时间）
+PHYSICS_SUBSTEPS = 1              # 每个仿真步分几个子步积分（提高 V_MAX 或 SIM_DT 时加大，保证每个子步的位移不大）
+SWEPT_COLLISION = False           # 检查四角在子步间扫过的线段，速度再高也不会穿过细边界（SIM_DT / V_MAX 调大时打开）
+FITNESS = "progress"              # "progress": 沿赛道前进的路程（原地转圈不得分）；"speed": 原来的 行驶距离 / 存活时间
+TARGET_LAPS = 3                   # 跑完这么多圈的车停下、不再占用仿真（0 = 不按圈数结束）
+DEMO_TARGET_LAPS = 0              # demo 里跑完这么多圈的车停下（0 = 和训练前一样跑到撞墙 / MAX_SIM_SECONDS）
+NUM_SECTORS = 3                   # 每圈分几段计时
+TRACK_CACHE_DIR = "cache"         # 地图编译产物（墙体掩码 / 距离场 / 进度场）缓存目录，PNG 改了自动重编（None = 不写磁盘）
+EXTRA_MAPS = []                   # MAP 之外一起评估的地图（如 [os.path.join('maps', 'map3.png')]），起点等按 MAP_PROFILES；fitness 取各图得分的平均
+MAP_GATE_LAPS = 0.5               # 多地图评估时在 MAP 上进度不到这么多圈的基因组不再跑其余地图（记 0 分），开销接近单图
+FITNESS_CACHE_SIZE = 100000       # 按基因组内容 + 地图 / 参数缓存 fitness（LRU 条数），原样留到下一代的精英不再重跑；0 = 不缓存
+FITNESS_CACHE_PATH = None         # 缓存追加写到这个文件（如 "cache/fitness.tsv"），续训 / 重跑时复用；None = 只在内存里
+PROFILE = False                   # 分阶段计时（推理 / 动力学 / 碰撞 / 雷达 / 渲染 / tick），每代打印一行
+PROFILE_OUTPUT = None             # 每代统计追加写入的文件（.csv 或 .jsonl），None = 只打印
+
+
+# ===================== 训练断点 =====================
+NUM_GENERATIONS = 1000                 # 训练总代数（续训时只跑剩下的）
+CHECKPOINT_DIR = "checkpoints"         # 断点目录；python car_modular.py --resume 从最新的断点继续
+CHECKPOINT_EVERY_N_GENERATIONS = 10    # 每 N 代存一次（None = 不按代数）
+CHECKPOINT_EVERY_SECONDS = 15 * 60     # 每 N 秒（墙钟）存一次（None = 不按时间）
+CHECKPOINT_KEEP = 5                    # 只保留最近的几个断点（None = 全部保留）
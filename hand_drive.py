@@ -1,64 +1,35 @@
-import math
 import pygame
 
-
-from src.my_env import (
-    Car,
-    Track
-)
+from src.my_env import Car
+from src.trails import TrailRecorder
+from src.renderer import DirtyRenderer
 
 
 # ==== 复用你的 env_settings（保持和训练一致）====
 from env_settings import (
-    MAP,
     CAR_IMAGE,
-    FPS,
-    MAX_SIM_SECONDS,   # 仅用于 HUD 显示；不强制结束
-    WHEELBASE_PX,
-    MAX_STEER_DEG,
-    V_MIN,
-    V_MAX,
-    ACCEL_PER_STEP,
-    V_TURN_FLOOR,
-    TURN_EXP,
-    BRAKE_PER_STEP,
-    LIMIT_SMOOTH_ALPHA,
-    ALPHA_STEER,
     TEXT_COLOR,
-    START_POSITION,
-    STARTING_ANGLE,
-    WIDTH, HEIGHT,
-    CAR_SIZE_X, CAR_SIZE_Y,
-    BORDER_COLOR,
-    RADAR_MAX_LEN,
     PLOT_RADAR,           # 画不画雷达
+    TRAIL_CAPACITY,
+    DIRTY_RENDERING,
 )
+from src.settings import SimSettings
 
 # ============ 主程序：键盘驾驶 ============
 def main():
     pygame.init()
+    settings = SimSettings.from_env()
 
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))  # 窗口模式；如需全屏换成 pygame.FULLSCREEN
+    screen = pygame.display.set_mode((settings.width, settings.height))  # 窗口模式；如需全屏换成 pygame.FULLSCREEN
     clock = pygame.time.Clock()
     font_big = pygame.font.SysFont("Arial", 28)
     font_small = pygame.font.SysFont("Arial", 18)
 
-    track = Track(MAP, WIDTH, HEIGHT, V_TURN_FLOOR, LIMIT_SMOOTH_ALPHA, TURN_EXP, BORDER_COLOR)
-    car = Car(
-        index=1,  # 固定一个颜色编号即可
-        car_img=CAR_IMAGE,
-        car_size_x=CAR_SIZE_X,
-        car_size_y=CAR_SIZE_Y,
-        wheelbase_px=WHEELBASE_PX,
-        max_steer_deg=MAX_STEER_DEG,
-        start_position=START_POSITION,
-        radar_max_len=RADAR_MAX_LEN,
-        v_min=V_MIN,
-        v_max=V_MAX,
-        start_facing_angle=STARTING_ANGLE,
-    )
-
-    trail_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+    track = settings.make_track(headless=False)
+    car = Car(index=1, car_img=CAR_IMAGE, **settings.car_kwargs())  # 固定一个颜色编号即可
+
+    trails = TrailRecorder(1, (settings.width, settings.height), capacity=TRAIL_CAPACITY)
+    renderer = DirtyRenderer(screen, track.map_surface, overlays=[trails.layer], dirty=DIRTY_RENDERING)
 
     # 键控参数
     STEER_RATE = 1.5      # 每秒可把 steer_cmd 变化多少（幅度单位）
@@ -68,12 +39,14 @@ def main():
 
     running = True
     while running:
-        dt = 1.0 / FPS
+        dt = 1.0 / settings.fps
 
         # 事件与退出
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            if event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
 
         keys = pygame.key.get_pressed()
         if keys[pygame.K_ESCAPE]:
@@ -107,24 +80,22 @@ def main():
 
         # R 重置
         if keys[pygame.K_r]:
-            car.reset(START_POSITION, STARTING_ANGLE)
-            trail_surf.fill((0, 0, 0, 0))  # 清轨迹
+            car.reset(settings.start_position, settings.starting_angle)
+            trails.clear()  # 清轨迹
+            renderer.invalidate()
 
         # ==== 更新动力学 ====
         track.update_car_kinematics(car, steer_cmd, accel_cmd)
 
         # ==== 画面 ====
-        screen.blit(track.map_surface, (0, 0))
+        renderer.begin()
 
         # 追加轨迹（用车身颜色；刹车时用红色）
-        car.trail.append((int(car.center[0]), int(car.center[1])))
-        if len(car.trail) > 1:
-            col = (255, 0, 0, 220) if accel_cmd < 0 else (*car.color, 220)
-            pygame.draw.line(trail_surf, col, car.trail[-2], car.trail[-1], 2)
-        screen.blit(trail_surf, (0, 0))
+        trails.record(0, car.center[0], car.center[1], (255, 0, 0, 220) if accel_cmd < 0 else (*car.color, 220))
+        renderer.restore(trails.update_layer())
 
         # 画车与雷达
-        track.draw_car(screen, car, plot_radar=PLOT_RADAR)
+        renderer.draw_car(track, car, PLOT_RADAR)
 
         # HUD
         hud_lines = [
@@ -135,13 +106,12 @@ def main():
             "ESC: Quit  |  R: Reset  |  SPACE: Brake",
         ]
         y0 = 20
-        for line in hud_lines:
-            t = font_small.render(line, True, TEXT_COLOR)
-            screen.blit(t, (20, y0))
+        for k, line in enumerate(hud_lines):
+            renderer.text(k, line, font_small, TEXT_COLOR, topleft=(20, y0))
             y0 += 22
 
-        pygame.display.flip()
-        clock.tick(FPS)
+        renderer.update()
+        clock.tick(settings.fps)
 
     pygame.quit()
 
@@ -0,0 +1,141 @@
+"""
+回放录好的轨迹文件（.traj，见 src/recording.py），不重新仿真，可以随意跳到任何时刻。
+
+    python replay.py runs/topN.traj
+
+空格 暂停 / 继续，← / → 后退 / 前进 5 秒（按住 Shift 为 30 秒），↑ / ↓ 回放加速 / 减速，Home 回到开头，ESC 退出。
+"""
+import argparse
+
+import pygame
+
+from env_settings import (
+    CAR_IMAGE,
+    TEXT_COLOR,
+    TRAIL_CAPACITY,
+    DIRTY_RENDERING
+)
+
+from src.my_env import Car
+from src.recording import TrajectoryReader
+from src.renderer import DirtyRenderer
+from src.settings import SimSettings
+from src.trails import TrailRecorder
+from src.viewer import apply_snapshot
+
+SEEK_SECONDS = 5
+SEEK_SECONDS_LONG = 30
+RATES = (0.25, 0.5, 1, 2, 4, 8, 16, 32)
+
+
+def record_trails(trails: TrailRecorder, reader: TrajectoryReader, start: int, stop: int, half_x: float, half_y: float):
+    """把第 [start, stop) 帧里还在跑的车的中心点记进轨迹。"""
+    frames = reader.slice(start, stop)
+    xs = (frames["x"] + half_x).tolist()
+    ys = (frames["y"] + half_y).tolist()
+    shown = (frames["alive"] | frames["finished"]).tolist()
+    for row_x, row_y, row_shown in zip(xs, ys, shown):
+        for i, on in enumerate(row_shown):
+            if on:
+                trails.record(i, row_x[i], row_y[i])
+
+
+def replay(reader: TrajectoryReader, map_path: str = None):
+    # 车身尺寸 / 帧率以录制时为准，其余参数同 env_settings；map_path 为 None 时用 env_settings 的 MAP
+    changes = {name: reader.header[name] for name in ("car_size_x", "car_size_y", "fps") if name in reader.header}
+    if map_path:
+        changes["map"] = map_path
+    settings = SimSettings.from_env(**changes)
+    width, height, fps = settings.width, settings.height, settings.fps
+
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    clock = pygame.time.Clock()
+    hud_font = pygame.font.SysFont("Arial", 20)
+    title_font = pygame.font.SysFont("Arial", 28)
+
+    track = settings.make_track(headless=False)
+    car_size_x, car_size_y = settings.car_size_x, settings.car_size_y
+    cars = [Car(index=key, car_img=CAR_IMAGE, **settings.car_kwargs()) for key in reader.index]
+
+    trails = TrailRecorder(len(cars), (width, height), capacity=TRAIL_CAPACITY, colors=[car.color for car in cars])
+    renderer = DirtyRenderer(screen, track.map_surface, overlays=[trails.layer], dirty=DIRTY_RENDERING)
+
+    last = len(reader) - 1
+    position = 0.0  # 当前帧号（小数，慢放时几帧才前进一帧）
+    shown = -1      # 轨迹已经记到的帧
+    rate_index = RATES.index(1)
+    paused = False
+
+    running = True
+    while running and last >= 0:
+        target = position
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+            elif event.type == pygame.KEYDOWN:
+                seek = SEEK_SECONDS_LONG if event.mod & pygame.KMOD_SHIFT else SEEK_SECONDS
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    target += seek * fps / reader.dt
+                elif event.key == pygame.K_LEFT:
+                    target -= seek * fps / reader.dt
+                elif event.key == pygame.K_HOME:
+                    target = 0.0
+                elif event.key == pygame.K_UP:
+                    rate_index = min(rate_index + 1, len(RATES) - 1)
+                elif event.key == pygame.K_DOWN:
+                    rate_index = max(rate_index - 1, 0)
+        if not paused and target == position:
+            target += RATES[rate_index] / reader.dt
+        position = min(max(target, 0.0), float(last))
+        k = int(position)
+
+        # 往前走时把中间跳过的帧也记进轨迹；往回跳或一下跳得太远时按缓冲长度重建
+        if k < shown or k - shown > TRAIL_CAPACITY:
+            trails.clear()
+            renderer.invalidate()
+            shown = max(-1, k - TRAIL_CAPACITY)
+        if k > shown:
+            record_trails(trails, reader, shown + 1, k + 1, car_size_x / 2, car_size_y / 2)
+            shown = k
+
+        snapshot = reader.snapshot(k)
+        apply_snapshot(cars, snapshot)
+        renderer.begin()
+        renderer.restore(trails.update_layer())
+        for car in cars:
+            if car.is_alive():
+                renderer.draw_car(track, car)
+
+        hud = snapshot["hud"]
+        renderer.text("title", "Replay", title_font, TEXT_COLOR, topright=(width - 20, 20))
+        hud_lines = [
+            f"Time: {snapshot['frame'] / fps:.1f}s / {reader.seconds / fps:.1f}s",
+            f"Alive: {hud['still_alive']}/{len(cars)}  Finished: {hud['finished']}",
+            "Paused" if paused else f"Speed: x{RATES[rate_index]:g}",
+            "SPACE pause  <- -> seek  UP/DOWN speed  ESC exit",
+        ]
+        y = 60
+        for i, line in enumerate(hud_lines):
+            renderer.text(i, line, hud_font, TEXT_COLOR, topright=(width - 20, y))
+            y += 24
+        renderer.update()
+        clock.tick(fps)
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trajectory", help=".traj 文件（python -m src.recording 录的）")
+    parser.add_argument("--map", default=None, help="默认用录制时的地图")
+    args = parser.parse_args()
+
+    with TrajectoryReader(args.trajectory) as reader:
+        replay(reader, args.map or reader.header.get("map"))
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+
+import pygame
+
+
+# ===================== 贴图 / 字体缓存 =====================
+# 每代会新建几十到几百辆车，原来每辆车都要 重新载图 + 缩放 + 逐像素上色 + 新建字体。
+# 这里按 (图片, 尺寸, 颜色) 缓存上色后的贴图，所有同色车共用同一个 Surface（只读，不要原地修改）。
+# color_from_index 的色相周期是 144，所以常驻的颜色数量是有限的。
+
+class LRUCache:
+    """容量有限的 LRU 字典：超出 maxsize 时丢掉最久没用过的项。"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+def tint_surface_flat(src: pygame.Surface, rgb: tuple[int,int,int]) -> pygame.Surface:
+    """把非透明像素的RGB直接替换为指定颜色，保留每个像素的alpha（整块数组操作，不再逐像素）。"""
+    tinted = src.copy()
+    if not tinted.get_flags() & pygame.SRCALPHA:
+        tinted.fill(rgb)
+        return tinted
+    pixels = pygame.surfarray.pixels3d(tinted)
+    alpha = pygame.surfarray.pixels_alpha(tinted)
+    pixels[alpha != 0] = rgb
+    del pixels, alpha  # 释放对 Surface 的锁
+    return tinted
+
+
+_base_images = LRUCache(maxsize=16)      # (图片, 尺寸) -> 缩放后的原图
+_tinted_sprites = LRUCache(maxsize=256)  # (图片, 尺寸, 颜色) -> 上色后的贴图
+_fonts = {}                              # (字体, 字号, 粗体) -> Font
+_labels = LRUCache(maxsize=1024)         # (文字, 字体key, 颜色) -> 文字贴图
+
+
+def get_base_image(car_img: str, size: tuple[int, int]) -> pygame.Surface:
+    key = (car_img, tuple(size))
+    image = _base_images.get(key)
+    if image is None:
+        image = pygame.image.load(car_img).convert_alpha()
+        image = pygame.transform.scale(image, size)
+        _base_images.put(key, image)
+    return image
+
+
+def get_car_sprite(car_img: str, size: tuple[int, int], rgb: tuple[int, int, int]) -> pygame.Surface:
+    """上色后的车贴图；同一 (图片, 尺寸, 颜色) 只载入和上色一次。"""
+    key = (car_img, tuple(size), tuple(rgb))
+    sprite = _tinted_sprites.get(key)
+    if sprite is None:
+        sprite = tint_surface_flat(get_base_image(car_img, size), rgb)
+        _tinted_sprites.put(key, sprite)
+    return sprite
+
+
+def get_font(name: str, size: int, bold: bool = False) -> pygame.font.Font:
+    key = (name, size, bold)
+    if key not in _fonts:
+        _fonts[key] = pygame.font.SysFont(name, size, bold=bold)
+    return _fonts[key]
+
+
+def get_label(text: str, font_key: tuple[str, int, bool], color=(0, 0, 0)) -> pygame.Surface:
+    """缓存的文字贴图（车身编号等不常变的文字）。"""
+    key = (text, font_key, tuple(color))
+    surf = _labels.get(key)
+    if surf is None:
+        surf = get_font(*font_key).render(text, True, color)
+        _labels.put(key, surf)
+    return surf
+
+
+
+# ===================== 旋转贴图缓存 =====================
+# rotate_center 每帧对每辆车做一次 rotate + subsurface.copy，车多时是渲染的大头。
+# 这里按贴图（= 按颜色）分表，角度量化到 angle_step 后懒加载；
+# 总条目超过 max_entries 时，整张表（一个颜色）按 LRU 淘汰。
+# 60x60 的贴图每条约 14 KB，默认上限约 230 MB（1° 步长下约 45 种颜色的全角度）。
+
+def rotate_center(image: pygame.Surface, angle: float) -> pygame.Surface:
+    """绕中心旋转，并裁回原图大小。"""
+    rectangle = image.get_rect()
+    rotated_image = pygame.transform.rotate(image, angle)
+    rotated_rectangle = rectangle.copy()
+    rotated_rectangle.center = rotated_image.get_rect().center
+    rotated_image = rotated_image.subsurface(rotated_rectangle).copy()
+    return rotated_image
+
+
+class RotatedSpriteCache:
+
+    def __init__(self, angle_step: float = 1.0, max_entries: int = 16384):
+        self.angle_step = angle_step
+        self.max_entries = max_entries
+        self._tables = OrderedDict()  # sprite -> {量化角度下标: 旋转后的贴图}，按最近使用排序；淘汰只在 _evict 里做
+        self._entries = 0
+
+    def get(self, sprite: pygame.Surface, angle: float) -> pygame.Surface:
+        if self.angle_step <= 0:
+            return rotate_center(sprite, angle)
+
+        steps = round(360.0 / self.angle_step)
+        k = round(angle / self.angle_step) % steps
+        table = self._tables.get(sprite)
+        if table is None:
+            table = self._tables[sprite] = {}
+        self._tables.move_to_end(sprite)
+
+        rotated = table.get(k)
+        if rotated is None:
+            rotated = rotate_center(sprite, k * self.angle_step)
+            table[k] = rotated
+            self._entries += 1
+            self._evict()
+        return rotated
+
+    def evict(self, sprite: pygame.Surface):
+        """丢掉某个颜色的全部旋转贴图。"""
+        table = self._tables.pop(sprite, None)
+        if table is not None:
+            self._entries -= len(table)
+
+    def _evict(self):
+        # 至少保留当前正在用的那张表
+        while self._entries > self.max_entries and len(self._tables) > 1:
+            self.evict(next(iter(self._tables)))
+
+    def __len__(self):
+        return self._entries
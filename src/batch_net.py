@@ -0,0 +1,176 @@
+import numpy as np
+
+
+# ===================== 整个种群的批量网络推理 =====================
+# neat.nn.FeedForwardNetwork.activate 逐节点、逐连接用纯 Python 求值，每帧每辆车调一次。
+# 这里把每个网络编译成按拓扑分层的 NumPy 权重 / 偏置数组：
+#   - 槽位布局：[输入..., 第 1 层节点..., 第 2 层节点..., 常量 0]
+#   - 节点的层号 = 1 + 它所有输入的最大层号（输入为第 0 层）
+# 层数相同的网络归为一组（"形状"相同），每层宽度取组内最大值，缺的节点 / 连接权重为 0，
+# 一组网络每层只做一次批量矩阵乘。聚合不是 sum、或激活函数没有向量化版本的网络退回逐个 activate。
+# 输出与 activate 在浮点误差范围内一致（求和顺序不同）。
+
+
+def _clip(z, lo, hi):
+    return np.minimum(hi, np.maximum(lo, z))
+
+
+# 与 neat.activations 中的同名函数逐个对应（包括其中的截断区间）
+_SELU_LAMBDA = 1.0507009873554804934193349852946
+_SELU_ALPHA = 1.6732632423543772848170429916717
+
+VECTORIZED_ACTIVATIONS = {
+    "sigmoid_activation": lambda z: 1.0 / (1.0 + np.exp(-_clip(5.0 * z, -60.0, 60.0))),
+    "tanh_activation": lambda z: np.tanh(_clip(2.5 * z, -60.0, 60.0)),
+    "sin_activation": lambda z: np.sin(_clip(5.0 * z, -60.0, 60.0)),
+    "gauss_activation": lambda z: np.exp(-5.0 * _clip(z, -3.4, 3.4) ** 2),
+    "relu_activation": lambda z: np.where(z > 0.0, z, 0.0),
+    "elu_activation": lambda z: np.where(z > 0.0, z, np.expm1(np.minimum(z, 0.0))),
+    "lelu_activation": lambda z: np.where(z > 0.0, z, 0.005 * z),
+    "selu_activation": lambda z: np.where(
+        z > 0.0, _SELU_LAMBDA * z, _SELU_LAMBDA * _SELU_ALPHA * np.expm1(np.minimum(z, 0.0))),
+    "softplus_activation": lambda z: 0.2 * np.log1p(np.exp(_clip(5.0 * z, -60.0, 60.0))),
+    "identity_activation": lambda z: z,
+    "clamped_activation": lambda z: _clip(z, -1.0, 1.0),
+    "log_activation": lambda z: np.log(np.maximum(1e-7, z)),
+    "exp_activation": lambda z: np.exp(_clip(z, -60.0, 60.0)),
+    "abs_activation": np.abs,
+    "hat_activation": lambda z: np.maximum(0.0, 1.0 - np.abs(z)),
+    "square_activation": lambda z: z ** 2,
+    "cube_activation": lambda z: z ** 3,
+}
+
+
+def _func_name(func) -> str:
+    return getattr(func, "__name__", "")
+
+
+def _compile(net):
+    """
+    把一个 FeedForwardNetwork 拆成分层描述；不能向量化时返回 None。
+    返回 levels：levels[k] = [(node, act_name, bias, response, links), ...]
+    """
+    depth = {k: 0 for k in net.input_nodes}
+    levels = []
+    for node, act, agg, bias, response, links in net.node_evals:
+        act_name = _func_name(act)
+        if _func_name(agg) != "sum_aggregation" or act_name not in VECTORIZED_ACTIVATIONS:
+            return None
+        # 来源不是输入、也不是前面算过的节点时，activate 里读到的是 values 里的常量
+        const = sum(net.values.get(i, 0.0) * w for i, w in links if i not in depth)
+        links = [(i, w) for i, w in links if i in depth]
+        d = 1 + max((depth[i] for i, _ in links), default=0)
+        depth[node] = d
+        while len(levels) < d:
+            levels.append([])
+        levels[d - 1].append((node, act_name, bias + response * const, response, links))
+    return levels
+
+
+class _NetGroup:
+    """
+    层数相同的一组网络：每层一个 (G, 本层宽度, 前面的槽位数) 的稠密权重张量。
+    补齐出来的节点权重全为 0，后面的层和输出都不会读它们。
+    """
+
+    def __init__(self, members: list[int], nets: list, compiled: list):
+        self.members = np.asarray(members, dtype=np.int64)
+        g = len(members)
+        self.n_in = len(nets[members[0]].input_nodes)
+        widths = [max(len(levels[k]) for levels in compiled) for k in range(len(compiled[0]))]
+        self.n_slots = self.n_in + sum(widths)
+        zero_slot = self.n_slots  # 永远为 0 的槽位：没被算到的输出节点读它
+
+        starts = np.cumsum([self.n_in] + widths)
+        weights = [np.zeros((g, n_k, start)) for n_k, start in zip(widths, starts)]
+        bias = [np.zeros((g, n_k)) for n_k in widths]
+        response = [np.zeros((g, n_k)) for n_k in widths]
+        act_names = [np.full((g, n_k), "", dtype=object) for n_k in widths]
+
+        self.output_slots = np.full((g, len(nets[members[0]].output_nodes)), zero_slot, dtype=np.int64)
+        for r, (m, levels) in enumerate(zip(members, compiled)):
+            net = nets[m]
+            slot = {key: j for j, key in enumerate(net.input_nodes)}
+            for k, level in enumerate(levels):
+                for j, (node, act_name, b, resp, links) in enumerate(level):
+                    slot[node] = starts[k] + j
+                    bias[k][r, j] = b
+                    response[k][r, j] = resp
+                    act_names[k][r, j] = act_name
+                    for i, w in links:
+                        weights[k][r, j, slot[i]] += w
+            for o, key in enumerate(net.output_nodes):
+                self.output_slots[r, o] = slot.get(key, zero_slot)
+
+        self.levels = []
+        for k, n_k in enumerate(widths):
+            names = sorted(set(act_names[k].ravel()) - {""})
+            if len(names) == 1:
+                # 常见情况：整层同一种激活函数（补齐的节点算出来也没人读）
+                acts = [(VECTORIZED_ACTIVATIONS[names[0]], None)]
+            else:
+                acts = [(VECTORIZED_ACTIVATIONS[a], act_names[k] == a) for a in names]
+            self.levels.append((starts[k], starts[k] + n_k, weights[k], bias[k], response[k], acts))
+
+    def activate(self, inputs: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """rows 为组内要算的行号；inputs 形状 (len(rows), n_in)。返回 (len(rows), 输出数)。"""
+        values = np.zeros((len(rows), self.n_slots + 1))
+        values[:, :self.n_in] = inputs
+        for start, stop, weights, bias, response, acts in self.levels:
+            s = np.matmul(weights[rows], values[:, :start, None])[:, :, 0]
+            z = bias[rows] + response[rows] * s
+            if len(acts) == 1:
+                values[:, start:stop] = acts[0][0](z)
+                continue
+            out = np.zeros_like(z)
+            for func, mask in acts:
+                m = mask[rows]
+                out[m] = func(z[m])
+            values[:, start:stop] = out
+        return np.take_along_axis(values, self.output_slots[rows], axis=1)
+
+
+class BatchNetwork:
+    """
+    整个种群的网络，一次调用算完所有存活车的输出：
+        nets = BatchNetwork([neat.nn.FeedForwardNetwork.create(g, config) for _, g in genomes])
+        outputs = nets.activate_batch(inputs, alive)   # inputs (n, 输入数) -> (n, 输出数)
+    仍可按下标取回原来的 FeedForwardNetwork（nets[i].activate(...)）。
+    """
+
+    def __init__(self, nets: list):
+        self.nets = list(nets)
+        self.n_outputs = len(self.nets[0].output_nodes) if self.nets else 0
+
+        by_shape = {}
+        self.fallback = []  # 无法向量化的网络下标，逐个 activate
+        for i, net in enumerate(self.nets):
+            compiled = _compile(net)
+            if compiled is None:
+                self.fallback.append(i)
+                continue
+            key = (tuple(net.input_nodes), len(net.output_nodes), len(compiled))
+            members, comps = by_shape.setdefault(key, ([], []))
+            members.append(i)
+            comps.append(compiled)
+        self.groups = [_NetGroup(members, self.nets, comps) for members, comps in by_shape.values()]
+        self.fallback = np.asarray(self.fallback, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.nets)
+
+    def __getitem__(self, i):
+        return self.nets[i]
+
+    def activate_batch(self, inputs: np.ndarray, alive: np.ndarray = None) -> np.ndarray:
+        """alive 为 None 时算全部；否则只算 alive 为 True 的行，其余行输出为 0。"""
+        inputs = np.asarray(inputs, dtype=np.float64)
+        out = np.zeros((len(self.nets), self.n_outputs))
+        for group in self.groups:
+            rows = np.arange(len(group.members)) if alive is None else np.flatnonzero(alive[group.members])
+            if len(rows):
+                out[group.members[rows]] = group.activate(inputs[group.members[rows]], rows)
+        for i in self.fallback:
+            if alive is None or alive[i]:
+                out[i] = self.nets[i].activate(inputs[i].tolist())
+        return out
@@ -0,0 +1,160 @@
+import glob
+import gzip
+import itertools
+import os
+import pickle
+import random
+import re
+import time
+
+import neat
+
+
+# ===================== 训练断点（checkpoint）与续训 =====================
+# 每 N 代 / 每 N 秒把整个进化状态写成一个 gzip 压缩的 pickle：
+#   种群、物种划分、历史最优、统计（StatisticsReporter）、Python random 的状态，
+#   以及 NEAT 内部的编号计数器（基因组 / 物种 / 节点），续训后新编号不会和旧的撞车。
+# 写入先落到同目录的临时文件再 os.replace，中途被杀掉也不会留下半个文件；只保留最近 keep 个。
+# 不保存 config 本身：续训时用同一个配置文件重新载入。
+
+CHECKPOINT_PREFIX = "neat-checkpoint-"
+_CHECKPOINT_RE = re.compile(re.escape(CHECKPOINT_PREFIX) + r"(\d+)\.pkl\.gz$")
+
+
+def _peek(counter):
+    """读出 itertools.count 的下一个值，返回 (值, 从该值重新开始的新计数器)。"""
+    value = next(counter)
+    return value, itertools.count(value)
+
+
+def list_checkpoints(directory: str) -> list[str]:
+    """目录下的断点文件，按代数从小到大排列。"""
+    found = []
+    for path in glob.glob(os.path.join(directory, CHECKPOINT_PREFIX + "*.pkl.gz")):
+        m = _CHECKPOINT_RE.search(os.path.basename(path))
+        if m:
+            found.append((int(m.group(1)), path))
+    return [path for _, path in sorted(found)]
+
+
+def latest_checkpoint(directory: str) -> str:
+    checkpoints = list_checkpoints(directory)
+    return checkpoints[-1] if checkpoints else None
+
+
+class TrainingCheckpointer(neat.reporting.BaseReporter):
+    """
+    作为 NEAT reporter 挂在 population 上，在一代结束（下一代已经繁殖、分好物种）时按需保存：
+        checkpointer = TrainingCheckpointer(population, stats, "checkpoints", every_n_generations=10)
+        population.add_reporter(checkpointer)
+    every_n_generations / every_seconds 任一到期就保存，都为 None 时只能手动调用 save。
+    文件名里的代数是续训后要跑的下一代。
+    """
+
+    def __init__(self, population: neat.Population, stats: neat.StatisticsReporter, directory: str,
+                 every_n_generations: int = None, every_seconds: float = None, keep: int = 5,
+                 compresslevel: int = 5):
+        self.population = population
+        self.stats = stats
+        self.directory = directory
+        self.every_n_generations = every_n_generations
+        self.every_seconds = every_seconds
+        self.keep = keep
+        self.compresslevel = compresslevel
+        self.last_generation = population.generation
+        self.last_time = time.time()
+
+    def end_generation(self, config, population, species_set):
+        # NEAT 在这之后才把 population.generation 加 1
+        next_generation = self.population.generation + 1
+        due = (self.every_n_generations and next_generation - self.last_generation >= self.every_n_generations) \
+            or (self.every_seconds and time.time() - self.last_time >= self.every_seconds)
+        if due:
+            self.save(next_generation)
+
+    def save(self, generation: int = None) -> str:
+        """
+        保存从第 generation 代开始续训所需的全部状态，返回文件路径。
+        generation 为 None 时取 population.generation：在一代的评估过程中被中断时，
+        这一代的种群还没变，续训会从头重新评估它。
+        """
+        pop = self.population
+        if generation is None:
+            generation = pop.generation
+        reproduction = pop.reproduction
+        species_set = pop.species
+        genome_config = pop.config.genome_config
+
+        next_genome_key, reproduction.genome_indexer = _peek(reproduction.genome_indexer)
+        next_species_key, species_set.indexer = _peek(species_set.indexer)
+        next_node_key = None
+        if genome_config.node_indexer is not None:
+            next_node_key, genome_config.node_indexer = _peek(genome_config.node_indexer)
+
+        # 物种集合里挂着 reporters（包括本对象）和计数器，不跟着 pickle，续训时重新接上
+        reporters, indexer = species_set.reporters, species_set.indexer
+        species_set.reporters, species_set.indexer = None, None
+        try:
+            data = dict(
+                generation=generation,
+                population=pop.population,
+                species_set=species_set,
+                best_genome=pop.best_genome,
+                ancestors=reproduction.ancestors,
+                next_genome_key=next_genome_key,
+                next_species_key=next_species_key,
+                next_node_key=next_node_key,
+                stats=self.stats,
+                random_state=random.getstate()
+            )
+            payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            species_set.reporters, species_set.indexer = reporters, indexer
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{CHECKPOINT_PREFIX}{generation}.pkl.gz")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=self.compresslevel) as f:
+                f.write(payload)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+
+        self.last_generation = generation
+        self.last_time = time.time()
+        self._prune()
+        return path
+
+    def _prune(self):
+        if self.keep is None or self.keep <= 0:  # 不限数量
+            return
+        for path in list_checkpoints(self.directory)[:-self.keep]:
+            os.remove(path)
+
+
+def restore_checkpoint(path: str, config) -> tuple[neat.Population, neat.StatisticsReporter]:
+    """
+    从断点恢复 (population, stats)。config 用同一个配置文件重新载入。
+    population 上只挂了 stats，其它 reporter（StdOutReporter、TrainingCheckpointer）需要重新添加。
+    """
+    with gzip.open(path, "rb") as f:
+        data = pickle.load(f)
+
+    random.setstate(data["random_state"])
+    species_set = data["species_set"]
+    population = neat.Population(config, (data["population"], species_set, data["generation"]))
+    population.best_genome = data["best_genome"]
+
+    reproduction = population.reproduction
+    reproduction.ancestors = data["ancestors"]
+    reproduction.genome_indexer = itertools.count(data["next_genome_key"])
+    # 停滞判断用到的历史在物种对象里，跟着 species_set 一起恢复
+    species_set.reporters = population.reporters
+    species_set.indexer = itertools.count(data["next_species_key"])
+    if data["next_node_key"] is not None:
+        config.genome_config.node_indexer = itertools.count(data["next_node_key"])
+
+    stats = data["stats"]
+    population.add_reporter(stats)
+    return population, stats
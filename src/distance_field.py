@@ -0,0 +1,55 @@
+import numpy as np
+import pygame
+
+
+# ===================== 墙体距离场 =====================
+# 数组统一按 pygame 的 [x, y] 下标（和 surfarray / get_at((x, y)) 一致）
+
+def wall_mask_from_surface(surface: pygame.Surface, border_color) -> np.ndarray:
+    """颜色等于 border_color 的像素为墙，返回 bool 数组 [x, y]。"""
+    rgb = pygame.surfarray.array3d(surface)
+    mask = np.all(rgb == np.asarray(border_color[:3], dtype=rgb.dtype), axis=2)
+    if len(border_color) > 3 and border_color[3] != 255:
+        # 地图都是不透明的，alpha 不是 255 的边界色永远匹配不上
+        mask[:] = False
+    return np.ascontiguousarray(mask)
+
+
+def _relax_line(line: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """一行内双向传播：line[j] = min_k line[k] + |j - k|（用累计最小值向量化）。"""
+    fwd = np.minimum.accumulate(line - idx) + idx
+    bwd = np.minimum.accumulate((line + idx)[::-1])[::-1] - idx
+    return np.minimum(fwd, bwd)
+
+
+def chebyshev_distance(mask: np.ndarray) -> np.ndarray:
+    """
+    每个像素到最近墙像素的棋盘距离（L∞），墙上为 0；图外视为墙。
+    棋盘距离 <= 欧氏距离，所以拿来做 sphere tracing 的步长是安全的。
+    经典两遍扫描（Rosenfeld-Pfaltz），每一行内部用 cumulative min 向量化。
+    """
+    w, h = mask.shape
+    big = w + h
+    dist = np.where(mask, 0, big).astype(np.int32)
+    idx = np.arange(w, dtype=np.int32)
+    inf_col = np.full(1, big, dtype=np.int32)
+
+    def from_neighbor_row(prev):
+        # 上一行的 3 个邻居（左上 / 正上 / 右上）+1
+        left = np.concatenate((inf_col, prev[:-1]))
+        right = np.concatenate((prev[1:], inf_col))
+        return np.minimum(np.minimum(prev, left), right) + 1
+
+    # 前向：y 从小到大
+    dist[:, 0] = _relax_line(dist[:, 0], idx)
+    for y in range(1, h):
+        dist[:, y] = _relax_line(np.minimum(dist[:, y], from_neighbor_row(dist[:, y - 1])), idx)
+    # 反向：y 从大到小
+    for y in range(h - 2, -1, -1):
+        dist[:, y] = _relax_line(np.minimum(dist[:, y], from_neighbor_row(dist[:, y + 1])), idx)
+
+    # 图外当作墙：距离不超过到图像边缘的距离
+    xs = np.arange(w, dtype=np.int32)[:, None]
+    ys = np.arange(h, dtype=np.int32)[None, :]
+    edge = np.minimum(np.minimum(xs + 1, w - xs), np.minimum(ys + 1, h - ys))
+    return np.minimum(dist, edge)
@@ -0,0 +1,289 @@
+"""
+离线导出演示视频 / PNG 序列：不开窗口、不 clock.tick，按 CPU 能跑多快就多快。
+
+    python -m src.export [genomes.pkl] [--top 5] [--out demo.mp4 | frames/] [--seconds 2500]
+                         [--every 1] [--scale 1.0] [--workers N]
+    python -m src.export --replay runs/topN.traj [--out ...]
+
+默认取 topN_genomes.pkl（没有就 winner.pkl）里的前 --top 个基因组，在 env_settings 的地图上用批量引擎跑一遍，
+画面和 demo_topN 一样（地图 + 轨迹 + 车 + HUD）；--replay 时不仿真，直接画录好的轨迹文件（src/recording.py）。
+--out 以 .mp4 / .mkv / .mov / .avi / .webm 结尾时，原始 RGB 帧经管道交给 ffmpeg 编码（需要 ffmpeg 在 PATH 上）；
+否则当作目录写 PNG 序列（frame_000000.png ...），PNG 压缩分给 --workers 个进程并行做。
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import shutil
+import subprocess
+import time
+from collections import deque
+
+import neat
+import pygame
+
+from src.my_env import (
+    Car,
+    Track
+)
+from src.recording import TrajectoryReader
+from src.renderer import DirtyRenderer
+from src.simulation import (
+    build_population,
+    make_lap_tracker,
+    step_population
+)
+from src.trails import TrailRecorder
+from src.viewer import (
+    make_snapshot,
+    apply_snapshot
+)
+
+
+# ===================== 离线导出 =====================
+# 帧的来源是一串快照（src/viewer.py 的 make_snapshot，和异步渲染同一种格式）：
+#   - simulate_snapshots：用 CarBatch + BatchNetwork 无头跑一遍，逐步产出快照
+#   - TrajectoryReader.snapshots：从录好的 .traj 里按帧读出快照（src/recording.py）
+# FrameRenderer 把快照画到一块不上屏的 Surface 上（仍然用脏矩形，只重画车走过的地方），整块像素原样交给 sink：
+# 这块 Surface 的内存布局就是 RGBX，取字节只是一次拷贝（image.tostring 转 RGB 一帧 1080p 要 ~10 ms）
+#   - FfmpegSink：管道喂给 ffmpeg
+#   - PngSequenceSink：进程池里压缩 / 写盘，主进程只管画；在途的帧数有上限，内存不会越积越多
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm")
+FRAME_MASKS = (0x000000FF, 0x0000FF00, 0x00FF0000, 0)  # 32 位、内存里按 R G B X 排（小端）
+
+
+def load_genomes(path: str) -> list:
+    with open(path, "rb") as f:
+        genomes = pickle.load(f)
+    return genomes if isinstance(genomes, list) else [genomes]
+
+
+def simulate_snapshots(track: Track, genomes: list, config, car_kwargs: dict,
+                       normalization_denominator: int, speed_norm: float, max_frames: float,
+                       target_laps: int = 0, n_sectors: int = 3, every: int = 1):
+    """
+    所有基因组同时跑（和 demo_topN 一样：同一起点、跑完 target_laps 圈的车停在原地），每 every 步产出一个快照，
+    最后一步总会产出。快照的 hud 里有 still_alive / finished / best_laps。
+    """
+    pairs = [(g.key, g) for g in genomes]
+    nets, batch, _ = build_population(pairs, config, car_kwargs)
+    laps = make_lap_tracker(track, batch, "speed", target_laps, n_sectors, max_frames)
+    index = [g.key for g in genomes]
+
+    counter = 0
+    while True:
+        still_alive = step_population(track, batch, nets, pairs, normalization_denominator, speed_norm, laps=laps)
+        counter += 1
+        last = still_alive == 0 or counter * track.dt >= max_frames
+        if counter % every == 0 or last:
+            yield make_snapshot(
+                counter * track.dt, batch.x, batch.y, batch.angle, batch.alive | batch.finished, index,
+                still_alive=int(batch.alive.sum()),
+                finished=int(batch.finished.sum()),
+                best_laps=None if laps is None else float(laps.best.max())
+            )
+        if last:
+            return
+
+
+class FrameRenderer:
+    """
+    把快照画成一帧 RGBX 字节（每像素 4 字节，第 4 字节无意义），画面同 demo_topN。cars 为只用来画的 Car（和快照里的车一一对应）。
+    scale != 1 时输出缩放后的画面（宽高取偶数，视频编码要求）。
+    """
+
+    def __init__(self, track: Track, cars: list, fps: float, title: str = "", text_color=(0, 0, 0),
+                 trail_capacity: int = 4096, scale: float = 1.0):
+        self.track = track
+        self.cars = cars
+        self.fps = fps
+        self.title = title
+        self.text_color = text_color
+        size = track.map_surface.get_size()
+        self.surface = pygame.Surface(size, 0, 32, FRAME_MASKS)
+        self.trails = TrailRecorder(len(cars), size, capacity=trail_capacity, colors=[car.color for car in cars])
+        self.renderer = DirtyRenderer(self.surface, track.map_surface, overlays=[self.trails.layer], present=False)
+        self.title_font = pygame.font.SysFont("Arial", 28)
+        self.hud_font = pygame.font.SysFont("Arial", 20)
+        self.size = size
+        if scale != 1.0:
+            self.size = (max(2, int(size[0] * scale)) // 2 * 2, max(2, int(size[1] * scale)) // 2 * 2)
+
+    def render(self, snapshot: dict) -> bytes:
+        apply_snapshot(self.cars, snapshot)
+        for i, car in enumerate(self.cars):
+            if car.is_alive():
+                self.trails.record(i, car.center[0], car.center[1])
+
+        renderer = self.renderer
+        renderer.begin()
+        renderer.restore(self.trails.update_layer())
+        for car in self.cars:
+            if car.is_alive():
+                renderer.draw_car(self.track, car)
+
+        width = self.surface.get_width()
+        if self.title:
+            renderer.text("title", self.title, self.title_font, self.text_color, topright=(width - 20, 20))
+        hud = snapshot["hud"]
+        hud_lines = [f"Time: {snapshot['frame'] / self.fps:.1f}s"]
+        if "still_alive" in hud:
+            hud_lines.append(f"Alive: {hud['still_alive']}/{len(self.cars)}")
+        if hud.get("best_laps") is not None:
+            hud_lines.append(f"Finished: {hud.get('finished', 0)}  best {hud['best_laps']:.2f} laps")
+        y = 60
+        for k, line in enumerate(hud_lines):
+            renderer.text(k, line, self.hud_font, self.text_color, topright=(width - 20, y))
+            y += 24
+        renderer.update()
+
+        surface = self.surface
+        if self.size != surface.get_size():
+            surface = pygame.transform.smoothscale(surface, self.size)
+        return surface.get_buffer().raw
+
+
+def _save_png(path: str, size: tuple[int, int], data: bytes) -> str:
+    pygame.image.save(pygame.image.frombuffer(data, size, "RGBX"), path)
+    return path
+
+
+class PngSequenceSink:
+    """PNG 序列。workers > 1 时压缩和写盘放进进程池；在途的帧最多 2 * workers 个。"""
+
+    def __init__(self, directory: str, size: tuple[int, int], workers: int = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.size = size
+        self.workers = workers or os.cpu_count() or 1
+        self.frames = 0
+        self._pool = multiprocessing.Pool(self.workers) if self.workers > 1 else None
+        self._pending = deque()
+
+    def write(self, data: bytes):
+        path = os.path.join(self.directory, f"frame_{self.frames:06d}.png")
+        self.frames += 1
+        if self._pool is None:
+            _save_png(path, self.size, data)
+            return
+        self._pending.append(self._pool.apply_async(_save_png, (path, self.size, data)))
+        while len(self._pending) > 2 * self.workers:
+            self._pending.popleft().get()
+
+    def close(self):
+        while self._pending:
+            self._pending.popleft().get()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+
+class FfmpegSink:
+    """原始 RGBX 帧经 stdin 管道交给 ffmpeg（libx264 / yuv420p），编码的多线程由 ffmpeg 自己做。"""
+
+    def __init__(self, path: str, size: tuple[int, int], fps: float, crf: int = 20, preset: str = "veryfast"):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg not found on PATH; install it or export a PNG sequence (--out <directory>)")
+        self.frames = 0
+        self._proc = subprocess.Popen([
+            ffmpeg, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb0", "-s", f"{size[0]}x{size[1]}", "-r", f"{fps:g}", "-i", "-",
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p", path
+        ], stdin=subprocess.PIPE)
+
+    def write(self, data: bytes):
+        self._proc.stdin.write(data)
+        self.frames += 1
+
+    def close(self):
+        self._proc.stdin.close()
+        if self._proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {self._proc.returncode}")
+
+
+def open_sink(out: str, size: tuple[int, int], fps: float, workers: int = None):
+    if out.lower().endswith(VIDEO_EXTENSIONS):
+        return FfmpegSink(out, size, fps)
+    return PngSequenceSink(out, size, workers)
+
+
+def export(snapshots, frame_renderer: FrameRenderer, sink) -> int:
+    """把快照逐个画出来写进 sink，返回帧数。"""
+    try:
+        for snapshot in snapshots:
+            sink.write(frame_renderer.render(snapshot))
+    finally:
+        sink.close()
+    return sink.frames
+
+
+def main():
+    from env_settings import (
+        CAR_IMAGE,
+        TRAIL_CAPACITY,
+        map_profile
+    )
+    from src.settings import SimSettings
+
+    settings = SimSettings.from_env()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("genomes", nargs="?", default=None, help="基因组 pkl，默认 topN_genomes.pkl，没有就 winner.pkl")
+    parser.add_argument("--top", type=int, default=5, help="取前几个基因组")
+    parser.add_argument("--config", default="config_modified.txt")
+    parser.add_argument("--replay", default=None, help="录好的 .traj：画它而不是重新仿真")
+    parser.add_argument("--map", default=None, help="默认 env_settings 的 MAP（--replay 时为录制时的地图）")
+    parser.add_argument("--out", default="export.mp4", help="视频文件（.mp4 等）或 PNG 序列的目录")
+    parser.add_argument("--seconds", type=float, default=settings.max_sim_seconds, help="最长仿真时间（游戏秒）")
+    parser.add_argument("--every", type=int, default=1, help="每 N 步出一帧（视频帧率相应降为 FPS / N，播放仍是实时）")
+    parser.add_argument("--scale", type=float, default=1.0, help="输出画面缩放")
+    parser.add_argument("--workers", type=int, default=None, help="PNG 压缩进程数，默认 CPU 核数")
+    args = parser.parse_args()
+
+    # 不开窗口：dummy 显示只为了让 convert() / convert_alpha() 有像素格式可用
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    reader = TrajectoryReader(args.replay) if args.replay else None
+    map_path = args.map or (reader.header.get("map", settings.map) if reader else settings.map)
+    settings = settings.for_map(map_path)
+    track = settings.make_track(headless=False)
+    car_kwargs = settings.car_kwargs()
+
+    if reader is not None:
+        path, dt, title = args.replay, reader.dt, "Replay"
+        car_kwargs.update(car_size_x=reader.header.get("car_size_x", settings.car_size_x),
+                          car_size_y=reader.header.get("car_size_y", settings.car_size_y))
+        keys = reader.index
+        snapshots = reader.snapshots(0, reader.frame_at(settings.fps * args.seconds) + 1, args.every)
+    else:
+        path = args.genomes or ("topN_genomes.pkl" if os.path.exists("topN_genomes.pkl") else "winner.pkl")
+        genomes = load_genomes(path)[:args.top]
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                                    neat.DefaultStagnation, args.config)
+        dt, title = track.dt, f"Top-{len(genomes)} Demo"
+        keys = [g.key for g in genomes]
+        snapshots = simulate_snapshots(track, genomes, config, car_kwargs, settings.input_normalization_denominator,
+                                       settings.speed_norm, max_frames=settings.fps * args.seconds,
+                                       target_laps=settings.target_laps, n_sectors=settings.num_sectors,
+                                       every=args.every)
+    cars = [Car(index=key, car_img=CAR_IMAGE, **car_kwargs) for key in keys]
+
+    frame_renderer = FrameRenderer(track, cars, settings.fps, title=title,
+                                   text_color=map_profile(map_path)["text_color"],
+                                   trail_capacity=TRAIL_CAPACITY, scale=args.scale)
+    fps = settings.fps / (args.every * dt)
+    sink = open_sink(args.out, frame_renderer.size, fps, args.workers)
+
+    t0 = time.perf_counter()
+    frames = export(snapshots, frame_renderer, sink)
+    seconds = time.perf_counter() - t0
+    video_seconds = frames / fps
+    print(f"{path}: {len(cars)} cars -> {args.out} | {frames} frames, {video_seconds:.1f} s of video "
+          f"in {seconds:.1f} s ({video_seconds / max(seconds, 1e-9):.1f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import struct
+from collections import OrderedDict
+
+
+# ===================== fitness 缓存 =====================
+# 仿真是确定的、车与车之间互不影响，所以同一个基因组在同样的地图和参数下 fitness 永远一样。
+# NEAT 的精英（elitism / species_elitism）原样进入下一代，不缓存的话每代都要把它们重新跑一遍（最长 150000 帧）。
+# 键 = 参数指纹 : 基因组指纹
+#   - genome_fingerprint：节点（key / bias / response / activation / aggregation）和连接（key / weight / enabled）
+#     排好序后逐字节哈希，浮点按 IEEE 754 原样打包；基因组的 key、fitness 等不影响仿真的字段不参与
+#   - settings_fingerprint：地图的 PNG 内容（不是路径）+ 影响仿真的所有参数；FINGERPRINT_VERSION 在仿真代码
+#     改了结果（物理 / 奖励）时加一，旧的缓存自动对不上
+# 内存里是有上限的 LRU；给了 path 时新结果追加写到文本文件（每行 "键\tfitness"），下次启动读回来，
+# 文件行数超过容量的两倍时重写一遍只留最近的。
+
+FINGERPRINT_VERSION = 1
+
+
+def genome_fingerprint(genome) -> str:
+    digest = hashlib.sha1()
+    for key in sorted(genome.nodes):
+        node = genome.nodes[key]
+        digest.update(struct.pack("<qdd", key, node.bias, node.response))
+        digest.update(f"{node.activation}/{node.aggregation};".encode())
+    for key in sorted(genome.connections):
+        conn = genome.connections[key]
+        digest.update(struct.pack("<qqd?", key[0], key[1], conn.weight, conn.enabled))
+    return digest.hexdigest()
+
+
+def settings_fingerprint(maps: list, **settings) -> str:
+    """maps 为用到的地图路径（按内容哈希），settings 为其余影响仿真结果的参数（值需有稳定的 repr）。"""
+    digest = hashlib.sha1(f"v{FINGERPRINT_VERSION}".encode())
+    for path in maps:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha1(f.read()).digest())
+    digest.update(repr(sorted(settings.items())).encode())
+    return digest.hexdigest()[:16]
+
+
+class FitnessCache:
+    """
+    按基因组内容缓存 fitness：
+        cache = FitnessCache(settings_fingerprint([MAP], ...), capacity=100000, path="cache/fitness.tsv")
+        todo = cache.apply(genomes)     # 命中的直接设好 fitness，返回还要仿真的 (gid, genome)
+        ...只评估 todo...
+        cache.update(todo)              # 记下新结果（有 path 时顺手写盘）
+    capacity <= 0 时什么都不缓存。hits / misses 为累计命中 / 未命中次数。
+    """
+
+    def __init__(self, context: str, capacity: int = 100000, path: str = None):
+        self.context = context
+        self.capacity = capacity
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _key(self, genome) -> str:
+        return f"{self.context}:{genome_fingerprint(genome)}"
+
+    def _remember(self, key: str, fitness: float):
+        self._entries[key] = fitness
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def get(self, genome):
+        """命中返回 fitness，否则 None。"""
+        if self.capacity <= 0:
+            return None
+        key = self._key(genome)
+        fitness = self._entries.get(key)
+        if fitness is not None:
+            self._entries.move_to_end(key)
+        return fitness
+
+    def apply(self, genomes) -> list:
+        todo = []
+        for gid, genome in genomes:
+            fitness = self.get(genome)
+            if fitness is None:
+                todo.append((gid, genome))
+            else:
+                genome.fitness = fitness
+        self.hits += len(genomes) - len(todo)
+        self.misses += len(todo)
+        return todo
+
+    def update(self, genomes):
+        if self.capacity <= 0:
+            return
+        lines = []
+        for _, genome in genomes:
+            if genome.fitness is None:
+                continue
+            key = self._key(genome)
+            self._remember(key, genome.fitness)
+            lines.append(f"{key}\t{genome.fitness!r}\n")
+        if self.path and lines:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+
+    def _load(self):
+        n_lines = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                n_lines += 1
+                if not line.endswith("\n"):
+                    continue  # 上次写到一半被打断的最后一行
+                key, sep, value = line[:-1].partition("\t")
+                if not sep:
+                    continue
+                try:
+                    self._remember(key, float(value))
+                except ValueError:
+                    continue
+        if n_lines > 2 * max(self.capacity, 1):
+            # 压缩：只留内存里还在的（最近用过的）条目；先写临时文件再替换
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(f"{key}\t{fitness!r}\n" for key, fitness in self._entries.items())
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,263 @@
+"""
+地图预处理：把 maps/ 里的 PNG 编译成磁盘上的缓存产物，训练 / demo / 并行 worker 启动时直接内存映射。
+
+    python -m src.map_compiler [maps/xxx.png ...] [--cache-dir cache] [--force]
+
+不带参数时编译 maps/ 下所有 PNG；每张图的起点 / 朝向按 env_settings 的 MAP_PROFILES（map_profile），
+起点落在墙上的地图只编译墙体掩码和距离场。
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pygame
+
+from src.distance_field import (
+    wall_mask_from_surface,
+    chebyshev_distance
+)
+from src.progress import (
+    ProgressIndex,
+    build_progress_field
+)
+
+
+# ===================== 地图编译缓存 =====================
+# 每张地图（+ 边界色）一个目录：cache/<地图名>-<内容哈希>/
+#   meta.json             来源路径、PNG 的 sha1、边界色、尺寸、格式版本
+#   wall_mask.npy         墙体掩码 bool [x, y]
+#   wall_dist.npy         到墙的棋盘距离 int32 [x, y]
+#   progress-<x>-<y>-<角度>.npy / .json   某个起点的进度场（float32 的 fraction）和
+#                         起点位姿、一圈长、中心线、检查点
+# 目录名里的哈希由 PNG 内容 + 边界色 + 版本决定：PNG 一改就对不上，自动重新编译，同一张图的旧目录顺手删掉。
+# .npy 用 np.load(mmap_mode="r") 打开，多个进程共用操作系统的页缓存，不各自解码 PNG、重算距离场。
+# 写入都先落到临时文件 / 目录再 os.replace，并行 worker 同时编译也不会读到写了一半的文件。
+
+FORMAT_VERSION = 2  # 2：进度场先检查一圈长（_check_lap），旧版本缓存里可能有没检查过的进度场
+N_CHECKPOINTS = 32
+
+
+def _file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _artifact_key(sha1: str, border_color) -> str:
+    key = repr((FORMAT_VERSION, sha1, tuple(border_color)))
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def _load_array(path: str) -> np.ndarray:
+    # 内存映射；转成普通 ndarray 视图，标量下标不走 np.memmap 的 Python 层 __getitem__
+    return np.asarray(np.load(path, mmap_mode="r"))
+
+
+def _save_array(path: str, array: np.ndarray):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _save_json(path: str, data: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _centerline(dist: np.ndarray, lap_length: int) -> np.ndarray:
+    """
+    每个路程值一个点：同一路程的像素（一条横穿赛道的波前）里离它们重心最近的那个，
+    弯道上重心可能落在赛道外，取最近的像素保证点在赛道上。返回 (lap_length, 2) int32，没有像素的路程为 -1。
+    """
+    xs, ys = np.nonzero((dist >= 0) & (dist < lap_length))
+    band = dist[xs, ys]
+    count = np.bincount(band, minlength=lap_length)
+    safe = np.maximum(count, 1)
+    mean_x = np.bincount(band, weights=xs, minlength=lap_length) / safe
+    mean_y = np.bincount(band, weights=ys, minlength=lap_length) / safe
+    d2 = (xs - mean_x[band]) ** 2 + (ys - mean_y[band]) ** 2
+    order = np.lexsort((d2, band))
+    first = order[np.r_[True, band[order][1:] != band[order][:-1]]]
+    line = np.full((lap_length, 2), -1, dtype=np.int32)
+    line[band[first], 0] = xs[first]
+    line[band[first], 1] = ys[first]
+    return line
+
+
+def _check_lap(dist: np.ndarray, lap_length: int, start_center):
+    """
+    起跑线没把赛道切断时（起点附近有缺口、起跑线斜着擦过弯道），后方的像素很快就能绕到，一圈长短得离谱。
+    沿能到的整条赛道画中心线量一下长度：一圈是贴着弯道内侧的最短路、按棋盘距离算，不会比中心线的欧氏长度长
+    （留 10% 余量），但也不会短好几倍（实际地图约为 0.6 ~ 0.75 倍，下限取 1/4）。对不上就报错，不缓存坏的进度场。
+    """
+    line = _centerline(dist, int(dist.max()) + 1)
+    points = line[line[:, 0] >= 0].astype(np.float64)
+    length = float(np.hypot(*np.diff(points, axis=0).T).sum())
+    if not length / 4 <= lap_length <= length * 1.1:
+        raise ValueError(f"lap of {lap_length} px from start {tuple(start_center)} does not match the "
+                         f"{length:.0f} px centreline; the start line probably does not cut the track")
+
+
+class CompiledMap:
+    """
+    一张地图编译后的数据：
+        compiled = compile_map("maps/K1_Real.png", (255, 255, 255, 255), cache_dir="cache")
+        compiled.wall_mask, compiled.wall_dist
+        index = compiled.progress((980, 660), 180)   # ProgressIndex，同一起点只算一次
+    cache_dir 为 None 时全部在内存里算，不写磁盘。
+    """
+
+    def __init__(self, source: str, sha1: str, border_color, wall_mask: np.ndarray, wall_dist: np.ndarray,
+                 directory: str = None):
+        self.source = source
+        self.sha1 = sha1
+        self.border_color = tuple(border_color)
+        self.wall_mask = wall_mask
+        self.wall_dist = wall_dist
+        self.directory = directory
+        self.progress_indexes = {}  # (起点中心, 朝向) -> ProgressIndex
+        self.shared_blocks = []  # 数组挂在共享内存上时（src/shared_track.py）持有的内存块
+
+    def progress(self, start_center, start_angle: float, n_checkpoints: int = N_CHECKPOINTS) -> ProgressIndex:
+        start_center = (int(start_center[0]), int(start_center[1]))
+        key = (start_center, float(start_angle))
+        if key not in self.progress_indexes:
+            self.progress_indexes[key] = self._load_or_build_progress(start_center, float(start_angle), n_checkpoints)
+        return self.progress_indexes[key]
+
+    def _load_or_build_progress(self, start_center, start_angle: float, n_checkpoints: int) -> ProgressIndex:
+        stem = None
+        if self.directory:
+            stem = os.path.join(self.directory, f"progress-{start_center[0]}-{start_center[1]}-{start_angle:g}")
+            if os.path.exists(stem + ".json") and os.path.exists(stem + ".npy"):
+                with open(stem + ".json", encoding="utf-8") as f:
+                    meta = json.load(f)
+                return ProgressIndex(_load_array(stem + ".npy"), meta["lap_length"],
+                                     centerline=_load_array(stem + "-centerline.npy"),
+                                     checkpoints=np.asarray(meta["checkpoints"], dtype=np.int64))
+
+        dist, lap_length = build_progress_field(self.wall_mask, start_center, start_angle)
+        _check_lap(dist, lap_length, start_center)
+        index = ProgressIndex.from_dist(dist, lap_length)
+        index.centerline = _centerline(dist, lap_length)
+        # 检查点：沿中心线等距取 n 个点（以在 centerline 里的下标表示）
+        index.checkpoints = (np.arange(n_checkpoints) * lap_length) // n_checkpoints
+        if stem:
+            # json 最后写：读的一方看到 json 就说明数组都已经写好
+            _save_array(stem + ".npy", index.fraction)
+            _save_array(stem + "-centerline.npy", index.centerline)
+            _save_json(stem + ".json", dict(
+                start_center=list(start_center),
+                start_angle=start_angle,
+                lap_length=lap_length,
+                checkpoints=index.checkpoints.tolist()
+            ))
+        return index
+
+
+def _read_meta(directory: str) -> dict:
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_stale(cache_dir: str, name: str, source: str, border_color, keep: str):
+    """同一张图（同一边界色）内容改过以后留下的旧目录。"""
+    for directory in glob.glob(os.path.join(cache_dir, f"{name}-*")):
+        if os.path.abspath(directory) == os.path.abspath(keep) or not os.path.isdir(directory):
+            continue
+        meta = _read_meta(directory)
+        if meta and os.path.normpath(meta["source"]) == os.path.normpath(source) \
+                and tuple(meta["border_color"]) == tuple(border_color):
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def compile_map(map_path: str, border_color, cache_dir: str = None, force: bool = False) -> CompiledMap:
+    """
+    读缓存产物（内存映射）；没有、或者 PNG 改过了，就重新编译并写入 cache_dir。
+    cache_dir 为 None 时只在内存里算。force=True 时无视已有产物重新编译。
+    """
+    sha1 = _file_sha1(map_path)
+    name = os.path.splitext(os.path.basename(map_path))[0]
+    directory = None
+    if cache_dir:
+        directory = os.path.join(cache_dir, f"{name}-{_artifact_key(sha1, border_color)}")
+        meta = None if force else _read_meta(directory)
+        if meta and meta["sha1"] == sha1 and meta["version"] == FORMAT_VERSION:
+            return CompiledMap(map_path, sha1, border_color,
+                               _load_array(os.path.join(directory, "wall_mask.npy")),
+                               _load_array(os.path.join(directory, "wall_dist.npy")),
+                               directory)
+
+    # 不 convert()：不需要显示窗口；地图是不透明的，颜色和 convert 后一致
+    wall_mask = wall_mask_from_surface(pygame.image.load(map_path), border_color)
+    wall_dist = chebyshev_distance(wall_mask)
+    if directory is None:
+        return CompiledMap(map_path, sha1, border_color, wall_mask, wall_dist)
+
+    tmp_dir = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "wall_mask.npy"), wall_mask)
+    np.save(os.path.join(tmp_dir, "wall_dist.npy"), wall_dist)
+    _save_json(os.path.join(tmp_dir, "meta.json"), dict(
+        source=map_path,
+        sha1=sha1,
+        border_color=list(border_color),
+        size=list(wall_mask.shape),
+        version=FORMAT_VERSION,
+        created=time.strftime("%Y-%m-%d %H:%M:%S")
+    ))
+    shutil.rmtree(directory, ignore_errors=True)  # force 或者残缺的旧产物
+    try:
+        os.replace(tmp_dir, directory)
+    except OSError:
+        # 另一个进程刚刚编译好了同一张图：用它的
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    _remove_stale(cache_dir, name, map_path, border_color, directory)
+    return compile_map(map_path, border_color, cache_dir)
+
+
+def main():
+    from env_settings import (
+        BORDER_COLOR,
+        CAR_SIZE_X,
+        CAR_SIZE_Y,
+        TRACK_CACHE_DIR,
+        map_profile
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("maps", nargs="*", help="要编译的 PNG，默认 maps/*.png")
+    parser.add_argument("--cache-dir", default=TRACK_CACHE_DIR or "cache")
+    parser.add_argument("--force", action="store_true", help="无视已有产物重新编译")
+    args = parser.parse_args()
+
+    for map_path in args.maps or sorted(glob.glob(os.path.join("maps", "*.png"))):
+        t0 = time.perf_counter()
+        profile = map_profile(map_path)
+        start_x, start_y = profile["start_position"]
+        start_center = (start_x + CAR_SIZE_X / 2, start_y + CAR_SIZE_Y / 2)
+        compiled = compile_map(map_path, BORDER_COLOR, args.cache_dir, force=args.force)
+        try:
+            index = compiled.progress(start_center, profile["starting_angle"])
+            progress = f"lap {index.lap_length} px"
+        except ValueError as e:
+            progress = f"no progress field ({e})"
+        print(f"{map_path:24s} {compiled.sha1[:12]} -> {compiled.directory} | {progress} | "
+              f"{time.perf_counter() - t0:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
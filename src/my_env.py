@@ -1,12 +1,19 @@
 import math
 
+import numpy as np
 import pygame
 
-from env_settings import (
-    ACCEL_PER_STEP,
-    BRAKE_PER_STEP,
-    ALPHA_STEER
+from src.assets import (
+    get_car_sprite,
+    get_label,
+    RotatedSpriteCache
 )
+from src.map_compiler import (
+    CompiledMap,
+    compile_map
+)
+from src.progress import ProgressIndex
+from src.profiling import NULL_PROFILER
 
 
 def color_from_index(idx: int, sat=92, val=92):
@@ -27,21 +34,30 @@ def color_from_index(idx: int, sat=92, val=92):
 
 
 
-def tint_surface_flat(src: pygame.Surface, rgb: tuple[int,int,int]) -> pygame.Surface:
-    """把非透明像素的RGB直接替换为指定颜色，保留每个像素的alpha。"""
-    tinted = src.copy()
-    w, h = tinted.get_width(), tinted.get_height()
-    # 逐像素很快，因为只有 60x60 一次性做，成本可忽略
-    px = pygame.PixelArray(tinted)
-    for y in range(h):
-        for x in range(w):
-            r,g,b,a = tinted.unmap_rgb(px[x, y]).r, tinted.unmap_rgb(px[x, y]).g, tinted.unmap_rgb(px[x, y]).b, (px.surface.get_at((x,y)).a)
-            if a != 0:
-                px[x, y] = (rgb[0], rgb[1], rgb[2], a)
-    del px
-    return tinted
+RADAR_ANGLES = (-90, -45, 0, 45, 90)
+_LABEL_FONT = ("Arial", 15, True)
+
 
 class Car:
+    """
+    单车仿真状态。训练时成千上万辆车，所以：
+      - 用 __slots__，没有逐实例的 __dict__
+      - 雷达读数 / 四角存在预分配的平铺 list 里，每帧原地覆盖，不再 clear + append 新建小列表
+        radar_xy = [x0, y0, x1, y1, ...]，radar_dists = [d0, d1, ...]，本帧已测 radar_count 束
+        corners = [x0, y0, ..., x3, y3]，上一帧的四角留在 prev_corners（扫掠碰撞用），两块缓冲轮换
+      - 颜色、贴图、编号贴图都在第一次用到（画车）时才创建；轨迹由 src/trails.py 的 TrailRecorder 统一记录
+    """
+
+    __slots__ = (
+        "index", "car_img", "car_size_x", "car_size_y",
+        "radar_max_len", "wheelbase_px", "max_steer_deg", "max_steer_rad",
+        "position", "angle", "speed", "v_min", "v_max", "_steer_smoothed", "_vlimit_smooth",
+        "center", "corners", "prev_corners", "radar_xy", "radar_dists", "radar_count",
+        "alive", "distance", "time",
+        "_color", "_sprite", "_label"
+    )
+
+    radar_angles = RADAR_ANGLES
 
     def __init__(
             self,
@@ -57,63 +73,97 @@ class Car:
             v_max: float,
             start_facing_angle: int = 180
             ):
-        # 载入车贴图
-        base = pygame.image.load(car_img).convert_alpha()
-        base = pygame.transform.scale(base, (car_size_x, car_size_y))
-
-        # 基于 index 生成稳定的“随机颜色”，只给非透明部分上色
-        car_rgb = color_from_index(index)                        # 用上面的取色函数
-        self.color = car_rgb
-        self.sprite = tint_surface_flat(base, car_rgb) # 你现有的“保留 alpha 的上色”函数
-        self.rotated_sprite = self.sprite
-
         self.index = index
+        self.car_img = car_img
 
         self.car_size_x = car_size_x
         self.car_size_y = car_size_y
 
-        # === 字体与编号贴图 ===
-        # 字号按车高比例来，粗体更清晰
-        # font_size = max(14, int(self.car_size_y * 0.55))
-        font_size = 15
-        self._idx_font = pygame.font.SysFont("Arial", font_size, bold=True)
-        # 黑色文字
-        self._idx_surf = self._idx_font.render(str(self.index), True, (0, 0, 0))
-
         self.radar_max_len = radar_max_len
         self.wheelbase_px = wheelbase_px # 轴距
         self.max_steer_deg = max_steer_deg # 最大前轮转角（物理转向角，不是航向变化）
         self.max_steer_rad =  math.radians(max_steer_deg)
 
+        self.v_min = v_min
+        self.v_max = v_max
+
+        # 四角 / 雷达缓冲
+        self.corners = [0.0] * 8
+        self.prev_corners = [0.0] * 8
+        self.radar_xy = [0] * (2 * len(RADAR_ANGLES))
+        self.radar_dists = [0] * len(RADAR_ANGLES)
+
+        self.reset(start_position, start_facing_angle)
+
+        self._color = None
+        self._sprite = None
+        self._label = None
+
+    def reset(self, start_position: list[int, int], start_facing_angle: int = 180):
+        """回到起点重新开始（位姿、速度、平滑状态、雷达、存活、里程全部清零，缓冲原地复用）。"""
         # 初始位姿
-        self.position = start_position.copy()
+        self.position = list(start_position)
         self.angle = start_facing_angle  # 航向角（度）
         self.speed = 0.0
 
         # 缓存
-        self.v_min = v_min
-        self.v_max = v_max
         self._steer_smoothed = 0.0
-        self._vlimit_smooth  = v_max  # 平滑后的转向限速
+        self._vlimit_smooth = self.v_max  # 平滑后的转向限速
 
-        self.center = [self.position[0] + car_size_x / 2, self.position[1] + car_size_y / 2]
-
-        self.radars = []          # 雷达点
-        self.drawing_radars = []  # 可视化雷达
+        self.center = [self.position[0] + self.car_size_x / 2, self.position[1] + self.car_size_y / 2]
+        self.corners[:] = [0.0] * 8
+        self.prev_corners[:] = [0.0] * 8
+        self.radar_count = 0
         self.alive = True
 
         self.distance = 0.0  # 行驶距离（像素）
         self.time = 0        # 生存帧数
-        self.trail = []
 
-        self.radar_angles = list(range(-90, 120, 45))
+    # ---------- 只在画车时才用到的属性（第一次访问时创建） ----------
+    @property
+    def color(self):
+        # 基于 index 生成稳定的“随机颜色”，只给非透明部分上色
+        if self._color is None:
+            self._color = color_from_index(self.index)
+        return self._color
+
+    @property
+    def sprite(self) -> pygame.Surface:
+        # 载入车贴图并上色（按 图片/尺寸/颜色 缓存，同色车共用一个 Surface）
+        if self._sprite is None:
+            self._sprite = get_car_sprite(self.car_img, (self.car_size_x, self.car_size_y), self.color)
+        return self._sprite
+
+    @property
+    def label(self) -> pygame.Surface:
+        # 车身中央的编号（黑色粗体，按 文字/字体/颜色 缓存）
+        if self._label is None:
+            self._label = get_label(str(self.index), _LABEL_FONT, (0, 0, 0))
+        return self._label
+
+    # ---------- 雷达缓冲 ----------
+    def clear_radars(self):
+        self.radar_count = 0
+
+    def add_radar(self, x: int, y: int, dist: int):
+        k = self.radar_count
+        self.radar_xy[2 * k] = x
+        self.radar_xy[2 * k + 1] = y
+        self.radar_dists[k] = dist
+        self.radar_count = k + 1
+
+    @property
+    def radars(self) -> list:
+        """[[(x, y), 距离], ...]，画雷达 / 调试用（每次调用新建列表）。"""
+        xy = self.radar_xy
+        return [[(xy[2 * k], xy[2 * k + 1]), self.radar_dists[k]] for k in range(self.radar_count)]
 
     def get_data(self, normalization_denominator: int=30, speed_norm: float=4.5):
-        radars = self.radars
         input_size = len(self.radar_angles) # + 1
         ret = [0] * input_size
-        for i, radar in enumerate(radars):
-            ret[i] = int(radar[1] / normalization_denominator)
+        dists = self.radar_dists
+        for i in range(self.radar_count):
+            ret[i] = int(dists[i] / normalization_denominator)
         # ret[-1] = self.speed / speed_norm
         return ret
     
@@ -121,6 +171,86 @@ class Car:
         return self.alive
 
 
+class CarBatch:
+    """
+    整个种群的车辆状态，按 struct-of-arrays 存成 NumPy 数组，
+    配合 Track.update_batch_kinematics 一次调用推进所有车。
+    参数含义与 Car 相同；所有车同一起点、同一朝向。
+    """
+
+    def __init__(
+            self,
+            n: int,
+            car_size_x: int,
+            car_size_y: int,
+            wheelbase_px: float,
+            max_steer_deg: float,
+            start_position: list[int, int],
+            radar_max_len: int,
+            v_min: float,
+            v_max: float,
+            start_facing_angle: int = 180
+            ):
+        self.n = n
+        self.car_size_x = car_size_x
+        self.car_size_y = car_size_y
+        self.radar_max_len = radar_max_len
+        self.wheelbase_px = wheelbase_px
+        self.max_steer_deg = max_steer_deg
+        self.max_steer_rad = math.radians(max_steer_deg)
+        self.v_min = v_min
+        self.v_max = v_max
+        self.radar_angles = list(RADAR_ANGLES)
+
+        # 位姿与速度
+        self.x = np.full(n, float(start_position[0]))
+        self.y = np.full(n, float(start_position[1]))
+        self.angle = np.full(n, float(start_facing_angle))
+        self.speed = np.zeros(n)
+        self.steer_cmd = np.zeros(n)  # 上一步网络给出的转向 / 加速指令（轨迹录制用，见 src/recording.py）
+        self.accel_cmd = np.zeros(n)
+
+        # 缓存
+        self._steer_smoothed = np.zeros(n)
+        self._vlimit_smooth = np.full(n, float(v_max))
+
+        self.center_x = self.x + car_size_x / 2
+        self.center_y = self.y + car_size_y / 2
+        self.corners = np.zeros((n, 4, 2))
+
+        # 雷达：每束的终点和距离；第一帧之前没有读数（与 Car.radars 为空时 get_data 全 0 一致）
+        k = len(self.radar_angles)
+        self.radar_points = np.zeros((n, k, 2), dtype=np.int64)
+        self.radar_dists = np.zeros((n, k), dtype=np.int64)
+        self.alive = np.ones(n, dtype=bool)
+        self.stalled = np.zeros(n, dtype=bool)  # 因为没有进展被提前淘汰（不算撞墙）
+        self.finished = np.zeros(n, dtype=bool)  # 跑完规定圈数后停下（见 LapTracker）
+
+        self.distance = np.zeros(n)  # 行驶距离（像素）
+        self.time = np.zeros(n)  # 生存帧数（dt 可以不是整数帧）
+
+    def get_data(self, normalization_denominator: int=30, speed_norm: float=4.5) -> np.ndarray:
+        """所有车的网络输入，形状 (n, 雷达数)，与 Car.get_data 的取整方式一致。"""
+        return self.radar_dists // normalization_denominator
+
+    def write_back(self, cars: list[Car]):
+        """把数组里的状态同步回 Car 对象（只在需要画车时调用）。"""
+        for i, car in enumerate(cars):
+            car.position = [float(self.x[i]), float(self.y[i])]
+            car.angle = float(self.angle[i])
+            car.speed = float(self.speed[i])
+            car._steer_smoothed = float(self._steer_smoothed[i])
+            car._vlimit_smooth = float(self._vlimit_smooth[i])
+            car.center = [float(self.center_x[i]), float(self.center_y[i])]
+            car.corners[:] = self.corners[i].ravel().tolist()
+            car.radar_xy[:] = self.radar_points[i].ravel().tolist()
+            car.radar_dists[:] = self.radar_dists[i].tolist()
+            car.radar_count = len(car.radar_dists)
+            car.alive = bool(self.alive[i])
+            car.distance = float(self.distance[i])
+            car.time = float(self.time[i])
+
+
 class Track:
     def __init__(
             self,
@@ -130,8 +260,17 @@ class Track:
             v_turn_floor: float,
             limit_smooth_alpha: float,
             turn_exp: float,
+            accel_per_step: float,
+            brake_per_step: float,
+            alpha_steer: float,
             border_color: tuple[int, int, int, int]=(255, 255, 255, 255),
-
+            headless: bool = False,
+            sprite_angle_step: float = 1.0,
+            dt: float = 1.0,
+            substeps: int = 1,
+            swept_collision: bool = False,
+            cache_dir: str = None,
+            compiled_map: CompiledMap = None
             ):
         self.map = map
         self.width = map_width
@@ -141,119 +280,423 @@ class Track:
         self.limit_smooth_alpha = limit_smooth_alpha
         self.turn_exp = turn_exp
         self.border_color = border_color
-        self.map_surface = pygame.image.load(self.map).convert()
-
-    def draw_car(self, screen, car: Car, plot_radar=False):
+        self.headless = headless
+        self.cache_dir = cache_dir  # 地图编译产物的磁盘缓存目录（见 src/map_compiler.py），None = 只在进程内缓存
+        # 底图只在需要画的时候才加载；无头模式（甚至没有初始化 pygame 视频的进程）完全不需要它
+        self._map_surface = None
+        if not headless:
+            self._map_surface = pygame.image.load(self.map).convert()
+
+        # 墙体掩码 + 距离场 + 进度场：每张地图只编译一次（每代都会新建 Track，所以按地图缓存在进程里），
+        # 有 cache_dir 时从磁盘产物内存映射；直接传入 compiled_map（例如 worker 里挂上的共享内存数据）时不再加载。
+        # 碰撞和雷达全部查这两个数组，不再调用 Surface.get_at
+        self.compiled_map = compiled_map if compiled_map is not None else self._load_compiled_map()
+        self.wall_mask, self.wall_dist = self.compiled_map.wall_mask, self.compiled_map.wall_dist
+
+        # 旋转贴图缓存（跨代共用）；sprite_angle_step <= 0 时每帧精确旋转
+        if sprite_angle_step not in Track._ROTATION_CACHES:
+            Track._ROTATION_CACHES[sprite_angle_step] = RotatedSpriteCache(sprite_angle_step)
+        self.rotation_cache = Track._ROTATION_CACHES[sprite_angle_step]
+
+        # 积分器：每次 update_*_kinematics 推进 dt 帧（网络指令在这段时间内不变），
+        # 分 substeps 个子步积分，每个子步 h = dt / substeps 帧。
+        # swept_collision 时检查四角在每个子步里扫过的线段，而不只是终点，速度再高也不会穿墙。
+        # dt = 1、substeps = 1 时与逐帧积分逐位一致。
+        self.dt = float(dt)
+        self.substeps = max(1, int(substeps))
+        self.swept_collision = swept_collision
+        h = self.dt / self.substeps
+        self._h = h
+        # 加减速 / 转向平滑由调用方传入（一般是 SimSettings.track_kwargs()，见 src/settings.py）。
+        # 低通平滑按时间换算：h 帧等价于 h 次每帧平滑
+        self.accel_per_step = accel_per_step
+        self.brake_per_step = brake_per_step
+        self.alpha_steer = alpha_steer
+        self._alpha_steer = alpha_steer if h == 1.0 else 1.0 - (1.0 - alpha_steer) ** h
+        self._alpha_limit = limit_smooth_alpha if h == 1.0 else 1.0 - (1.0 - limit_smooth_alpha) ** h
+        self._accel_step = accel_per_step * h
+        self._brake_step = brake_per_step * h
+
+    _COMPILED_MAPS = {}
+    _ROTATION_CACHES = {}
+
+    def _load_compiled_map(self) -> CompiledMap:
+        key = (self.map, tuple(self.border_color), self.cache_dir)
+        if key not in Track._COMPILED_MAPS:
+            Track._COMPILED_MAPS[key] = compile_map(self.map, self.border_color, self.cache_dir)
+        return Track._COMPILED_MAPS[key]
+
+    def progress_index(self, start_center, start_angle: float) -> ProgressIndex:
+        """从 start_center 朝 start_angle 出发的赛道进度场（见 src/progress.py），按地图 / 起点缓存。"""
+        return self.compiled_map.progress(start_center, start_angle)
+
+    @property
+    def map_surface(self) -> pygame.Surface:
+        if self._map_surface is None:
+            surface = pygame.image.load(self.map)
+            # 有显示窗口时 convert 成显示格式，blit 更快
+            self._map_surface = surface.convert() if pygame.display.get_surface() is not None else surface
+        return self._map_surface
+
+    def draw_car(self, screen, car: Car, plot_radar=False) -> pygame.Rect:
+        """返回这一次画到的屏幕区域（脏矩形渲染时下一帧擦掉它）。"""
         rotated = self.rotate_center(car.sprite, car.angle)
-        screen.blit(rotated, car.position)
+        rect = screen.blit(rotated, car.position)
         # 贴编号（正中央）
-        label_rect = car._idx_surf.get_rect(center=(int(car.center[0]), int(car.center[1])))
-        screen.blit(car._idx_surf, label_rect)
+        label = car.label
+        rect.union_ip(screen.blit(label, label.get_rect(center=(int(car.center[0]), int(car.center[1])))))
 
         if plot_radar:
-            self.draw_radar(screen, car)
+            rect.union_ip(self.draw_radar(screen, car))
+        return rect
 
-    def draw_radar(self, screen, car: Car):
+    def draw_radar(self, screen, car: Car) -> pygame.Rect:
+        rect = pygame.Rect(int(car.center[0]), int(car.center[1]), 0, 0)
         for radar in car.radars:
             pos = radar[0]
-            pygame.draw.line(screen, (0, 255, 0), car.center, pos, 1)
-            pygame.draw.circle(screen, (0, 255, 0), pos, 5)
+            rect.union_ip(pygame.draw.line(screen, (0, 255, 0), car.center, pos, 1))
+            rect.union_ip(pygame.draw.circle(screen, (0, 255, 0), pos, 5))
+        return rect
 
     def check_collision(self, car: Car):
         car.alive = True
-        for point in car.corners:
-            if self.map_surface.get_at((int(point[0]), int(point[1]))) == self.border_color:
+        wall_mask = self.wall_mask
+        w, h = wall_mask.shape
+        c = car.corners
+        for j in range(0, 8, 2):
+            x, y = int(c[j]), int(c[j + 1])
+            if not (0 <= x < w and 0 <= y < h) or wall_mask[x, y]:
                 car.alive = False
                 break
 
-    def check_radar(self, degree: int, car: Car):
+    def check_swept_collision(self, car: Car, old_corners: list):
+        """四角从 old_corners 走到 car.corners 的线段上，每隔不到 1 px 采一个点查墙（终点与 check_collision 相同）。"""
+        car.alive = True
+        wall_mask = self.wall_mask
+        w, h = wall_mask.shape
+        new_corners = car.corners
+        for j in range(0, 8, 2):
+            x0, y0, x1, y1 = old_corners[j], old_corners[j + 1], new_corners[j], new_corners[j + 1]
+            dx, dy = x1 - x0, y1 - y0
+            n = max(1, math.ceil(max(abs(dx), abs(dy))))
+            for k in range(1, n):
+                x, y = int(x0 + dx * k / n), int(y0 + dy * k / n)
+                if not (0 <= x < w and 0 <= y < h) or wall_mask[x, y]:
+                    car.alive = False
+                    return
+            x, y = int(x1), int(y1)
+            if not (0 <= x < w and 0 <= y < h) or wall_mask[x, y]:
+                car.alive = False
+                return
+
+    def check_radar(self, degree: int, car: Car, profiler=NULL_PROFILER):
+        """
+        与 check_radar_pixelwise 逐像素结果完全一致，但用距离场跳步（sphere tracing）：
+        当前采样像素到墙的棋盘距离为 d 时，后面 d-1 个采样点一定不会碰墙，直接跳到第 d 个。
+        跳步次数记到 profiler 的 radar_steps 上。
+        """
+        rad = math.radians(360 - (car.angle + degree))
+        cos_a = math.cos(rad)
+        sin_a = math.sin(rad)
+        cx, cy = car.center
+        max_len = car.radar_max_len
+        wall_mask = self.wall_mask
+        wall_dist = self.wall_dist
+
+        w, h = wall_mask.shape
+
+        length = 0
+        steps = 0
+        x = int(cx + cos_a * length)
+        y = int(cy + sin_a * length)
+
+        # 出了地图算碰到墙（numpy 的负下标会绕到地图另一边去读）
+        while 0 <= x < w and 0 <= y < h and not wall_mask[x, y] and length < max_len:
+            length = min(max_len, length + max(1, int(wall_dist[x, y])))
+            x = int(cx + cos_a * length)
+            y = int(cy + sin_a * length)
+            steps += 1
+        profiler.count("radar_steps", steps)
+
+        car.add_radar(x, y, int(math.sqrt((x - cx) ** 2 + (y - cy) ** 2)))
+
+    def check_radar_pixelwise(self, degree: int, car: Car):
+        """原始的逐像素射线步进，保留作对照 / 基准测试用。"""
+        wall_mask = self.wall_mask
+        w, h = wall_mask.shape
         length = 0
         x = int(car.center[0] + math.cos(math.radians(360 - (car.angle + degree))) * length)
         y = int(car.center[1] + math.sin(math.radians(360 - (car.angle + degree))) * length)
 
-        while not self.map_surface.get_at((x, y)) == self.border_color and length < car.radar_max_len:
+        while 0 <= x < w and 0 <= y < h and not wall_mask[x, y] and length < car.radar_max_len:
             length += 1
             x = int(car.center[0] + math.cos(math.radians(360 - (car.angle + degree))) * length)
             y = int(car.center[1] + math.sin(math.radians(360 - (car.angle + degree))) * length)
 
-        dist = int(math.sqrt((x - car.center[0]) ** 2 + (y - car.center[1]) ** 2))
-        car.radars.append([(x, y), dist])
+        car.add_radar(x, y, int(math.sqrt((x - car.center[0]) ** 2 + (y - car.center[1]) ** 2)))
+
+
+    def update_car_kinematics(self, car: Car, steer_cmd: float, accel_cmd: float, profiler=NULL_PROFILER):
+        """推进一辆车 dt 帧（substeps 个子步），撞墙后剩下的子步不再推进；最后测一次雷达。"""
+        h = self._h
+        for _ in range(self.substeps):
+            t = profiler.tic()
+            self._integrate_car(car, steer_cmd, accel_cmd, h)
+            t = profiler.toc("kinematics", t)
+
+            # 碰撞（还没走过一步的车没有上一步的四角，只查终点）
+            if self.swept_collision and car.time > 0:
+                self.check_swept_collision(car, car.prev_corners)
+            else:
+                self.check_collision(car)
+            t = profiler.toc("collision", t)
+
+            # 数据累计
+            car.distance += car.speed * h
+            car.time += h
+            profiler.toc("kinematics", t)
+            if not car.alive:
+                break
 
+        # 雷达
+        t = profiler.tic()
+        car.clear_radars()  # 覆盖上一帧的雷达数据
+        for d in car.radar_angles:  # 重新发射 5 束雷达
+            self.check_radar(d, car, profiler)
+        profiler.toc("radar", t)
 
-    def update_car_kinematics(self, car: Car, steer_cmd: float, accel_cmd: float):
+    def _integrate_car(self, car: Car, steer_cmd: float, accel_cmd: float, h: float):
         # 转向平滑
-        car._steer_smoothed = (1 - ALPHA_STEER) * car._steer_smoothed + ALPHA_STEER * steer_cmd
+        car._steer_smoothed = (1 - self._alpha_steer) * car._steer_smoothed + self._alpha_steer * steer_cmd
 
         # 物理前轮转角 δ
         delta = car._steer_smoothed * car.max_steer_rad
         # 航向角变化（Kinematic Bicycle）
         psi_dot = (car.speed / car.wheelbase_px) * math.tan(delta)
-        car.angle = (car.angle + math.degrees(psi_dot)) % 360.0
+        car.angle = (car.angle + math.degrees(psi_dot) * h) % 360.0
 
         # 动态限速（随转向）+ 平滑下降 
         v_limit_inst = self.turn_speed_limit(car)
         # v_limit 做低通平滑，避免突然跳变
-        car._vlimit_smooth = (1 - self.limit_smooth_alpha) * getattr(car, "_vlimit_smooth", car.v_max) \
-                             + self.limit_smooth_alpha * v_limit_inst
+        car._vlimit_smooth = (1 - self._alpha_limit) * getattr(car, "_vlimit_smooth", car.v_max) \
+                             + self._alpha_limit * v_limit_inst
         v_limit = car._vlimit_smooth
 
         # 速度更新
         if accel_cmd >= 0.0:
-            car.speed += ACCEL_PER_STEP * accel_cmd
+            car.speed += self._accel_step * accel_cmd
             car.speed = min(car.speed, car.v_max)
         else:
-            car.speed += ACCEL_PER_STEP * accel_cmd
+            car.speed += self._accel_step * accel_cmd
             car.speed = max(car.v_min, car.speed)
 
         # 若超出限速，按固定刹车率渐进下降（不会瞬间砍到限速）
         if car.speed > v_limit:
-            car.speed = max(v_limit, car.speed - BRAKE_PER_STEP)
+            car.speed = max(v_limit, car.speed - self._brake_step)
 
         # 全局夹
         car.speed = max(car.v_min, min(car.v_max, car.speed))
 
         # 位移
-        car.position[0] += math.cos(math.radians(360 - car.angle)) * car.speed
-        car.position[1] += math.sin(math.radians(360 - car.angle)) * car.speed
+        car.position[0] += math.cos(math.radians(360 - car.angle)) * (car.speed * h)
+        car.position[1] += math.sin(math.radians(360 - car.angle)) * (car.speed * h)
         car.position[0] = max(20, min(self.width - 120, car.position[0]))
         car.position[1] = max(20, min(self.height - 120, car.position[1]))
 
-        # 中心 & 四角
-        car.center = [int(car.position[0]) + car.car_size_x / 2, int(car.position[1]) + car.car_size_y / 2]
+        # 中心 & 四角（写进另一块缓冲，再和当前四角轮换，上一帧的四角留在 prev_corners）
+        cx = int(car.position[0]) + car.car_size_x / 2
+        cy = int(car.position[1]) + car.car_size_y / 2
+        center = car.center
+        center[0] = cx
+        center[1] = cy
         length = 0.5 * car.car_size_x
-        lt = [car.center[0] + math.cos(math.radians(360 - (car.angle + 30))) * length,
-              car.center[1] + math.sin(math.radians(360 - (car.angle + 30))) * length]
-        rt = [car.center[0] + math.cos(math.radians(360 - (car.angle + 150))) * length,
-              car.center[1] + math.sin(math.radians(360 - (car.angle + 150))) * length]
-        lb = [car.center[0] + math.cos(math.radians(360 - (car.angle + 210))) * length,
-              car.center[1] + math.sin(math.radians(360 - (car.angle + 210))) * length]
-        rb = [car.center[0] + math.cos(math.radians(360 - (car.angle + 330))) * length,
-              car.center[1] + math.sin(math.radians(360 - (car.angle + 330))) * length]
-        car.corners = [lt, rt, lb, rb]
-
-        # 碰撞
-        self.check_collision(car)
+        angle = car.angle
+        c = car.prev_corners
+        c[0] = cx + math.cos(math.radians(360 - (angle + 30))) * length   # lt
+        c[1] = cy + math.sin(math.radians(360 - (angle + 30))) * length
+        c[2] = cx + math.cos(math.radians(360 - (angle + 150))) * length  # rt
+        c[3] = cy + math.sin(math.radians(360 - (angle + 150))) * length
+        c[4] = cx + math.cos(math.radians(360 - (angle + 210))) * length  # lb
+        c[5] = cy + math.sin(math.radians(360 - (angle + 210))) * length
+        c[6] = cx + math.cos(math.radians(360 - (angle + 330))) * length  # rb
+        c[7] = cy + math.sin(math.radians(360 - (angle + 330))) * length
+        car.prev_corners = car.corners
+        car.corners = c
+
+    def get_reward(self, car: Car):
+        return (car.distance / (car.car_size_x / 2)) / car.time
+
+    # ===================== 批量（整个种群一次）版本 =====================
+    # 与上面的单车版本逐项对应，数值上一致（同样的 IEEE 运算顺序）
+
+    def update_batch_kinematics(self, batch: CarBatch, steer_cmd: np.ndarray, accel_cmd: np.ndarray,
+                                profiler=NULL_PROFILER):
+        """
+        推进 batch 中所有存活的车 dt 帧（substeps 个子步）；死车保持不动。steer_cmd / accel_cmd 形状为 (n,)。
+        子步里撞墙的车后面的子步不再推进；雷达在最后测一次（本次刚撞墙的车也测，与单车版一致）。
+        """
+        idx = np.flatnonzero(batch.alive)
+        if len(idx) == 0:
+            return
+        started = idx
+        steer_cmd = steer_cmd[idx]
+        accel_cmd = accel_cmd[idx]
+        h = self._h
+
+        for _ in range(self.substeps):
+            t = profiler.tic()
+            # 还没走过一步的车没有上一步的四角，扫掠退化为只查终点
+            old_corners = batch.corners[idx]
+            fresh = batch.time[idx] == 0
+            speed = self._integrate_batch(batch, idx, steer_cmd, accel_cmd, h)
+            t = profiler.toc("kinematics", t)
+
+            # 碰撞
+            if self.swept_collision:
+                new_corners = batch.corners[idx]
+                old_corners[fresh] = new_corners[fresh]
+                hit = self.swept_hits(old_corners, new_corners)
+            else:
+                hit = self.corner_hits(batch.corners[idx])
+            batch.alive[idx] = ~hit
+            t = profiler.toc("collision", t)
+
+            # 数据累计
+            batch.distance[idx] += speed * h
+            batch.time[idx] += h
+            profiler.toc("kinematics", t)
+
+            if hit.any():
+                keep = ~hit
+                idx, steer_cmd, accel_cmd = idx[keep], steer_cmd[keep], accel_cmd[keep]
+                if len(idx) == 0:
+                    break
 
         # 雷达
-        car.radars.clear()  # 清空上一帧的雷达数据 
-        for d in car.radar_angles:  # 重新发射 5 束雷达
-            self.check_radar(d, car)
+        t = profiler.tic()
+        self.check_radar_batch(batch, started, profiler)
+        profiler.toc("radar", t)
 
-        # 数据累计
-        car.distance += car.speed
-        car.time += 1
+    def _integrate_batch(self, batch: CarBatch, idx: np.ndarray, steer_cmd: np.ndarray, accel_cmd: np.ndarray,
+                         h: float) -> np.ndarray:
+        """一个子步的运动学（h 帧），写回 idx 这些车的状态和四角，返回新的速度。"""
+        # 转向平滑
+        steer = (1 - self._alpha_steer) * batch._steer_smoothed[idx] + self._alpha_steer * steer_cmd
+        # 物理前轮转角 δ 与航向角变化（Kinematic Bicycle）
+        delta = steer * batch.max_steer_rad
+        speed = batch.speed[idx]
+        psi_dot = (speed / batch.wheelbase_px) * np.tan(delta)
+        angle = (batch.angle[idx] + np.degrees(psi_dot) * h) % 360.0
+
+        # 动态限速（随转向）+ 平滑下降
+        x_norm = np.minimum(1.0, np.abs(delta) / batch.max_steer_rad)
+        v_limit_inst = self.v_turn_floor + (batch.v_max - self.v_turn_floor) * (1.0 - (x_norm ** self.turn_exp))
+        v_limit = (1 - self._alpha_limit) * batch._vlimit_smooth[idx] + self._alpha_limit * v_limit_inst
 
-    def get_reward(self, car: Car):
-        return (car.distance / (car.car_size_x / 2)) / car.time
+        # 速度更新
+        speed = speed + self._accel_step * accel_cmd
+        speed = np.where(accel_cmd >= 0.0, np.minimum(speed, batch.v_max), np.maximum(batch.v_min, speed))
+        # 超出限速按固定刹车率渐进下降
+        speed = np.where(speed > v_limit, np.maximum(v_limit, speed - self._brake_step), speed)
+        # 全局夹
+        speed = np.maximum(batch.v_min, np.minimum(batch.v_max, speed))
+
+        # 位移
+        heading = np.radians(360 - angle)
+        x = batch.x[idx] + np.cos(heading) * (speed * h)
+        y = batch.y[idx] + np.sin(heading) * (speed * h)
+        x = np.maximum(20, np.minimum(self.width - 120, x))
+        y = np.maximum(20, np.minimum(self.height - 120, y))
+
+        # 中心 & 四角
+        center_x = np.trunc(x) + batch.car_size_x / 2
+        center_y = np.trunc(y) + batch.car_size_y / 2
+        length = 0.5 * batch.car_size_x
+        corners = np.empty((len(idx), 4, 2))
+        for j, offset in enumerate((30, 150, 210, 330)):
+            rad = np.radians(360 - (angle + offset))
+            corners[:, j, 0] = center_x + np.cos(rad) * length
+            corners[:, j, 1] = center_y + np.sin(rad) * length
+
+        batch._steer_smoothed[idx] = steer
+        batch._vlimit_smooth[idx] = v_limit
+        batch.angle[idx] = angle
+        batch.speed[idx] = speed
+        batch.x[idx] = x
+        batch.y[idx] = y
+        batch.center_x[idx] = center_x
+        batch.center_y[idx] = center_y
+        batch.corners[idx] = corners
+        return speed
+
+    def wall_at(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """整数坐标数组处是否为墙；出了地图的坐标算墙（numpy 的负下标会绕到地图另一边，不能直接索引）。"""
+        wall_mask = self.wall_mask
+        w, h = wall_mask.shape
+        inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+        if inside.all():
+            return wall_mask[x, y]
+        hit = np.ones(x.shape, dtype=bool)
+        hit[inside] = wall_mask[x[inside], y[inside]]
+        return hit
+
+    def corner_hits(self, corners: np.ndarray) -> np.ndarray:
+        """corners 形状 (m, 4, 2)；返回每辆车是否有角落在墙上（或出了地图）。"""
+        corners = np.trunc(corners).astype(np.int64)
+        return self.wall_at(corners[:, :, 0], corners[:, :, 1]).any(axis=1)
+
+    def swept_hits(self, old_corners: np.ndarray, new_corners: np.ndarray) -> np.ndarray:
+        """四角从 old 走到 new 的线段上每隔不到 1 px 采样查墙；终点与 corner_hits 完全相同。"""
+        delta = new_corners - old_corners
+        n = max(1, math.ceil(float(np.abs(delta).max(initial=0.0))))
+        hit = self.corner_hits(new_corners)
+        if n > 1:
+            fractions = np.arange(1, n) / n
+            points = old_corners[:, :, None, :] + delta[:, :, None, :] * fractions[None, None, :, None]
+            points = np.trunc(points).astype(np.int64)
+            hit |= self.wall_at(points[..., 0], points[..., 1]).any(axis=(1, 2))
+        return hit
+
+    def check_collision_batch(self, batch: CarBatch, idx: np.ndarray):
+        batch.alive[idx] = ~self.corner_hits(batch.corners[idx])
+
+    def check_radar_batch(self, batch: CarBatch, idx: np.ndarray, profiler=NULL_PROFILER):
+        """所有车、所有雷达束一起做距离场跳步；结果与 check_radar 逐束一致。"""
+        cx = batch.center_x[idx][:, None]
+        cy = batch.center_y[idx][:, None]
+        degrees = np.asarray(batch.radar_angles, dtype=np.float64)[None, :]
+        rad = np.radians(360 - (batch.angle[idx][:, None] + degrees))
+        cos_a = np.cos(rad)
+        sin_a = np.sin(rad)
+        max_len = batch.radar_max_len
+        wall_dist = self.wall_dist
+
+        length = np.zeros(rad.shape, dtype=np.int64)
+        x = np.trunc(cx + cos_a * length).astype(np.int64)
+        y = np.trunc(cy + sin_a * length).astype(np.int64)
+        active = ~self.wall_at(x, y) & (length < max_len)
+        while active.any():
+            if profiler.enabled:
+                profiler.count("radar_steps", np.count_nonzero(active))
+            step = np.maximum(1, wall_dist[x[active], y[active]])
+            length[active] = np.minimum(max_len, length[active] + step)
+            x = np.trunc(cx + cos_a * length).astype(np.int64)
+            y = np.trunc(cy + sin_a * length).astype(np.int64)
+            active = ~self.wall_at(x, y) & (length < max_len)
+
+        batch.radar_points[idx, :, 0] = x
+        batch.radar_points[idx, :, 1] = y
+        batch.radar_dists[idx] = np.trunc(np.sqrt((x - cx) ** 2 + (y - cy) ** 2)).astype(np.int64)
+
+    def get_batch_reward(self, batch: CarBatch) -> np.ndarray:
+        # 还没走过一步的车 time 为 0，奖励记 0（单车版本不会在这种时候调用）
+        time = np.where(batch.time > 0, batch.time, 1.0)
+        return (batch.distance / (batch.car_size_x / 2)) / time
 
     def rotate_center(self, image, angle):
-        rectangle = image.get_rect()
-        rotated_image = pygame.transform.rotate(image, angle)
-        rotated_rectangle = rectangle.copy()
-        rotated_rectangle.center = rotated_image.get_rect().center
-        rotated_image = rotated_image.subsurface(rotated_rectangle).copy()
-        return rotated_image
-    
+        # 角度量化后从缓存取，画一辆车只剩一次 blit
+        return self.rotation_cache.get(image, angle)
+
     def turn_speed_limit(self, car: Car):
         # 物理前轮转角 δ
         delta_rad = car._steer_smoothed * car.max_steer_rad
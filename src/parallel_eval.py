@@ -0,0 +1,257 @@
+import math
+import multiprocessing
+import time
+
+from src.my_env import Track
+from src.shared_track import (
+    SharedTrackData,
+    attach_shared_track
+)
+from src.simulation import (
+    build_population,
+    make_lap_tracker,
+    run_headless,
+    merge_summaries
+)
+
+
+# ===================== 多进程并行评估 =====================
+# 主进程编译一次地图（墙体掩码 / 距离场 / 需要时的进度场），拷进共享内存；
+# 每个 worker 进程启动时只挂上这份共享数据建无头 Track，不各自加载 / 计算。
+# 之后每代只收到一批基因组，跑完把 (gid, fitness) 和这一片的统计送回主进程。
+# 车与车之间互不影响、仿真本身是确定的，所以同一个种子下结果与 worker 数无关。
+
+_worker = {}
+
+
+def _init_worker(config, track_kwargs: dict, shared_track: dict, car_kwargs: dict, sim_kwargs: dict):
+    _worker["config"] = config
+    _worker["track"] = Track(headless=True, compiled_map=attach_shared_track(shared_track), **track_kwargs)
+    _worker["car_kwargs"] = car_kwargs
+    _worker["sim_kwargs"] = sim_kwargs
+
+
+def _split(genomes: list, n_shards: int) -> list:
+    n_shards = min(len(genomes), n_shards)
+    size = math.ceil(len(genomes) / n_shards) if n_shards else 0
+    return [genomes[i:i + size] for i in range(0, len(genomes), size)] if size else []
+
+
+def _start_center(car_kwargs: dict) -> tuple:
+    start = car_kwargs["start_position"]
+    return start[0] + car_kwargs["car_size_x"] / 2, start[1] + car_kwargs["car_size_y"] / 2
+
+
+def _evaluate_shard(genomes):
+    nets, batch, _ = build_population(genomes, _worker["config"], _worker["car_kwargs"])
+    summary = run_headless(_worker["track"], batch, nets, genomes, **_worker["sim_kwargs"])
+    return [(gid, g.fitness) for gid, g in genomes], summary
+
+
+class ParallelEvaluator:
+    """
+    把一代基因组分片后交给进程池评估，用法与 NEAT 的 eval_genomes 回调相同：
+        evaluator = ParallelEvaluator(8, config, track_kwargs, car_kwargs, sim_kwargs)
+        population.run(evaluator.evaluate, n)
+    sim_kwargs 直接传给 run_headless（normalization_denominator / speed_norm / max_frames / stall_* / max_cpu_seconds，
+    CPU 预算按每个分片在各自的 worker 里计时）。
+    每代评估完后 last_summary 为各分片合并后的统计（见 merge_summaries）。
+    """
+
+    def __init__(self, num_workers: int, config, track_kwargs: dict, car_kwargs: dict, sim_kwargs: dict,
+                 shards_per_worker: int = 2):
+        self.num_workers = num_workers
+        # 每个 worker 多分几片，早死光的分片不会让其它核空等
+        self.shards_per_worker = shards_per_worker
+        self.max_frames = sim_kwargs["max_frames"]
+        self.last_summary = None
+
+        track = Track(headless=True, **track_kwargs)
+        if sim_kwargs.get("fitness", "speed") != "speed" or sim_kwargs.get("target_laps", 0) > 0:
+            # 进度场也先在主进程算好（与 make_lap_tracker 取同一个起点中心），worker 直接共享
+            track.progress_index(_start_center(car_kwargs), car_kwargs.get("start_facing_angle", 180))
+        self.shared_track = SharedTrackData(track.compiled_map)
+        self.pool = multiprocessing.Pool(
+            processes=num_workers,
+            initializer=_init_worker,
+            initargs=(config, track_kwargs, self.shared_track.handle, car_kwargs, sim_kwargs)
+        )
+
+    def evaluate(self, genomes, config=None):
+        genomes = list(genomes)
+        shards = _split(genomes, self.num_workers * self.shards_per_worker)
+
+        t0 = time.perf_counter()
+        fitness = {}
+        summaries = []
+        for result, summary in self.pool.map(_evaluate_shard, shards):
+            fitness.update(result)
+            summaries.append(summary)
+        for gid, g in genomes:
+            g.fitness = fitness[gid]
+        self.last_summary = merge_summaries(summaries, time.perf_counter() - t0, self.max_frames)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.shared_track.close()
+
+    def terminate(self):
+        """被中断（Ctrl-C）时直接结束 worker，不等正在跑的分片。"""
+        self.pool.terminate()
+        self.pool.join()
+        self.shared_track.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ===================== 多地图评估 =====================
+# 每个基因组先在第一张图（MAP）上跑，最远进度达到 gate_laps 圈的才在其余地图上跑，没过的在其余地图上记 0 分；
+# fitness = 各图得分的平均。训练早期几乎没有基因组过关，多地图评估的开销和单图差不多。
+# 所有地图在主进程里编译好（各自起点的进度场也算好），拷进共享内存，每个 worker 启动时全部挂上；
+# 第一张图按分片 fan-out 出去，回来后过关的基因组按 (地图, 分片) 一次性 fan-out 到所有 worker。
+# num_workers <= 1 时不开进程池，在主进程里按同样的顺序跑，结果与 worker 数无关。
+
+
+def _run_map(track: Track, config, car_kwargs: dict, sim_kwargs: dict, genomes) -> tuple:
+    """在一张图上跑一批基因组，返回 ([(gid, fitness, 最远进度（圈）)], 统计)。"""
+    nets, batch, _ = build_population(genomes, config, car_kwargs)
+    laps = make_lap_tracker(track, batch, sim_kwargs.get("fitness", "speed"), sim_kwargs.get("target_laps", 0),
+                            sim_kwargs.get("n_sectors", 3), sim_kwargs["max_frames"], track_progress=True)
+    summary = run_headless(track, batch, nets, genomes, laps=laps, **sim_kwargs)
+    return [(gid, g.fitness, best) for (gid, g), best in zip(genomes, laps.best.tolist())], summary
+
+
+def _init_map_worker(config, stages: list):
+    _worker["config"] = config
+    _worker["stages"] = [
+        (Track(headless=True, compiled_map=attach_shared_track(shared_track), **track_kwargs), car_kwargs, sim_kwargs)
+        for track_kwargs, shared_track, car_kwargs, sim_kwargs in stages
+    ]
+
+
+def _evaluate_map_shard(task):
+    stage, genomes = task
+    track, car_kwargs, sim_kwargs = _worker["stages"][stage]
+    return (stage, *_run_map(track, _worker["config"], car_kwargs, sim_kwargs, genomes))
+
+
+class MultiMapEvaluator:
+    """
+    多张地图一起评估，用法同 ParallelEvaluator：
+        stages = [dict(track_kwargs=..., car_kwargs=..., sim_kwargs=...), ...]   # 每张图一份，第一张用来筛选
+        evaluator = MultiMapEvaluator(8, config, stages, gate_laps=0.5)
+        population.run(evaluator.evaluate, n)
+    第一张图已经在别处跑过时（训练的预览代在窗口里跑），用 evaluate_rest 只评估其余地图。
+    每代之后 last_summaries 为各图的统计（没有基因组过关的图为 None），last_passed 为过关的基因组数。
+    """
+
+    def __init__(self, num_workers: int, config, stages: list[dict], gate_laps: float = 0.5,
+                 shards_per_worker: int = 2):
+        self.num_workers = num_workers
+        self.config = config
+        self.stages = stages
+        self.gate_laps = gate_laps
+        self.shards_per_worker = shards_per_worker
+        self.last_summaries = []
+        self.last_passed = 0
+
+        # 每张图只编译 / 算进度场一次（TRACK_CACHE_DIR 下各有各的缓存），之后主进程和 worker 都直接用
+        self.tracks = []
+        for stage in stages:
+            track = Track(headless=True, **stage["track_kwargs"])
+            car_kwargs = stage["car_kwargs"]
+            track.progress_index(_start_center(car_kwargs), car_kwargs.get("start_facing_angle", 180))
+            self.tracks.append(track)
+
+        self.shared_tracks = []
+        self.pool = None
+        if num_workers > 1:
+            self.shared_tracks = [SharedTrackData(track.compiled_map) for track in self.tracks]
+            self.pool = multiprocessing.Pool(
+                processes=num_workers,
+                initializer=_init_map_worker,
+                initargs=(config, [(stage["track_kwargs"], shared.handle, stage["car_kwargs"], stage["sim_kwargs"])
+                                   for stage, shared in zip(stages, self.shared_tracks)])
+            )
+
+    @property
+    def last_summary(self) -> dict:
+        """第一张图的统计。"""
+        return self.last_summaries[0] if self.last_summaries else None
+
+    def _shards(self, genomes: list) -> list:
+        if self.pool is None:
+            return [genomes] if genomes else []
+        return _split(genomes, self.num_workers * self.shards_per_worker)
+
+    def _run(self, tasks: list) -> list:
+        """tasks 为 [(地图号, 一片基因组)]；返回每张图的 ({gid: (fitness, 最远进度)}, [各片统计])。"""
+        results = [({}, []) for _ in self.stages]
+        if self.pool is None:
+            outputs = ((s, *_run_map(self.tracks[s], self.config, self.stages[s]["car_kwargs"],
+                                     self.stages[s]["sim_kwargs"], shard)) for s, shard in tasks)
+        else:
+            outputs = self.pool.imap_unordered(_evaluate_map_shard, tasks)
+        for s, scores, summary in outputs:
+            results[s][0].update((gid, (fitness, best)) for gid, fitness, best in scores)
+            results[s][1].append(summary)
+        return results
+
+    def evaluate(self, genomes, config=None):
+        genomes = list(genomes)
+        t0 = time.perf_counter()
+        first, summaries = self._run([(0, shard) for shard in self._shards(genomes)])[0]
+        for gid, g in genomes:
+            g.fitness = first[gid][0]
+        self.evaluate_rest(genomes, [first[gid][1] for gid, _ in genomes],
+                           merge_summaries(summaries, time.perf_counter() - t0,
+                                           self.stages[0]["sim_kwargs"]["max_frames"]))
+
+    def evaluate_rest(self, genomes, progress, first_summary: dict = None):
+        """
+        第一张图已经跑完：g.fitness 为第一张图的得分，progress 为各基因组在上面的最远进度（圈，与 genomes 同序）。
+        过关的基因组在其余地图上跑，最后 g.fitness 换成各图得分的平均。
+        """
+        genomes = list(genomes)
+        first_scores = [g.fitness for _, g in genomes]  # 主进程里跑其余地图会把 g.fitness 清零重算
+        passed = [pair for pair, best in zip(genomes, progress) if best >= self.gate_laps]
+
+        t0 = time.perf_counter()
+        tasks = [(s, shard) for s in range(1, len(self.stages)) for shard in self._shards(passed)]
+        results = self._run(tasks)
+        seconds = time.perf_counter() - t0
+
+        for (gid, g), score in zip(genomes, first_scores):
+            total = score + sum(scores[gid][0] for scores, _ in results[1:] if gid in scores)
+            g.fitness = total / len(self.stages)
+        self.last_passed = len(passed)
+        self.last_summaries = [first_summary] + [
+            merge_summaries(summaries, seconds, stage["sim_kwargs"]["max_frames"]) if summaries else None
+            for stage, (_, summaries) in zip(self.stages[1:], results[1:])
+        ]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+        for shared in self.shared_tracks:
+            shared.close()
+
+    def terminate(self):
+        """被中断（Ctrl-C）时直接结束 worker，不等正在跑的分片。"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+        for shared in self.shared_tracks:
+            shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
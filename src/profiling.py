@@ -0,0 +1,137 @@
+import csv
+import json
+import os
+import time
+
+
+# ===================== 分阶段计时 =====================
+# 主循环里按 “打点” 的方式计时，一帧里各阶段首尾相接：
+#     t = profiler.tic()
+#     ...推理...
+#     t = profiler.toc("inference", t)
+#     ...动力学...
+#     t = profiler.toc("kinematics", t)
+# 关掉时用 NULL_PROFILER，每个打点只剩一次空方法调用。
+# 每代结束调用 end_generation 得到一行统计，并可追加写到 CSV / JSON Lines 文件里做跨次运行的趋势对比。
+
+PHASES = ("inference", "kinematics", "collision", "radar", "reward", "stall", "render", "tick")
+COUNTERS = ("radar_steps",)
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, output: str = None, run_id: str = None):
+        """
+        output：每代统计追加写入的文件，按扩展名选格式（.csv / .json / .jsonl），None = 不写文件。
+        run_id：写进每一行，区分不同次运行；默认用启动时间。
+        """
+        self.output = output
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+        self.history = []
+        self._reset()
+
+    def _reset(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.frames = 0
+        self.car_steps = 0
+        self._start = time.perf_counter()
+
+    def start_generation(self):
+        """清零计数并重新开始计墙钟时间（不调用时从上一代结束算起）。"""
+        self._reset()
+
+    def tic(self) -> float:
+        return time.perf_counter()
+
+    def toc(self, phase: str, t0: float) -> float:
+        """把 t0 到现在的时间记到 phase 上，返回现在的时间（作为下一段的起点）。"""
+        now = time.perf_counter()
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + (now - t0)
+        return now
+
+    def count(self, name: str, n: int):
+        self.counts[name] = self.counts.get(name, 0) + int(n)
+
+    def frame(self, cars: int):
+        """每帧调用一次，cars 为本帧推进的车数。"""
+        self.frames += 1
+        self.car_steps += cars
+
+    def end_generation(self, generation: int, label: str = "") -> dict:
+        wall = time.perf_counter() - self._start
+        row = dict(
+            run_id=self.run_id,
+            label=label,
+            generation=generation,
+            frames=self.frames,
+            car_steps=self.car_steps,
+            wall_s=round(wall, 4),
+            car_steps_per_s=round(self.car_steps / wall, 1) if wall > 0 else 0.0
+        )
+        for phase, seconds in self.seconds.items():
+            row[f"{phase}_ms"] = round(seconds * 1e3, 3)
+        row.update(self.counts)
+        self.history.append(row)
+        if self.output:
+            append_rows(self.output, [row])
+        self._reset()
+        return row
+
+
+class NullProfiler:
+    """关闭计时时的替身：接口与 Profiler 相同，什么都不做。"""
+    enabled = False
+    history = []
+
+    def start_generation(self):
+        pass
+
+    def tic(self) -> float:
+        return 0.0
+
+    def toc(self, phase: str, t0: float) -> float:
+        return 0.0
+
+    def count(self, name: str, n: int):
+        pass
+
+    def frame(self, cars: int):
+        pass
+
+    def end_generation(self, generation: int, label: str = "") -> dict:
+        return None
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def make_profiler(enabled: bool, output: str = None):
+    return Profiler(output) if enabled else NULL_PROFILER
+
+
+def format_profile(row: dict) -> str:
+    frames = max(row["frames"], 1)
+    phases = " ".join(f"{p} {row[f'{p}_ms'] / frames:.3f}" for p in PHASES if row.get(f"{p}_ms"))
+    return (f"frames {row['frames']} | {row['car_steps_per_s']:.0f} car-steps/s | "
+            f"ms/frame: {phases} | radar steps {row.get('radar_steps', 0)}")
+
+
+def append_rows(path: str, rows: list[dict]):
+    """CSV：第一次写时带表头，之后按同样的列追加；.json / .jsonl：每行一个 JSON 对象。"""
+    if path.endswith(".csv"):
+        fieldnames = list(rows[0].keys())
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file:
+            with open(path, newline="", encoding="utf-8") as f:
+                fieldnames = next(csv.reader(f), fieldnames)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
@@ -0,0 +1,218 @@
+import math
+
+import numpy as np
+
+
+# ===================== 赛道进度（圈数 / 分段）索引 =====================
+# 原来的奖励 distance / time 只看跑得多快，原地高速转圈一样拿分。
+# 这里给每张地图预先算一张“进度场”：每个可行驶像素沿赛道离起跑线有多远。
+#   - 起跑线：过车的起点中心、垂直于起步朝向，两头一直画到墙，宽 3 px 把赛道切断
+#   - 从起跑线前方一侧出发做 8 邻域广度优先搜索（路程按棋盘距离计），起跑线本身挡住、不能直接绕回去
+#   - 起跑线后方紧挨着的像素的路程 ≈ 一圈长（lap_length）
+# 之后查一辆车的进度只需要一次数组下标：fraction = dist[x, y] / lap_length。
+# 进度值从接近 1 跳到接近 0 说明向前跨过了起跑线（圈数 +1），反过来是倒着跨过（圈数 -1）。
+# 进度场和墙体数据一起由 src/map_compiler.py 编译、缓存到磁盘。
+# 数组统一按 pygame 的 [x, y] 下标（和 wall_mask 一致）。
+
+_UNREACHED = -1
+
+
+def _heading(angle_deg: float) -> tuple[float, float]:
+    """与 Track 的运动学同一套角度约定：航向角 angle 时每帧位移方向。"""
+    rad = math.radians(360 - angle_deg)
+    return math.cos(rad), math.sin(rad)
+
+
+def _start_line(wall_mask: np.ndarray, start_center, start_angle: float, offset: float) -> np.ndarray:
+    """
+    起跑线沿法向往两边走到墙（或出图）为止，整体沿朝向平移 offset 像素。
+    返回线上可行驶像素的坐标，形状 (m, 2)。
+    """
+    w, h = wall_mask.shape
+    fx, fy = _heading(start_angle)
+    nx, ny = -fy, fx
+    ox, oy = start_center[0] + fx * offset, start_center[1] + fy * offset
+    points = []
+    for sign in (1.0, -1.0):
+        s = 0.0
+        while True:
+            x, y = int(ox + sign * nx * s), int(oy + sign * ny * s)
+            if not (0 <= x < w and 0 <= y < h) or wall_mask[x, y]:
+                break
+            points.append((x, y))
+            s += 0.5
+    return np.unique(np.asarray(points, dtype=np.int64).reshape(-1, 2), axis=0)
+
+
+def build_progress_field(wall_mask: np.ndarray, start_center, start_angle: float) -> tuple[np.ndarray, int]:
+    """
+    返回 (dist, lap_length)：dist[x, y] 为从起跑线出发沿赛道的路程（像素），到不了的地方为 -1。
+    赛道不是闭环（起跑线后方到不了）时 lap_length 取最远的路程 + 1。
+    """
+    w, h = wall_mask.shape
+    if wall_mask[int(start_center[0]), int(start_center[1])]:
+        raise ValueError(f"start point {tuple(start_center)} is on a wall")
+
+    # 四周补一圈墙，邻居偏移不会越界、也不会卷到另一列
+    free = np.ones((w + 2, h + 2), dtype=bool)
+    free[1:-1, 1:-1] = ~wall_mask
+    barrier = np.concatenate([_start_line(wall_mask, start_center, start_angle, o) for o in (-1, 0, 1)])
+    free[barrier[:, 0] + 1, barrier[:, 1] + 1] = False
+
+    stride = h + 2
+    free = free.ravel()
+    offsets = np.array([-stride - 1, -stride, -stride + 1, -1, 1, stride - 1, stride, stride + 1])
+    dist = np.full(free.shape, _UNREACHED, dtype=np.int32)
+
+    ahead = _start_line(wall_mask, start_center, start_angle, 2.0)
+    frontier = np.unique((ahead[:, 0] + 1) * stride + ahead[:, 1] + 1)
+    frontier = frontier[free[frontier]]
+    visited = ~free  # 墙和起跑线当作已访问
+    visited[frontier] = True
+    d = 0
+    while len(frontier):
+        dist[frontier] = d
+        neighbors = (frontier[:, None] + offsets[None, :]).ravel()
+        neighbors = np.unique(neighbors[~visited[neighbors]])
+        visited[neighbors] = True
+        frontier = neighbors
+        d += 1
+
+    dist = dist.reshape(w + 2, h + 2)[1:-1, 1:-1]
+    reached = dist[dist >= 0]
+    if len(reached) == 0:
+        raise ValueError(f"no drivable pixels ahead of start point {tuple(start_center)}")
+
+    # 起跑线后方紧挨着的像素：到它们的路程 + 跨过起跑线的宽度 = 一圈
+    behind = _start_line(wall_mask, start_center, start_angle, -2.0)
+    behind_dist = dist[behind[:, 0], behind[:, 1]] if len(behind) else np.empty(0, dtype=np.int32)
+    behind_dist = behind_dist[behind_dist >= 0]
+    lap_length = int(behind_dist.min()) + 4 if len(behind_dist) else int(reached.max()) + 1
+    dist[barrier[:, 0], barrier[:, 1]] = 0
+    return dist, lap_length
+
+
+class ProgressIndex:
+    """
+    一张地图、一个起点的进度场：
+        index = ProgressIndex.from_dist(dist, lap_length)
+        fraction = index.lookup(x, y)   # [0, 1)，到不了的位置为 -1
+    x / y 可以是标量或整数数组（车中心取整后的像素坐标）。
+    centerline[d] 为路程 d 处的赛道中心点，checkpoints 为等距检查点在 centerline 里的下标（由地图编译时给出）。
+    """
+
+    def __init__(self, fraction: np.ndarray, lap_length: int, centerline: np.ndarray = None,
+                 checkpoints: np.ndarray = None):
+        self.fraction = fraction
+        self.lap_length = lap_length
+        self.centerline = centerline
+        self.checkpoints = checkpoints
+
+    @classmethod
+    def from_dist(cls, dist: np.ndarray, lap_length: int) -> "ProgressIndex":
+        # 死胡同里可能比一圈还远，夹到一圈以内
+        fraction = np.minimum(dist, lap_length - 1) / float(lap_length)
+        return cls(np.where(dist >= 0, fraction, -1.0).astype(np.float32), lap_length)
+
+    def lookup(self, x, y):
+        return self.fraction[x, y]
+
+
+class LapTracker:
+    """
+    一批车的圈数 / 进度 / 分段计时，以及基于进度的奖励：
+        laps = LapTracker(index, n, start_x, start_y, target_laps=3, n_sectors=3, max_frames=...)
+        gained, finished = laps.update(idx, center_x, center_y, time)   # 每步动力学之后
+        reward = laps.rewards(idx, gained, finished, time, scale)        # progress_reward 时代替 distance / time
+    - progress：总进度（圈），= 圈数 + 当前圈的 fraction，可以为负（倒着跨过起跑线）
+    - best：到目前为止的最大 progress；laps_done = floor(best)
+    - split_times[i, k]：第 i 辆车 best 第一次达到 (k+1)/n_sectors 圈时的帧数，没到为 nan；
+      只记前 max(target_laps, 1) 圈
+    - target_laps > 0 时，best 达到 target_laps 的车算跑完（update 返回的 finished），调用方把它停下
+    车中心落在墙上 / 到不了的位置时（查到 -1），沿用上一次的进度。
+    """
+
+    def __init__(self, index: ProgressIndex, n: int, start_x, start_y, target_laps: int = 0,
+                 n_sectors: int = 3, max_frames: float = None, progress_reward: bool = True):
+        self.index = index
+        self.progress_reward = progress_reward
+        self.target_laps = target_laps
+        self.n_sectors = max(1, int(n_sectors))
+        self.max_frames = max_frames
+
+        start = index.lookup(np.asarray(start_x, dtype=np.int64), np.asarray(start_y, dtype=np.int64))
+        self.fraction = np.broadcast_to(np.where(start >= 0, start, 0.0), (n,)).astype(np.float64)
+        self.laps = np.zeros(n, dtype=np.int64)  # 跨过起跑线的净次数
+        self.best = self.fraction.copy()
+        self.finished = np.zeros(n, dtype=bool)
+        self.finish_time = np.full(n, np.nan)
+        self.split_times = np.full((n, max(1, target_laps) * self.n_sectors), np.nan)
+
+    @property
+    def progress(self) -> np.ndarray:
+        return self.laps + self.fraction
+
+    @property
+    def laps_done(self) -> np.ndarray:
+        return np.floor(self.best).astype(np.int64)
+
+    def update(self, idx: np.ndarray, center_x, center_y, time) -> tuple[np.ndarray, np.ndarray]:
+        """
+        idx 为这一步推进过的车；center_x / center_y / time 为全体车的数组（长度 n）。
+        返回 (gained, finished_now)，与 idx 等长：best 增加了多少圈（>= 0），以及这一步刚跑完 target_laps 的车。
+        """
+        cx = np.asarray(center_x)[idx]
+        cy = np.asarray(center_y)[idx]
+        t = np.asarray(time, dtype=np.float64)[idx]
+        raw = self.index.lookup(cx.astype(np.int64), cy.astype(np.int64)).astype(np.float64)
+        old = self.fraction[idx]
+        valid = raw >= 0
+        jump = np.where(valid, raw - old, 0.0)
+        self.laps[idx] += (jump < -0.5).astype(np.int64) - (jump > 0.5)
+        self.fraction[idx] = np.where(valid, raw, old)
+
+        old_best = self.best[idx]
+        best = np.maximum(old_best, self.laps[idx] + self.fraction[idx])
+        self.best[idx] = best
+
+        # 分段计时：best 跨过的每个分段边界都记上这一步结束时的帧数
+        n_splits = self.split_times.shape[1]
+        first = np.floor(old_best * self.n_sectors).astype(np.int64)
+        last = np.minimum(np.floor(best * self.n_sectors).astype(np.int64), n_splits)
+        for r in np.flatnonzero(last > first):
+            self.split_times[idx[r], max(first[r], 0):last[r]] = t[r]
+
+        finished_now = np.zeros(len(idx), dtype=bool)
+        if self.target_laps > 0:
+            finished_now = (best >= self.target_laps) & ~self.finished[idx]
+            self.finished[idx[finished_now]] = True
+            self.finish_time[idx[finished_now]] = t[finished_now]
+        return best - old_best, finished_now
+
+    def rewards(self, idx: np.ndarray, gained: np.ndarray, finished_now: np.ndarray, time,
+                scale: float) -> np.ndarray:
+        """
+        基于进度的奖励：前进的路程（像素）/ scale；转圈、倒车都不得分。
+        跑完 target_laps 的车提前停下，另加上按它的平均速度一直跑到 max_frames 还能拿到的进度，
+        跑得越快分越高，也不会比继续跑的车吃亏。
+        """
+        lap_px = self.index.lap_length / scale
+        reward = gained * lap_px
+        if finished_now.any() and self.max_frames:
+            t = np.asarray(time, dtype=np.float64)[idx]
+            done = np.flatnonzero(finished_now)
+            pace = self.best[idx[done]] / np.maximum(t[done], 1.0)
+            reward[done] += pace * np.maximum(self.max_frames - t[done], 0.0) * lap_px
+        return reward
+
+    def sector_times(self, i: int) -> list[float]:
+        """第 i 辆车已经跑完的各分段用时（帧）。"""
+        splits = self.split_times[i]
+        splits = splits[~np.isnan(splits)]
+        return np.diff(np.concatenate(([0.0], splits))).tolist()
+
+    def lap_times(self, i: int) -> list[float]:
+        """第 i 辆车已经跑完的各圈用时（帧）。"""
+        ends = self.split_times[i, self.n_sectors - 1::self.n_sectors]
+        ends = ends[~np.isnan(ends)]
+        return np.diff(np.concatenate(([0.0], ends))).tolist()
@@ -0,0 +1,362 @@
+"""
+轨迹录制 / 回放文件（.traj）：逐帧记下每辆车的 x, y, angle, speed, steer, accel, alive, finished，
+回看一整场不用重新仿真。
+
+    python -m src.recording [genomes.pkl] [--top 5] [--out runs/topN.traj] [--seconds 2500]
+
+用批量引擎无头跑一遍并录下来（同 src.export 的仿真，不限帧）；
+回放：python replay.py runs/topN.traj；导出视频：python -m src.export --replay runs/topN.traj。
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from src.viewer import make_snapshot
+
+
+# ===================== 轨迹文件格式 =====================
+# 列式 + 分块压缩，一个文件：
+#   b"CARTRAJ1" | u32 头长度 | 头（json：车数、genome key、dt、每块帧数、压缩级别、字段，外加地图 / 车身尺寸等）
+#   块 0 | 块 1 | ...   每块 = b"CHNK" + u64 起始帧 + u32 帧数 + 每列的字节数（u32 × 字段数） + 各列数据；
+#                       每列是 (帧数, 车数) 的数组。压缩时先按字节重排（所有值的第 0 字节放一起、第 1 字节放一起……）
+#                       再 zlib：相邻帧的 float 高位字节几乎不变，比直接压缩小得多
+#   索引 i64 (块数, 3)：块偏移、起始帧、帧数 | u64 索引偏移 | u64 块数 | b"CARTEND1"
+# 读的时候整个文件 mmap，按索引二分找到帧所在的块，只解压这一块（最近用过的几块缓存着），不整个读进内存；
+# compress=0 时各列原样存放，取出来的数组直接是 mmap 上的视图，一个字节都不拷贝。
+# 写的时候先写 <path>.tmp，close 时补上索引再 os.replace；中途被打断留下的 .tmp 没有索引，读的时候顺着块头扫一遍也能打开。
+# 第 k 帧（从 0 数）是第 k + 1 步仿真之后的状态，游戏时间 (k + 1) * dt 帧。
+
+FORMAT_VERSION = 1
+MAGIC = b"CARTRAJ1"
+END_MAGIC = b"CARTEND1"
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEAD = struct.Struct("<4sQI")
+FOOTER = struct.Struct("<QQ8s")
+
+# 字段名与存储类型：位置 / 朝向用 float32（1080p 上精度 ~1e-4 像素），速度和两个控制量用 float16 足够
+FIELDS = (
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("angle", "<f4"),
+    ("speed", "<f2"),
+    ("steer", "<f2"),
+    ("accel", "<f2"),
+    ("alive", "|b1"),
+    ("finished", "|b1"),
+)
+
+
+def _shuffle(a: np.ndarray) -> bytes:
+    return a.view(np.uint8).reshape(-1, a.itemsize).T.tobytes()
+
+
+def _unshuffle(data: bytes, dtype: np.dtype, shape: tuple) -> np.ndarray:
+    raw = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(raw.T).view(dtype).reshape(shape)
+
+
+class TrajectoryWriter:
+    """
+    逐帧追加所有车的状态，攒满 chunk_frames 帧写一块。compress 为 zlib 级别（0 = 不压缩，可直接 mmap）。
+    meta 原样写进文件头（地图、车身尺寸、FPS 等，回放时用）。
+        with TrajectoryWriter("runs/topN.traj", batch.n, dt=track.dt, index=keys, map=MAP) as writer:
+            ... writer.append_batch(batch)      # 每步之后
+    """
+
+    def __init__(self, path: str, n: int, dt: float = 1.0, index=None, chunk_frames: int = 256, compress: int = 6,
+                 **meta):
+        self.path = path
+        self.n = n
+        self.chunk_frames = max(1, int(chunk_frames))
+        self.compress = int(compress)
+        self.frames = 0
+        self.header = dict(
+            version=FORMAT_VERSION,
+            n=n,
+            dt=dt,
+            index=[int(k) for k in index] if index is not None else list(range(n)),
+            chunk_frames=self.chunk_frames,
+            compress=self.compress,
+            fields=[list(field) for field in FIELDS],
+            **meta
+        )
+        self._buffers = {name: np.zeros((self.chunk_frames, n), dtype=dtype) for name, dtype in FIELDS}
+        self._filled = 0
+        self._index = []
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        header = json.dumps(self.header, ensure_ascii=False).encode("utf-8")
+        self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+
+    def append(self, x, y, angle, speed, steer, accel, alive, finished=False):
+        """一帧：每个参数是长度 n 的数组 / 列表（或标量，所有车相同）。"""
+        k = self._filled
+        buffers = self._buffers
+        buffers["x"][k] = x
+        buffers["y"][k] = y
+        buffers["angle"][k] = angle
+        buffers["speed"][k] = speed
+        buffers["steer"][k] = steer
+        buffers["accel"][k] = accel
+        buffers["alive"][k] = alive
+        buffers["finished"][k] = finished
+        self._filled += 1
+        self.frames += 1
+        if self._filled == self.chunk_frames:
+            self._flush()
+
+    def append_batch(self, batch):
+        """CarBatch 当前的状态（steer / accel 为这一步网络给出的指令）。"""
+        self.append(batch.x, batch.y, batch.angle, batch.speed, batch.steer_cmd, batch.accel_cmd,
+                    batch.alive, batch.finished)
+
+    def _encode(self, column: np.ndarray) -> bytes:
+        column = np.ascontiguousarray(column)
+        if not self.compress:
+            return column.tobytes()
+        return zlib.compress(_shuffle(column), self.compress)
+
+    def _flush(self):
+        m = self._filled
+        if not m:
+            return
+        columns = [self._encode(self._buffers[name][:m]) for name, _ in FIELDS]
+        offset = self._file.tell()
+        first = self.frames - m
+        self._file.write(CHUNK_HEAD.pack(CHUNK_MAGIC, first, m))
+        self._file.write(np.array([len(c) for c in columns], dtype="<u4").tobytes())
+        for column in columns:
+            self._file.write(column)
+        self._index.append((offset, first, m))
+        self._filled = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._flush()
+        index = np.array(self._index, dtype="<i8").reshape(-1, 3)
+        offset = self._file.tell()
+        self._file.write(index.tobytes())
+        self._file.write(FOOTER.pack(offset, len(index), END_MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    """
+    mmap 打开一个 .traj，按帧随机访问，只解压用到的块：
+        reader = TrajectoryReader("runs/topN.traj")
+        reader.frame(1000)["x"]             # 第 1000 帧所有车的 x，形状 (n,)
+        reader.slice(0, 5000)["alive"]      # 一段帧，形状 (5000, n)
+        reader.snapshot(1000)               # src/viewer.py 的快照，回放 / 导出视频直接用
+    cache_chunks 为缓存的已解压块数。
+    """
+
+    def __init__(self, path: str, cache_chunks: int = 8):
+        self.path = path
+        self.cache_chunks = max(1, int(cache_chunks))
+        self._cache = OrderedDict()
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not a trajectory file")
+        (header_len,) = struct.unpack_from("<I", mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(mm[start:start + header_len]).decode("utf-8"))
+        if self.header["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported trajectory format version {self.header['version']}")
+        self.n = self.header["n"]
+        self.dt = self.header["dt"]
+        self.index = self.header["index"]
+        self.compress = self.header["compress"]
+        self.fields = [(name, np.dtype(dtype)) for name, dtype in self.header["fields"]]
+
+        chunks = self._read_index(start + header_len)
+        self.chunk_offsets = chunks[:, 0]
+        self.chunk_starts = chunks[:, 1]
+        self.chunk_lengths = chunks[:, 2]
+        self.frames = int(self.chunk_starts[-1] + self.chunk_lengths[-1]) if len(chunks) else 0
+
+    def _read_index(self, data_start: int) -> np.ndarray:
+        mm = self._mm
+        if len(mm) >= data_start + FOOTER.size:
+            offset, count, magic = FOOTER.unpack_from(mm, len(mm) - FOOTER.size)
+            if magic == END_MAGIC:
+                return np.frombuffer(mm, dtype="<i8", count=count * 3, offset=offset).reshape(-1, 3).copy()
+        # 没写完的文件：顺着块头往后扫，最后一块不完整就丢掉
+        chunks = []
+        pos = data_start
+        sizes_len = 4 * len(self.fields)
+        while pos + CHUNK_HEAD.size + sizes_len <= len(mm):
+            magic, first, m = CHUNK_HEAD.unpack_from(mm, pos)
+            if magic != CHUNK_MAGIC:
+                break
+            sizes = np.frombuffer(mm, dtype="<u4", count=len(self.fields), offset=pos + CHUNK_HEAD.size)
+            end = pos + CHUNK_HEAD.size + sizes_len + int(sizes.sum())
+            if end > len(mm):
+                break
+            chunks.append((pos, first, m))
+            pos = end
+        return np.array(chunks, dtype=np.int64).reshape(-1, 3)
+
+    def __len__(self) -> int:
+        return self.frames
+
+    @property
+    def seconds(self) -> float:
+        """录下的游戏时长（以帧计，除以 FPS 为秒）。"""
+        return self.frames * self.dt
+
+    def chunk(self, c: int) -> dict:
+        """第 c 块的所有列，{字段: (帧数, n) 数组}。"""
+        columns = self._cache.get(c)
+        if columns is not None:
+            self._cache.move_to_end(c)
+            return columns
+        mm = self._mm
+        pos = int(self.chunk_offsets[c])
+        m = int(self.chunk_lengths[c])
+        sizes = np.frombuffer(mm, dtype="<u4", count=len(self.fields), offset=pos + CHUNK_HEAD.size).tolist()
+        pos += CHUNK_HEAD.size + 4 * len(self.fields)
+        columns = {}
+        for (name, dtype), size in zip(self.fields, sizes):
+            if self.compress:
+                columns[name] = _unshuffle(zlib.decompress(mm[pos:pos + size]), dtype, (m, self.n))
+            else:
+                columns[name] = np.frombuffer(mm, dtype=dtype, count=m * self.n, offset=pos).reshape(m, self.n)
+            pos += size
+        self._cache[c] = columns
+        if len(self._cache) > self.cache_chunks:
+            self._cache.popitem(last=False)
+        return columns
+
+    def chunk_of(self, k: int) -> int:
+        if not 0 <= k < self.frames:
+            raise IndexError(f"frame {k} out of range [0, {self.frames})")
+        return int(np.searchsorted(self.chunk_starts, k, side="right")) - 1
+
+    def frame(self, k: int) -> dict:
+        """第 k 帧，{字段: (n,) 数组}。"""
+        c = self.chunk_of(k)
+        row = k - int(self.chunk_starts[c])
+        return {name: column[row] for name, column in self.chunk(c).items()}
+
+    def slice(self, start: int, stop: int) -> dict:
+        """第 [start, stop) 帧，{字段: (stop - start, n) 数组}；跨块时拼起来。"""
+        start, stop = max(0, start), min(stop, self.frames)
+        if stop <= start:
+            return {name: np.zeros((0, self.n), dtype=dtype) for name, dtype in self.fields}
+        first, last = self.chunk_of(start), self.chunk_of(stop - 1)
+        parts = {name: [] for name, _ in self.fields}
+        for c in range(first, last + 1):
+            lo = max(start, int(self.chunk_starts[c])) - int(self.chunk_starts[c])
+            hi = min(stop, int(self.chunk_starts[c] + self.chunk_lengths[c])) - int(self.chunk_starts[c])
+            for name, column in self.chunk(c).items():
+                parts[name].append(column[lo:hi])
+        return {name: columns[0] if len(columns) == 1 else np.concatenate(columns) for name, columns in parts.items()}
+
+    def frame_at(self, game_frame: float) -> int:
+        """游戏时间（帧）对应的帧号（夹在 [0, frames) 里）。"""
+        return min(max(int(round(game_frame / self.dt)) - 1, 0), max(self.frames - 1, 0))
+
+    def snapshot(self, k: int) -> dict:
+        """第 k 帧的画面快照（跑完圈数停下的车也画出来），hud 里有 still_alive / finished。"""
+        f = self.frame(k)
+        return make_snapshot((k + 1) * self.dt, f["x"], f["y"], f["angle"], f["alive"] | f["finished"], self.index,
+                             still_alive=int(f["alive"].sum()), finished=int(f["finished"].sum()))
+
+    def snapshots(self, start: int = 0, stop: int = None, every: int = 1):
+        """
+        按顺序产出 [start, stop) 里每 every 帧的快照（第 every - 1、2 * every - 1 …… 帧，和仿真时每 every 步出一帧对齐），
+        最后一帧总会产出。
+        """
+        stop = self.frames if stop is None else min(stop, self.frames)
+        for k in range(start + every - 1, stop, every):
+            yield self.snapshot(k)
+        if stop > start and (stop - start) % every:
+            yield self.snapshot(stop - 1)
+
+    def close(self):
+        self._cache.clear()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # 外面还拿着 mmap 上的视图（compress=0），随它们一起释放
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    import neat
+
+    from src.settings import SimSettings
+    from src.export import load_genomes
+    from src.simulation import (
+        build_population,
+        run_headless,
+        format_summary
+    )
+
+    settings = SimSettings.from_env()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("genomes", nargs="?", default=None, help="基因组 pkl，默认 topN_genomes.pkl，没有就 winner.pkl")
+    parser.add_argument("--top", type=int, default=5, help="取前几个基因组")
+    parser.add_argument("--config", default="config_modified.txt")
+    parser.add_argument("--map", default=settings.map, help="起点 / 朝向 / 雷达长度按 MAP_PROFILES")
+    parser.add_argument("--out", default="runs/topN.traj")
+    parser.add_argument("--seconds", type=float, default=settings.max_sim_seconds, help="最长仿真时间（游戏秒）")
+    parser.add_argument("--chunk-frames", type=int, default=256)
+    parser.add_argument("--compress", type=int, default=6, help="zlib 级别，0 = 不压缩（可直接 mmap）")
+    args = parser.parse_args()
+
+    path = args.genomes or ("topN_genomes.pkl" if os.path.exists("topN_genomes.pkl") else "winner.pkl")
+    genomes = load_genomes(path)[:args.top]
+    pairs = [(g.key, g) for g in genomes]
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                                neat.DefaultStagnation, args.config)
+    settings = settings.for_map(args.map)
+    track = settings.make_track()
+    car_kwargs = settings.car_kwargs()
+    nets, batch, _ = build_population(pairs, config, car_kwargs)
+
+    t0 = time.perf_counter()
+    with TrajectoryWriter(args.out, batch.n, dt=track.dt, index=[g.key for g in genomes],
+                          chunk_frames=args.chunk_frames, compress=args.compress,
+                          map=args.map, fps=settings.fps, car_size_x=settings.car_size_x,
+                          car_size_y=settings.car_size_y,
+                          genomes=path) as writer:
+        summary = run_headless(track, batch, nets, pairs, settings.input_normalization_denominator,
+                               settings.speed_norm, max_frames=settings.fps * args.seconds,
+                               target_laps=settings.target_laps, n_sectors=settings.num_sectors,
+                               on_frame=lambda counter, still_alive, laps: writer.append_batch(batch))
+    size = os.path.getsize(args.out)
+    print(f"{path}: {len(genomes)} genomes -> {args.out} | {writer.frames} frames, {size / 1e6:.2f} MB "
+          f"({size / max(writer.frames * batch.n, 1):.1f} B per car-frame) in {time.perf_counter() - t0:.1f} s")
+    print(format_summary(summary))
+
+
+if __name__ == "__main__":
+    main()
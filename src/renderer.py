@@ -0,0 +1,143 @@
+import pygame
+
+
+# ===================== 脏矩形渲染 =====================
+# 原来每一帧：整张 1920x1080 地图重新 blit、HUD 文字全部重新 font.render、再 display.flip() 整屏上传。
+# 车只占屏幕很小一部分，这里只重画变了的地方：
+#   - begin()：把上一帧画车（车身 / 编号 / 雷达）弄脏的矩形用背景（地图 + 轨迹层等）盖回去
+#   - draw_car() / blit()：画这一帧的车，记下它们盖住的矩形，下一帧再擦掉
+#   - text()：HUD 文字按 key 缓存渲染好的 Surface，内容变了才重新 render；
+#     没变且没被擦到时什么都不做
+#   - update()：只把这一帧擦过 / 画过的矩形用 display.update(rects) 推到屏幕上
+# 第一帧、或 invalidate() 之后整屏重画一次并 flip。
+# dirty=False 时退回原来的整屏重画（对比 / 排查用），调用方式不变。
+# present=False 时只画到 screen 这块 Surface 上、不碰显示器（离线导出视频用，见 src/export.py）。
+#     renderer = DirtyRenderer(screen, track.map_surface, overlays=[trails.layer])
+#     renderer.begin()
+#     renderer.restore(trails.update_layer())     # 轨迹层新画的线段
+#     for car in cars: renderer.draw_car(track, car, plot_radar)
+#     renderer.text("alive", f"Still Alive: {n}", font, TEXT_COLOR, center=(900, 470))
+#     renderer.update()
+
+
+class DirtyRenderer:
+
+    def __init__(self, screen: pygame.Surface, background: pygame.Surface, overlays: list = (), dirty: bool = True,
+                 present: bool = True):
+        """
+        background：不透明的底图（地图）；overlays：按顺序叠在底图上、内容只增不减的透明层（轨迹层）。
+        """
+        self.screen = screen
+        self.background = background
+        self.overlays = list(overlays)
+        self.dirty = dirty
+        self.present = present
+        self._full = True        # 下一帧整屏重画
+        self._sprites = []       # 上一帧画车等弄脏的矩形，这一帧开头擦掉
+        self._draws = []         # 这一帧画过的东西 (矩形, 函数, 参数)，帧中途擦掉一块时补画
+        self._updates = []       # 这一帧要推到屏幕上的矩形
+        self._restored = []      # 这一帧擦过的矩形（HUD 文字被擦到要补画）
+        self._clean = None       # begin 刚整块擦干净、还没画东西的区域，落在里面的 restore 可以跳过
+        self._texts = {}         # key -> [内容, Surface, 矩形, (字体, 颜色, 定位)]
+
+    def invalidate(self):
+        """下一帧整屏重画（换了地图 / 窗口被遮挡后等）。"""
+        self._full = True
+
+    def begin(self):
+        if self._full or not self.dirty:
+            self.screen.blit(self.background, (0, 0))
+            for layer in self.overlays:
+                self.screen.blit(layer, (0, 0))
+            self._sprites = []
+            self._draws = []
+            self._updates = []
+            self._restored = [self.screen.get_rect()]
+            return
+        sprites, self._sprites = self._sprites, []
+        self._draws = []
+        self._updates = []
+        self._restored = []
+        self._clean = None
+        rects = self._merge(sprites)
+        self.restore(rects)
+        if len(rects) == 1:
+            self._clean = rects[0]
+
+    def _merge(self, rects: list) -> list:
+        """
+        车挤在一起时矩形大量重叠，逐个擦会把同一块背景贴很多遍：
+        面积总和超过外接矩形时改成擦一次外接矩形，超过半屏时干脆整屏擦。
+        """
+        if len(rects) < 2:
+            return rects
+        area = sum(r.w * r.h for r in rects)
+        if area > self.screen.get_width() * self.screen.get_height() // 2:
+            return [self.screen.get_rect()]
+        bounds = rects[0].unionall(rects[1:])
+        if area >= bounds.w * bounds.h:
+            return [bounds]
+        return rects
+
+    def restore(self, rects):
+        """用背景 + overlays 盖回这些矩形（并推到屏幕上）；这一帧已经画在上面的车补画回来。"""
+        if self._full or not self.dirty:
+            return
+        screen = self.screen
+        clean = self._clean
+        for rect in rects:
+            if not rect or (clean is not None and clean.contains(rect)):
+                continue
+            screen.blit(self.background, rect, rect)
+            for layer in self.overlays:
+                screen.blit(layer, rect, rect)
+            self._restored.append(rect)
+            self._updates.append(rect)
+            for drawn, fn, args in self._draws:
+                if drawn.colliderect(rect):
+                    fn(*args)
+
+    def _draw(self, fn, *args) -> pygame.Rect:
+        rect = fn(*args)
+        self._clean = None
+        if rect:
+            self._draws.append((rect, fn, args))
+            self._sprites.append(rect)
+            self._updates.append(rect)
+        return rect
+
+    def blit(self, surface: pygame.Surface, dest) -> pygame.Rect:
+        """画只在这一帧有效的东西（下一帧 begin 时擦掉）。"""
+        return self._draw(self.screen.blit, surface, dest)
+
+    def draw_car(self, track, car, plot_radar: bool = False) -> pygame.Rect:
+        return self._draw(track.draw_car, self.screen, car, plot_radar)
+
+    def text(self, key, value: str, font: pygame.font.Font, color, **anchor) -> pygame.Rect:
+        """
+        HUD 文字，anchor 为 get_rect 的定位参数（center=... / topright=... / topleft=...）。
+        同一个 key 内容不变时复用上次渲染的 Surface；没被擦到就不重画。
+        """
+        entry = self._texts.get(key)
+        if entry is not None and entry[0] == value and entry[3] == (font, color, anchor):
+            surface, rect = entry[1], entry[2]
+            if self._full or not self.dirty or rect.collidelist(self._restored) != -1:
+                self._updates.append(self.screen.blit(surface, rect))
+            return rect
+
+        if entry is not None:
+            self.restore([entry[2]])
+        surface = font.render(value, True, color)
+        rect = surface.get_rect(**anchor)
+        self._texts[key] = [value, surface, rect, (font, color, anchor)]
+        self._updates.append(self.screen.blit(surface, rect))
+        return rect
+
+    def update(self):
+        if not self.present:
+            self._full = False
+        elif self._full or not self.dirty:
+            pygame.display.flip()
+            self._full = False
+        elif self._updates:
+            pygame.display.update(self._updates)
@@ -0,0 +1,185 @@
+import dataclasses
+from dataclasses import dataclass
+
+
+# ===================== 仿真参数对象 =====================
+# env_settings.py 的常量是默认值；SimSettings 把所有影响仿真结果的参数收进一个不可变对象，显式传给 Track / Car：
+#   settings = SimSettings.from_env()                           # 当前 env_settings 的参数
+#   variant = settings.replace(turn_exp=1.2, v_turn_floor=1.5)  # 改几项得到新对象，原对象不变
+#   track = variant.make_track()
+#   nets, batch, _ = build_population(genomes, config, variant.car_kwargs())
+#   run_headless(track, batch, nets, genomes, **variant.sim_kwargs())
+# 同一个进程里可以同时有任意多组参数（参数扫描见 src/sweep.py），不用每组都重开解释器、重新加载地图。
+# 字段名是 env_settings 常量的小写；起点 / 朝向 / 雷达长度 / 输入归一化随地图变（MAP_PROFILES），换地图用 for_map。
+# accel_per_step / brake_per_step 和 env_settings 一样由 v_max、fps、accel_seconds、brake_ratio 推出（只读属性），
+# 扫 v_max / fps 时加减速跟着变，不会和旧的速度上限配在一起。
+
+@dataclass(frozen=True)
+class SimSettings:
+    map: str
+    fps: int
+    max_sim_seconds: float
+    width: int
+    height: int
+    # 动力学
+    v_min: float
+    v_max: float
+    speed_norm: float
+    accel_seconds: float
+    brake_ratio: float
+    v_turn_floor: float
+    turn_exp: float
+    limit_smooth_alpha: float
+    alpha_steer: float
+    # 车身
+    car_size_x: int
+    car_size_y: int
+    wheelbase_px: float
+    max_steer_deg: float
+    # 地图相关（MAP_PROFILES）
+    start_position: tuple
+    starting_angle: float
+    radar_max_len: int
+    input_normalization_denominator: float
+    # 积分 / 碰撞
+    border_color: tuple
+    sprite_angle_step: float
+    sim_dt: float
+    physics_substeps: int
+    swept_collision: bool
+    # 停滞检测 / 奖励
+    stall_window_seconds: float
+    stall_radius_px: float
+    fitness: str
+    target_laps: int
+    num_sectors: int
+    track_cache_dir: str = None
+
+    @classmethod
+    def from_env(cls, **changes) -> "SimSettings":
+        """env_settings 当前的参数（changes 覆盖其中几项，改 map 时地图相关的字段跟着换）。"""
+        import env_settings as env
+
+        settings = cls(
+            map=env.MAP,
+            fps=env.FPS,
+            max_sim_seconds=env.MAX_SIM_SECONDS,
+            width=env.WIDTH,
+            height=env.HEIGHT,
+            v_min=env.V_MIN,
+            v_max=env.V_MAX,
+            speed_norm=env.SPEED_NORM,
+            accel_seconds=env.ACCEL_SECONDS,
+            brake_ratio=env.BRAKE_RATIO,
+            v_turn_floor=env.V_TURN_FLOOR,
+            turn_exp=env.TURN_EXP,
+            limit_smooth_alpha=env.LIMIT_SMOOTH_ALPHA,
+            alpha_steer=env.ALPHA_STEER,
+            car_size_x=env.CAR_SIZE_X,
+            car_size_y=env.CAR_SIZE_Y,
+            wheelbase_px=env.WHEELBASE_PX,
+            max_steer_deg=env.MAX_STEER_DEG,
+            start_position=tuple(env.START_POSITION),
+            starting_angle=env.STARTING_ANGLE,
+            radar_max_len=env.RADAR_MAX_LEN,
+            input_normalization_denominator=env.INPUT_NORMALIZATION_DENOMINATOR,
+            border_color=tuple(env.BORDER_COLOR),
+            sprite_angle_step=env.SPRITE_ANGLE_STEP,
+            sim_dt=env.SIM_DT,
+            physics_substeps=env.PHYSICS_SUBSTEPS,
+            swept_collision=env.SWEPT_COLLISION,
+            stall_window_seconds=env.STALL_WINDOW_SECONDS,
+            stall_radius_px=env.STALL_RADIUS_PX,
+            fitness=env.FITNESS,
+            target_laps=env.TARGET_LAPS,
+            num_sectors=env.NUM_SECTORS,
+            track_cache_dir=env.TRACK_CACHE_DIR
+        )
+        if "map" in changes:
+            settings = settings.for_map(changes.pop("map"))
+        return settings.replace(**changes) if changes else settings
+
+    def replace(self, **changes) -> "SimSettings":
+        return dataclasses.replace(self, **changes)
+
+    def for_map(self, map_path: str) -> "SimSettings":
+        """换一张地图，起点 / 朝向 / 雷达长度 / 输入归一化按 MAP_PROFILES 一起换。"""
+        from env_settings import map_profile
+
+        profile = map_profile(map_path)
+        return self.replace(
+            map=map_path,
+            start_position=tuple(profile["start_position"]),
+            starting_angle=profile["starting_angle"],
+            radar_max_len=profile["radar_max_len"],
+            input_normalization_denominator=profile["input_normalization_denominator"]
+        )
+
+    @property
+    def accel_per_step(self) -> float:
+        """每帧加速量：accel_seconds 秒从 0 加到 v_max（同 env_settings.ACCEL_PER_STEP）。"""
+        return self.v_max / (self.accel_seconds * self.fps)
+
+    @property
+    def brake_per_step(self) -> float:
+        return self.brake_ratio * self.accel_per_step
+
+    @property
+    def max_frames(self) -> int:
+        return self.fps * self.max_sim_seconds
+
+    def track_kwargs(self) -> dict:
+        """Track(headless=..., **track_kwargs())"""
+        return dict(
+            map=self.map,
+            map_width=self.width,
+            map_height=self.height,
+            v_turn_floor=self.v_turn_floor,
+            turn_exp=self.turn_exp,
+            limit_smooth_alpha=self.limit_smooth_alpha,
+            border_color=self.border_color,
+            sprite_angle_step=self.sprite_angle_step,
+            dt=self.sim_dt,
+            substeps=self.physics_substeps,
+            swept_collision=self.swept_collision,
+            cache_dir=self.track_cache_dir,
+            accel_per_step=self.accel_per_step,
+            brake_per_step=self.brake_per_step,
+            alpha_steer=self.alpha_steer
+        )
+
+    def car_kwargs(self) -> dict:
+        """Car / CarBatch / build_population 共用的构造参数。"""
+        return dict(
+            car_size_x=self.car_size_x,
+            car_size_y=self.car_size_y,
+            wheelbase_px=self.wheelbase_px,
+            max_steer_deg=self.max_steer_deg,
+            start_position=list(self.start_position),
+            radar_max_len=self.radar_max_len,
+            v_min=self.v_min,
+            v_max=self.v_max,
+            start_facing_angle=self.starting_angle
+        )
+
+    def sim_kwargs(self) -> dict:
+        """run_headless 的参数（不含 CPU 时间预算）。"""
+        return dict(
+            normalization_denominator=self.input_normalization_denominator,
+            speed_norm=self.speed_norm,
+            max_frames=self.max_frames,
+            stall_window_frames=int(self.fps * self.stall_window_seconds),
+            stall_radius_px=self.stall_radius_px,
+            fitness=self.fitness,
+            target_laps=self.target_laps,
+            n_sectors=self.num_sectors
+        )
+
+    def stage(self) -> dict:
+        """ParallelEvaluator / MultiMapEvaluator 用的一组参数。"""
+        return dict(track_kwargs=self.track_kwargs(), car_kwargs=self.car_kwargs(), sim_kwargs=self.sim_kwargs())
+
+    def make_track(self, headless: bool = True, **kwargs):
+        from src.my_env import Track
+
+        return Track(headless=headless, **self.track_kwargs(), **kwargs)
@@ -0,0 +1,110 @@
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from src.map_compiler import CompiledMap
+from src.progress import ProgressIndex
+
+
+# ===================== 多进程共享的只读赛道数据 =====================
+# 主进程把编译好的地图（墙体掩码、距离场、已经算好的进度场 / 中心线）拷进 multiprocessing.shared_memory，
+# 只把一个很小的 handle（共享内存块的名字 + 形状 + dtype）发给 worker；
+# worker 用 attach_shared_track(handle) 直接在共享内存上建 NumPy 视图，不解码 PNG、不读缓存文件、不重算。
+# 几十个 worker 共用一份数据，启动几乎是瞬间的。
+# 共享内存块归主进程所有：SharedTrackData.close() 时释放，worker 这边只读、不负责释放。
+# Python 3.12 及以前挂上已有的共享内存也会向 resource_tracker 登记（3.13 起可以 track=False）。
+# worker 和主进程共用同一个 tracker，worker 事后 unregister 会把主进程的登记一起删掉，
+# 主进程 unlink 时 tracker 就会报 KeyError；所以 worker 挂上时干脆不登记。
+
+
+def _to_shared(array: np.ndarray, blocks: list) -> tuple:
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    blocks.append(shm)
+    return shm.name, array.shape, array.dtype.str
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _from_shared(spec: tuple, blocks: list) -> np.ndarray:
+    name, shape, dtype = spec
+    shm = _attach(name)
+    blocks.append(shm)  # 视图活着的时候共享内存块不能被回收（Windows 上最后一个句柄关闭即释放）
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    array.flags.writeable = False
+    return array
+
+
+class SharedTrackData:
+    """
+    主进程里创建，生命周期覆盖整个进程池：
+        shared = SharedTrackData(track.compiled_map)
+        pool = multiprocessing.Pool(initializer=..., initargs=(shared.handle, ...))
+        ...
+        shared.close()
+    只拷贝创建时 compiled_map 里已经有的进度场，需要的起点先调用 track.progress_index 算好。
+    """
+
+    def __init__(self, compiled: CompiledMap):
+        self._blocks = []
+        progress = []
+        for (start_center, start_angle), index in compiled.progress_indexes.items():
+            progress.append(dict(
+                start_center=start_center,
+                start_angle=start_angle,
+                lap_length=index.lap_length,
+                fraction=_to_shared(index.fraction, self._blocks),
+                centerline=_to_shared(index.centerline, self._blocks) if index.centerline is not None else None,
+                checkpoints=None if index.checkpoints is None else np.asarray(index.checkpoints).tolist()
+            ))
+        self.handle = dict(
+            source=compiled.source,
+            sha1=compiled.sha1,
+            border_color=compiled.border_color,
+            wall_mask=_to_shared(compiled.wall_mask, self._blocks),
+            wall_dist=_to_shared(compiled.wall_dist, self._blocks),
+            progress=progress
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(shm.size for shm in self._blocks)
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_shared_track(handle: dict) -> CompiledMap:
+    """worker 里调用：按 handle 挂上共享内存，返回可以直接传给 Track(compiled_map=...) 的 CompiledMap。"""
+    blocks = []
+    compiled = CompiledMap(handle["source"], handle["sha1"], handle["border_color"],
+                           _from_shared(handle["wall_mask"], blocks), _from_shared(handle["wall_dist"], blocks))
+    for entry in handle["progress"]:
+        index = ProgressIndex(
+            _from_shared(entry["fraction"], blocks), entry["lap_length"],
+            centerline=_from_shared(entry["centerline"], blocks) if entry["centerline"] is not None else None,
+            checkpoints=None if entry["checkpoints"] is None else np.asarray(entry["checkpoints"], dtype=np.int64)
+        )
+        compiled.progress_indexes[(tuple(entry["start_center"]), float(entry["start_angle"]))] = index
+    compiled.shared_blocks = blocks
+    return compiled
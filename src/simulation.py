@@ -0,0 +1,241 @@
+import time
+
+import neat
+import numpy as np
+
+from src.my_env import (
+    Car,
+    CarBatch,
+    Track
+)
+from src.batch_net import BatchNetwork
+from src.progress import LapTracker
+from src.profiling import NULL_PROFILER
+
+
+# ===================== 无头仿真引擎 =====================
+# 只做 物理 / 碰撞 / 雷达 / 奖励，不碰任何 Surface、字体和 clock，
+# 一代的耗时只受 CPU 限制，而不是被 60 FPS 卡住。
+# 车辆状态全部放在 CarBatch 的数组里，一次调用推进整个种群；
+# 只有需要画车时才额外建 Car 对象并用 CarBatch.write_back 同步。
+
+
+class StallMonitor:
+    """
+    淘汰“没有进展”的车：每 window_frames 帧为一个窗口，记录窗口起点处的车中心，
+    窗口内离起点最远都不超过 radius_px 的车视为停滞（原地转圈、贴着边界夹住不动）。
+    打满方向时的转弯半径只有 轴距/tan(最大转角) ≈ 87 px，转圈的车永远走不出这个半径；
+    正常前进的车一个窗口至少走 V_MIN * window_frames 像素。
+    停滞的车 alive 置 False、stalled 置 True，之后不再推进也不再累加奖励。
+    window_frames <= 0 时不做任何检测。窗口按游戏帧计，一步推进 dt 帧时 update 传 frames=dt。
+    """
+
+    def __init__(self, batch: CarBatch, window_frames: int, radius_px: float):
+        self.window_frames = window_frames
+        self.radius_sq = radius_px ** 2
+        self.frame = 0.0
+        self.next_check = window_frames
+        self.anchor_x = batch.center_x.copy()
+        self.anchor_y = batch.center_y.copy()
+        self.peak_sq = np.zeros(batch.n)
+
+    def update(self, batch: CarBatch, frames: float = 1.0) -> int:
+        """每步在动力学之后调用一次；返回这一步被判为停滞的车数。"""
+        if self.window_frames <= 0:
+            return 0
+        self.frame += frames
+        d_sq = (batch.center_x - self.anchor_x) ** 2 + (batch.center_y - self.anchor_y) ** 2
+        np.maximum(self.peak_sq, d_sq, out=self.peak_sq)
+        if self.frame < self.next_check:
+            return 0
+        self.next_check += self.window_frames
+
+        stalled = batch.alive & (self.peak_sq < self.radius_sq)
+        batch.alive[stalled] = False
+        batch.stalled[stalled] = True
+        self.anchor_x[:] = batch.center_x
+        self.anchor_y[:] = batch.center_y
+        self.peak_sq[:] = 0.0
+        return int(stalled.sum())
+
+
+def generation_summary(batch: CarBatch, frames: float, max_frames: int, seconds: float,
+                       laps: LapTracker = None) -> dict:
+    """
+    一代结束后的统计：撞墙、停滞、跑完规定圈数分开计数；
+    剩下的车全部停滞 / 跑完而提前结束时，省下的帧数记在 frames_saved。
+    frames 是游戏帧数（仿真步数 x track.dt）。有 laps 时另记最远的进度（圈）和最快的一圈（帧）。
+    """
+    stalled = int(batch.stalled.sum())
+    finished = int(batch.finished.sum())
+    crashed = int((~batch.alive & ~batch.stalled & ~batch.finished).sum())
+    # 最后一批退场的车里有停滞 / 跑完的，说明这一代是因为它们才提前结束的
+    last = batch.time.max() if batch.n else 0
+    ended_early = not batch.alive.any() and bool(((batch.stalled | batch.finished) & (batch.time == last)).any())
+    best_lap = None
+    if laps is not None:
+        lap_times = [t for i in range(batch.n) for t in laps.lap_times(i)]
+        best_lap = min(lap_times) if lap_times else None
+    return dict(
+        cars=batch.n,
+        frames=frames,
+        crashed=crashed,
+        stalled=stalled,
+        finished=finished,
+        # 停滞的车从被淘汰那一帧到这一代结束之间本来都要继续仿真
+        stalled_car_frames=int(((frames - batch.time) * batch.stalled).sum()),
+        frames_saved=int(max_frames - frames) if ended_early else 0,
+        best_progress=float(laps.best.max()) if laps is not None and batch.n else None,
+        best_lap_frames=best_lap,
+        seconds=seconds
+    )
+
+
+def merge_summaries(summaries: list[dict], seconds: float, max_frames: int) -> dict:
+    """
+    合并多个分片（并行评估）的统计：计数相加，帧数 / 进度取最大，最快一圈取最小，seconds 用整代的墙钟时间。
+    分片是并排跑的，省下的帧不能相加：所有分片都提前结束时才算整代提前结束，省下 max_frames - 最长的分片帧数。
+    """
+    merged = dict(cars=0, frames=0, crashed=0, stalled=0, finished=0, stalled_car_frames=0, frames_saved=0,
+                  best_progress=None, best_lap_frames=None, seconds=seconds)
+    for summary in summaries:
+        for key in ("cars", "crashed", "stalled", "finished", "stalled_car_frames"):
+            merged[key] += summary[key]
+        merged["frames"] = max(merged["frames"], summary["frames"])
+        for key, pick in (("best_progress", max), ("best_lap_frames", min)):
+            if summary[key] is not None:
+                merged[key] = summary[key] if merged[key] is None else pick(merged[key], summary[key])
+    if summaries and all(summary["frames_saved"] > 0 for summary in summaries):
+        merged["frames_saved"] = int(max_frames - merged["frames"])
+    return merged
+
+
+def format_summary(summary: dict) -> str:
+    text = (f"frames {summary['frames']:.0f} | crashed {summary['crashed']}/{summary['cars']} | "
+            f"stalled {summary['stalled']} (skipped {summary['stalled_car_frames']} car-frames, "
+            f"ended {summary['frames_saved']} frames early)")
+    if summary.get("best_progress") is not None:
+        text += f" | finished {summary['finished']} | best {summary['best_progress']:.2f} laps"
+        if summary["best_lap_frames"] is not None:
+            text += f", fastest lap {summary['best_lap_frames']:.0f} frames"
+    return text + f" | {summary['seconds']:.2f} s"
+
+
+FITNESS_MODES = ("speed", "progress")
+
+
+def make_lap_tracker(track: Track, batch: CarBatch, fitness: str = "speed", target_laps: int = 0,
+                     n_sectors: int = 3, max_frames: float = None, track_progress: bool = False) -> LapTracker:
+    """
+    fitness："speed" = 原来的 distance / time；"progress" = 沿赛道前进的路程（LapTracker.rewards）。
+    target_laps > 0 时跑完这么多圈的车停下。两者都用不到进度时返回 None（不建进度场），
+    除非 track_progress=True（多地图评估要按进度筛选基因组）。
+    """
+    if fitness not in FITNESS_MODES:
+        raise ValueError(f"unknown fitness {fitness!r}, expected one of {FITNESS_MODES}")
+    if fitness == "speed" and target_laps <= 0 and not track_progress:
+        return None
+    start_x, start_y = batch.center_x[0], batch.center_y[0]
+    index = track.progress_index((start_x, start_y), batch.angle[0])
+    return LapTracker(index, batch.n, start_x, start_y, target_laps, n_sectors, max_frames,
+                      progress_reward=fitness == "progress")
+
+
+def build_population(genomes, config, car_kwargs: dict, car_img: str = None, render: bool = False):
+    """
+    为每个基因组建网络，并把 fitness 清零。
+    返回 (nets, batch, cars)；nets 是编译好的 BatchNetwork，render=False 时 cars 为空列表。
+    """
+    nets = []
+    for gid, g in genomes:
+        nets.append(neat.nn.FeedForwardNetwork.create(g, config))
+        g.fitness = 0.0
+    nets = BatchNetwork(nets)
+
+    batch = CarBatch(len(genomes), **car_kwargs)
+    # gid 是完全对应某一辆车 跨代不变的标识
+    cars = [Car(index=gid, car_img=car_img, **car_kwargs) for gid, _ in genomes] if render else []
+    return nets, batch, cars
+
+
+def step_population(track: Track, batch: CarBatch, nets: BatchNetwork, genomes,
+                    normalization_denominator: int, speed_norm: float,
+                    monitor: StallMonitor = None, profiler=NULL_PROFILER, laps: LapTracker = None) -> int:
+    """
+    所有车走一步（track.dt 帧）：网络推理（批量） -> 动力学/碰撞/雷达（批量） -> 进度 / 累加奖励 -> 停滞检测。
+    没有 laps（或 laps 不按进度给分）时奖励是 distance / time，按 dt 加权，fitness 的量级与逐帧仿真相同；
+    有 laps 时跑完规定圈数的车 alive 置 False、finished 置 True。
+    返回这一步开始时仍存活的车数（与原主循环的计数方式一致）。
+    各阶段耗时记到 profiler 上（见 src/profiling.py）。
+    """
+    alive_idx = np.flatnonzero(batch.alive)
+    if len(alive_idx) == 0:
+        return 0
+    profiler.frame(len(alive_idx))
+    t = profiler.tic()
+
+    # 整个种群一次批量推理；死车的输出不会被用到，直接跳过
+    outputs = nets.activate_batch(batch.get_data(normalization_denominator, speed_norm), batch.alive)
+    steer_cmd = np.clip(outputs[:, 0], -1.0, 1.0)  # 输出2维：转向, 加速度
+    accel_cmd = np.clip(outputs[:, 1], -1.0, 1.0)
+    batch.steer_cmd, batch.accel_cmd = steer_cmd, accel_cmd
+    profiler.toc("inference", t)
+
+    track.update_batch_kinematics(batch, steer_cmd, accel_cmd, profiler)
+    t = profiler.tic()
+    if laps is not None:
+        gained, finished = laps.update(alive_idx, batch.center_x, batch.center_y, batch.time)
+        done = alive_idx[finished]
+        batch.alive[done] = False
+        batch.finished[done] = True
+    if laps is not None and laps.progress_reward:
+        rewards = laps.rewards(alive_idx, gained, finished, batch.time, batch.car_size_x / 2)
+        for i, reward in zip(alive_idx, rewards.tolist()):
+            genomes[i][1].fitness += reward
+    else:
+        rewards = (track.get_batch_reward(batch) * track.dt).tolist()
+        for i in alive_idx:
+            genomes[i][1].fitness += rewards[i]
+    t = profiler.toc("reward", t)
+    if monitor is not None:
+        monitor.update(batch, track.dt)
+        profiler.toc("stall", t)
+    return len(alive_idx)
+
+
+def run_headless(track: Track, batch: CarBatch, nets: BatchNetwork, genomes,
+                 normalization_denominator: int, speed_norm: float,
+                 max_frames: int, max_cpu_seconds: float = None,
+                 stall_window_frames: int = 0, stall_radius_px: float = 0.0,
+                 fitness: str = "speed", target_laps: int = 0, n_sectors: int = 3,
+                 profiler=NULL_PROFILER, on_frame=None, laps: LapTracker = None) -> dict:
+    """
+    无头跑完一代，直到全部退场（撞墙 / 停滞 / 跑完 target_laps 圈） / 到达帧数上限（游戏帧） / 用完 CPU 预算。
+    返回 generation_summary 的统计。
+    max_cpu_seconds 为 None 时不限 CPU 时间（结果完全可复现）。
+    stall_window_frames > 0 时启用 StallMonitor；fitness / target_laps / n_sectors 见 make_lap_tracker。
+    on_frame(counter, still_alive, laps) 在每一步之后调用（异步预览发快照用，见 src/viewer.py）。
+    传入 laps 时用它而不是按 fitness / target_laps 新建（调用方事后要看每辆车的进度）。
+    """
+    t0 = time.perf_counter()
+    deadline = None
+    if max_cpu_seconds:
+        deadline = time.process_time() + max_cpu_seconds
+    monitor = StallMonitor(batch, stall_window_frames, stall_radius_px)
+    if laps is None:
+        laps = make_lap_tracker(track, batch, fitness, target_laps, n_sectors, max_frames)
+
+    counter = 0
+    while True:
+        still_alive = step_population(track, batch, nets, genomes, normalization_denominator, speed_norm,
+                                      monitor, profiler, laps)
+        if still_alive == 0:
+            break
+        counter += 1
+        if on_frame is not None:
+            on_frame(counter, still_alive, laps)
+        if counter * track.dt >= max_frames:
+            break
+        if deadline is not None and time.process_time() >= deadline:
+            break
+    return generation_summary(batch, counter * track.dt, max_frames, time.perf_counter() - t0, laps)
@@ -0,0 +1,170 @@
+"""
+参数扫描：在一个长驻进程（或进程池）里依次评估多组仿真参数，每组参数不用重开解释器、初始化 pygame、重新加载地图。
+
+    python -m src.sweep [genomes.pkl] --set turn_exp=1.2,1.6,2.0 --set v_turn_floor=1.0,1.5 [--top 20] [--workers N]
+    python -m src.sweep --train 20 --set limit_smooth_alpha=0.2,0.4,0.8 [--seed 1] [--workers N]
+
+--set 的名字是 SimSettings 的字段（env_settings 常量的小写，见 src/settings.py），多个 --set 取笛卡尔积，其余参数同 env_settings。
+默认每组参数重新评估同一批基因组（topN_genomes.pkl 的前 --top 个）；--train N 时每组参数从头训练 N 代，比较每代最好的 fitness。
+"""
+import argparse
+import ast
+import itertools
+import multiprocessing as mp
+import os
+import random
+import time
+
+import neat
+
+from src.settings import SimSettings
+from src.simulation import (
+    build_population,
+    run_headless,
+    format_summary
+)
+
+
+def parse_values(text: str) -> list:
+    """"1.2,1.6,2" -> [1.2, 1.6, 2]；不是 Python 字面量的原样当字符串（如 fitness=progress,speed）。"""
+    values = []
+    for item in text.split(","):
+        try:
+            values.append(ast.literal_eval(item.strip()))
+        except (ValueError, SyntaxError):
+            values.append(item.strip())
+    return values
+
+
+def grid(base: SimSettings, axes: dict) -> list:
+    """axes = {字段名: [取值, ...]}，返回笛卡尔积里的每一组 SimSettings（顺序同 itertools.product）。"""
+    variants = []
+    for values in itertools.product(*axes.values()):
+        changes = dict(zip(axes, values))
+        settings = base.for_map(changes.pop("map")) if "map" in changes else base
+        variants.append(settings.replace(**changes))
+    return variants
+
+
+def evaluate_settings(settings: SimSettings, genomes: list, config) -> dict:
+    """用这组参数无头跑一遍 genomes（[(gid, genome)]），返回 {"fitness": [...], "summary": ...}。"""
+    track = settings.make_track()
+    nets, batch, _ = build_population(genomes, config, settings.car_kwargs())
+    summary = run_headless(track, batch, nets, genomes, **settings.sim_kwargs())
+    return dict(fitness=[g.fitness for _, g in genomes], summary=summary)
+
+
+def train_settings(settings: SimSettings, config, generations: int, seed: int = None) -> dict:
+    """用这组参数从头训练 generations 代，返回 {"best": 每代最高 fitness, "summary": 最后一代的统计}。"""
+    if seed is not None:
+        random.seed(seed)
+    # 节点编号器挂在 config 上，每次从头训练都重置，同一个 seed 在哪个进程里跑、第几个跑结果都一样
+    config.genome_config.node_indexer = None
+    track = settings.make_track()
+    result = dict(best=[], summary=None)
+
+    def evaluate(genomes, config):
+        nets, batch, _ = build_population(genomes, config, settings.car_kwargs())
+        result["summary"] = run_headless(track, batch, nets, genomes, **settings.sim_kwargs())
+        result["best"].append(max(g.fitness for _, g in genomes))
+
+    try:
+        neat.Population(config).run(evaluate, generations)
+    except neat.CompleteExtinctionException:
+        pass
+    return result
+
+
+# ===================== 进程池 =====================
+# worker 只在启动时收一次 config / 基因组，之后每个任务只传一个 SimSettings；
+# 编译好的地图按进程缓存在 Track 里，同一个 worker 跑后面的参数点时不再加载。
+_worker = {}
+
+
+def _init_sweep_worker(config, genomes: list, generations: int, seed: int):
+    _worker.update(config=config, genomes=genomes, generations=generations, seed=seed)
+
+
+def _run_point(settings: SimSettings) -> dict:
+    t0 = time.perf_counter()
+    if _worker["generations"] > 0:
+        result = train_settings(settings, _worker["config"], _worker["generations"], _worker["seed"])
+    else:
+        result = evaluate_settings(settings, _worker["genomes"], _worker["config"])
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+def run_sweep(variants: list, config, genomes: list = None, generations: int = 0, seed: int = None,
+              num_workers: int = 1):
+    """
+    按 variants 的顺序逐个产出 (settings, result)：
+        for settings, result in run_sweep(grid(SimSettings.from_env(), axes), config, genomes=pairs): ...
+    generations > 0 时每组参数从头训练（见 train_settings），否则评估 genomes（见 evaluate_settings）。
+    num_workers > 1 时多组参数并行，每个 worker 依次跑多组参数。
+    """
+    args = (config, genomes or [], generations, seed)
+    if num_workers <= 1:
+        _init_sweep_worker(*args)
+        for settings in variants:
+            yield settings, _run_point(settings)
+        return
+    with mp.Pool(min(num_workers, len(variants)), initializer=_init_sweep_worker, initargs=args) as pool:
+        yield from zip(variants, pool.imap(_run_point, variants))
+
+
+def describe(settings: SimSettings, names: list) -> str:
+    return "  ".join(f"{name}={getattr(settings, name)!r}" for name in names)
+
+
+def main():
+    from src.export import load_genomes
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("genomes", nargs="?", default=None, help="基因组 pkl，默认 topN_genomes.pkl，没有就 winner.pkl")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2,...", help="扫描的参数，可重复")
+    parser.add_argument("--map", default=None, help="默认 env_settings 的 MAP（起点等按 MAP_PROFILES）")
+    parser.add_argument("--top", type=int, default=20, help="评估前几个基因组")
+    parser.add_argument("--train", type=int, default=0, metavar="N", help="每组参数从头训练 N 代（不评估已有基因组）")
+    parser.add_argument("--seed", type=int, default=None, help="--train 时每组参数用同一个随机种子")
+    parser.add_argument("--config", default="config_modified.txt")
+    parser.add_argument("--workers", type=int, default=1, help="并行跑几组参数")
+    args = parser.parse_args()
+
+    base = SimSettings.from_env(**({"map": args.map} if args.map else {}))
+    axes = {}
+    for spec in args.set:
+        name, sep, values = spec.partition("=")
+        if name in ("accel_per_step", "brake_per_step"):
+            parser.error(f"--set {spec}: {name} 由 v_max / fps 推出，改扫 accel_seconds / brake_ratio")
+        if not sep or name not in SimSettings.__dataclass_fields__:
+            parser.error(f"--set {spec}: 应为 NAME=V1,V2,...，NAME 是 SimSettings 的字段")
+        axes[name] = parse_values(values)
+    variants = grid(base, axes)
+
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                                neat.DefaultStagnation, args.config)
+    pairs = []
+    if args.train <= 0:
+        path = args.genomes or ("topN_genomes.pkl" if os.path.exists("topN_genomes.pkl") else "winner.pkl")
+        pairs = [(g.key, g) for g in load_genomes(path)[:args.top]]
+        print(f"{path}: {len(pairs)} genomes x {len(variants)} settings")
+    else:
+        print(f"training {args.train} generations x {len(variants)} settings")
+
+    t0 = time.perf_counter()
+    for settings, result in run_sweep(variants, config, pairs, args.train, args.seed, args.workers):
+        if args.train > 0:
+            best = result["best"]
+            score = f"best {max(best):.2f} (last gen {best[-1]:.2f})" if best else "extinct"
+        else:
+            fitness = result["fitness"]
+            score = f"mean {sum(fitness) / len(fitness):.2f}  max {max(fitness):.2f}"
+        print(f"{describe(settings, list(axes))} | {score} | {result['seconds']:.1f} s")
+        if result["summary"] is not None:
+            print(f"  {format_summary(result['summary'])}")
+    print(f"{len(variants)} settings in {time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import numpy as np
+import pygame
+
+
+# ===================== 轨迹：环形缓冲 + 共享轨迹层 =====================
+# 原来 demo 给每辆车一张全屏 SRCALPHA 轨迹层（1920x1080x4 ≈ 8 MB / 辆），外加一个只增不减的 car.trail 列表，
+# 每帧还要把 N 张全屏层都 blit 一遍。这里改成：
+#   - 每辆车一段定长的 NumPy 环形缓冲（capacity 个点的坐标 + 颜色），写满后覆盖最旧的点，内存不随演示时长增长
+#   - 所有车共用一张轨迹层，每帧只把上次画到之后新增的线段画上去（通常每辆车一段），再整体 blit 一次
+# 轨迹层上已经画过的线不会因为缓冲覆盖而消失；clear / redraw 时按缓冲里还留着的点重画。
+#     trails = TrailRecorder(len(cars), (WIDTH, HEIGHT), colors=[car.color for car in cars])
+#     trails.record(i, car.center[0], car.center[1])          # 每步之后
+#     trails.draw(screen)                                     # 画新线段 + 贴到屏幕上
+
+
+class TrailRecorder:
+    """
+    n 辆车的轨迹。colors 为每辆车的默认颜色（RGB 或 RGBA），record 时也可以逐点指定颜色；
+    一条线段的颜色取它终点的颜色。
+    """
+
+    def __init__(self, n: int, size: tuple[int, int], capacity: int = 4096, width: int = 2, colors=None):
+        self.n = n
+        self.capacity = max(2, int(capacity))
+        self.width = width
+        self.points = np.zeros((n, self.capacity, 2), dtype=np.int32)
+        self.point_colors = np.zeros((n, self.capacity, 4), dtype=np.uint8)
+        self.count = np.zeros(n, dtype=np.int64)  # 每辆车累计记录过的点数（不回绕）
+        self.drawn = np.zeros(n, dtype=np.int64)  # 其中已经画到轨迹层上的点数
+        self.colors = np.full((n, 4), 255, dtype=np.uint8)
+        if colors is not None:
+            for i, color in enumerate(colors):
+                self.colors[i, :len(color)] = color
+        self.layer = pygame.Surface(size, pygame.SRCALPHA)
+        self._pending = set()  # 有新点、还没画的车
+
+    def record(self, i: int, x: float, y: float, color=None):
+        x, y = int(x), int(y)
+        count = self.count[i]
+        if count:
+            last = self.points[i, (count - 1) % self.capacity]
+            if last[0] == x and last[1] == y:
+                return  # 停住的车（跑完 / 撞墙前最后一帧）不重复记同一个点
+        k = count % self.capacity
+        self.points[i, k, 0] = x
+        self.points[i, k, 1] = y
+        if color is None:
+            self.point_colors[i, k] = self.colors[i]
+        else:
+            self.point_colors[i, k, :len(color)] = color
+            self.point_colors[i, k, len(color):] = 255
+        self.count[i] += 1
+        self._pending.add(i)
+
+    def points_of(self, i: int) -> np.ndarray:
+        """第 i 辆车缓冲里还留着的点，按时间先后，形状 (m, 2)。"""
+        count = int(self.count[i])
+        start = max(0, count - self.capacity)
+        return self.points[i, np.arange(start, count) % self.capacity]
+
+    def _draw_range(self, i: int, start: int, stop: int, rects: list):
+        """画第 i 辆车累计下标 [start, stop) 的点连成的线，画到的矩形追加到 rects；同色的一串点合成一次 draw.lines。"""
+        start = max(start, 0, int(self.count[i]) - self.capacity)
+        if stop - start < 2:
+            return
+        if stop - start == 2:
+            # 每帧的常见情况：只新增一段
+            a, b = start % self.capacity, (stop - 1) % self.capacity
+            points = self.points[i]
+            rects.append(pygame.draw.line(self.layer, self.point_colors[i, b].tolist(), points[a].tolist(),
+                                          points[b].tolist(), self.width))
+            return
+        slots = np.arange(start, stop) % self.capacity
+        points = self.points[i, slots].tolist()
+        colors = self.point_colors[i, slots]
+        # 线段 (k-1, k) 用点 k 的颜色：按颜色变化的位置切成若干串，相邻两串共用交界的点
+        changes = np.flatnonzero((colors[2:] != colors[1:-1]).any(axis=1)) + 1
+        bounds = [0, *changes.tolist(), len(points) - 1]
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            color = tuple(colors[b].tolist())
+            if b - a == 1:
+                rects.append(pygame.draw.line(self.layer, color, points[a], points[b], self.width))
+            else:
+                rects.append(pygame.draw.lines(self.layer, color, False, points[a:b + 1], self.width))
+
+    def update_layer(self) -> list:
+        """把上次之后新增的线段画到轨迹层上，返回画到的矩形（脏矩形渲染用）。"""
+        rects = []
+        for i in self._pending:
+            # 从上次画到的最后一个点接着连
+            self._draw_range(i, int(self.drawn[i]) - 1, int(self.count[i]), rects)
+            self.drawn[i] = self.count[i]
+        self._pending.clear()
+        return rects
+
+    def draw(self, surface: pygame.Surface):
+        self.update_layer()
+        surface.blit(self.layer, (0, 0))
+
+    def clear(self, i: int = None):
+        """清空第 i 辆车（None = 全部）的轨迹；轨迹层按其余车缓冲里的点重画。"""
+        if i is None:
+            self.count[:] = 0
+            self.drawn[:] = 0
+            self._pending.clear()
+        else:
+            self.count[i] = 0
+            self.drawn[i] = 0
+            self._pending.discard(i)
+        self.redraw()
+
+    def redraw(self):
+        """清空轨迹层，按缓冲里还留着的点全部重画。"""
+        self.layer.fill((0, 0, 0, 0))
+        rects = []
+        for i in range(self.n):
+            self._draw_range(i, 0, int(self.count[i]), rects)
+            self.drawn[i] = self.count[i]
+        self._pending.clear()
@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+# ===================== 异步渲染：仿真线程 + 快照队列 =====================
+# 同步模式下 仿真一步 -> 画一帧 -> clock.tick 交替进行，画得慢会拖慢物理，物理慢也会拖慢画面。
+# 异步模式（ASYNC_RENDER = True）：
+#   - 仿真在后台线程（SimulationThread）里跑：训练预览代不限速，demo 用 FramePacer 按 FPS 自己定速；
+#     每帧把一个很小的快照（各车左上角坐标、朝向、存活、颜色编号 + HUD 用的几个数）放进有界队列，
+#     队列满了丢最旧的，从不阻塞仿真
+#   - 主线程（pygame 的窗口和事件只能在主线程）按显示帧率取最新的快照画出来，落后时中间的快照直接跳过；
+#     demo 要画完整轨迹时用 keep_skipped=True，跳过的快照按顺序挂在下一个取到的快照的 "skipped" 里
+#   - 关掉预览窗口只是不再取快照，仿真照常跑完
+# 所以训练预览代不再被 FPS 卡住，结果也和无头模式完全一致。
+# 仿真线程和画面仍在同一个进程里抢 GIL：画车的时间会从仿真里扣掉，车越多越明显
+# （200 辆车时预览代比无头代慢 25%~45%，10 辆车时看不出差别）；窗口关掉之后就和无头代一样快。
+#     queue = SnapshotQueue(RENDER_QUEUE_SIZE)
+#     sim = SimulationThread(queue, run_headless, ..., on_frame=publish)
+#     sim.start()
+#     while not queue.done:
+#         snapshot = queue.latest(timeout=1 / FPS)
+#         if snapshot is not None: apply_snapshot(cars, snapshot); ...画...
+#     summary = sim.result()
+
+
+def make_snapshot(frame: float, x, y, angle, alive, index, **hud) -> dict:
+    """
+    一帧的画面状态。x / y 为车贴图左上角（与 Car.position 相同），index 为颜色 / 编号（genome key）；
+    数组都拷贝一份（float32），仿真线程之后原地改自己的数组不影响已经发出去的快照。
+    hud 为 HUD 要显示的标量（存活数、时间、圈数……）。
+    """
+    return dict(
+        frame=frame,
+        x=np.array(x, dtype=np.float32),
+        y=np.array(y, dtype=np.float32),
+        angle=np.array(angle, dtype=np.float32),
+        alive=np.array(alive, dtype=bool),
+        index=index,
+        hud=hud
+    )
+
+
+def apply_snapshot(cars: list, snapshot: dict):
+    """把快照里的位姿写到只用来画的 Car 上（和 CarBatch.write_back 一样只同步画车要用的字段）。"""
+    xs, ys, angles, alive = (snapshot[k].tolist() for k in ("x", "y", "angle", "alive"))
+    for k, car in enumerate(cars):
+        car.position[0] = xs[k]
+        car.position[1] = ys[k]
+        car.center[0] = xs[k] + car.car_size_x / 2
+        car.center[1] = ys[k] + car.car_size_y / 2
+        car.angle = angles[k]
+        car.alive = alive[k]
+        car.radar_count = 0  # 快照里没有雷达
+
+
+class SnapshotQueue:
+    """
+    仿真线程 publish、主线程 latest 的有界队列。
+    publish 从不阻塞：队列满了挤掉最旧的快照；latest 取最新的一个，更早的都算丢帧。
+    仿真结束时 close()；看的人关掉窗口时 stop()，之后 publish 直接丢弃（wants_frames 为 False，
+    仿真线程可以连快照都不做）。
+    keep_skipped=True 时跳过的快照不扔：latest 返回的快照里 "skipped" 为上次取到之后、这一个之前的全部快照
+    （按时间先后），用来补轨迹；否则 "skipped" 为空。
+    """
+
+    def __init__(self, maxsize: int = 2, keep_skipped: bool = False):
+        self._frames = deque(maxlen=max(1, int(maxsize)))
+        self.keep_skipped = keep_skipped
+        self._skipped = []
+        self._cond = threading.Condition()
+        self.closed = False
+        self.stopped = False
+        self.published = 0
+        self.shown = 0
+
+    @property
+    def wants_frames(self) -> bool:
+        return not self.stopped
+
+    @property
+    def done(self) -> bool:
+        """仿真结束且没有剩下的快照（或者已经不看了）。"""
+        return self.stopped or (self.closed and not self._frames)
+
+    @property
+    def dropped(self) -> int:
+        return self.published - self.shown
+
+    def publish(self, snapshot: dict):
+        if self.stopped:
+            return
+        with self._cond:
+            if self.keep_skipped and len(self._frames) == self._frames.maxlen:
+                self._skipped.append(self._frames[0])  # 马上要被挤掉的最旧快照
+            self._frames.append(snapshot)
+            self.published += 1
+            self._cond.notify()
+
+    def latest(self, timeout: float = None) -> dict:
+        """最新的快照；timeout 内没有新快照（或仿真已经结束）返回 None。"""
+        with self._cond:
+            if not self._frames and not self.closed and not self.stopped:
+                self._cond.wait(timeout)
+            if not self._frames:
+                return None
+            snapshot = self._frames.pop()
+            skipped = self._skipped + list(self._frames) if self.keep_skipped else []
+            self._frames.clear()
+            self._skipped = []
+            self.shown += 1
+            return dict(snapshot, skipped=skipped)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self.stopped = True
+            self._frames.clear()
+            self._skipped = []
+            self._cond.notify_all()
+
+
+class SimulationThread(threading.Thread):
+    """
+    后台跑 target(*args, **kwargs)，结束（或出异常）时 close 队列；
+    result() 等它跑完并返回 target 的返回值，异常在这里重新抛出。
+    """
+
+    def __init__(self, queue: SnapshotQueue, target, *args, **kwargs):
+        super().__init__(name="simulation", daemon=True)
+        self.queue = queue
+        self._target_fn = target
+        self._target_args = args
+        self._target_kwargs = kwargs
+        self._result = None
+        self._error = None
+
+    def run(self):
+        try:
+            self._result = self._target_fn(*self._target_args, **self._target_kwargs)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.queue.close()
+
+    def result(self):
+        self.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class FramePacer:
+    """
+    demo 的仿真线程按固定帧率推进（和画面快慢无关）；fps 为 None / 0 时不限速。
+    落后时不追帧，从现在重新计时。
+    """
+
+    def __init__(self, fps: float = None):
+        self.period = 1.0 / fps if fps else 0.0
+        self._next = time.perf_counter()
+
+    def wait(self):
+        if not self.period:
+            return
+        self._next += self.period
+        delay = self._next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            self._next = time.perf_counter()
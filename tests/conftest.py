@@ -0,0 +1,6 @@
+import os
+import sys
+
+# 测试不开窗口；仓库根目录放进 sys.path，和 python -m 一样按 src.xxx 导入
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,23 @@
+"""旋转贴图缓存：条目计数和按表（颜色）淘汰。"""
+import pygame
+
+from src.assets import RotatedSpriteCache
+
+
+def test_rotated_sprite_cache_counts_and_evicts_whole_tables():
+    sprites = [pygame.Surface((8, 8)) for _ in range(3)]
+    cache = RotatedSpriteCache(angle_step=90.0, max_entries=6)
+    for sprite in sprites[:2]:
+        for angle in (0, 90, 180):
+            cache.get(sprite, angle)
+    assert len(cache) == 6
+
+    cache.get(sprites[0], 0)    # sprites[0] 变成最近使用
+    cache.get(sprites[2], 270)  # 超出上限，丢掉最久没用的 sprites[1] 整张表
+    assert len(cache) == 4
+    assert cache.get(sprites[0], 90) is cache.get(sprites[0], 90)
+    assert len(cache) == sum(len(table) for table in cache._tables.values())
+
+    cache.evict(sprites[0])
+    cache.evict(sprites[0])  # 不在缓存里的表不再重复扣计数
+    assert len(cache) == 1
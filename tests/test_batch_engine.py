@@ -0,0 +1,123 @@
+"""批量引擎与逐个计算的对照：BatchNetwork vs FeedForwardNetwork.activate，CarBatch vs Car 的动力学 / 碰撞 / 雷达。"""
+import os
+import random
+
+import neat
+import numpy as np
+import pytest
+
+from src.batch_net import BatchNetwork
+from src.my_env import Car, CarBatch
+from src.settings import SimSettings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_config(feed_forward: bool = True):
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                                neat.DefaultStagnation, os.path.join(ROOT, "config_modified.txt"))
+    config.genome_config.feed_forward = feed_forward
+    return config
+
+
+def mutated_genomes(config, n: int, mutations: int, seed: int) -> list:
+    random.seed(seed)
+    genomes = []
+    for key in range(n):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        for _ in range(random.randint(0, mutations)):
+            genome.mutate(config.genome_config)
+        genomes.append(genome)
+    return genomes
+
+
+def assert_same_outputs(nets: list, seed: int, rows: int = 20):
+    batch = BatchNetwork(nets)
+    rng = np.random.default_rng(seed)
+    n_inputs = len(nets[0].input_nodes)
+    for _ in range(rows):
+        # 雷达输入是 int(距离 / 归一化)，取同样量级的整数，也混一些小数
+        inputs = np.where(rng.random((len(nets), n_inputs)) < 0.5,
+                          rng.integers(0, 15, (len(nets), n_inputs)),
+                          rng.normal(0.0, 3.0, (len(nets), n_inputs)))
+        alive = rng.random(len(nets)) < 0.8
+        out = batch.activate_batch(inputs, alive)
+        for i, net in enumerate(nets):
+            expected = net.activate(inputs[i].tolist()) if alive[i] else [0.0] * batch.n_outputs
+            np.testing.assert_allclose(out[i], expected, rtol=0.0, atol=1e-12)
+    return batch
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_batch_network_matches_activate(seed):
+    config = load_config()
+    genomes = mutated_genomes(config, 40, 30, seed)
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+    batch = assert_same_outputs(nets, seed)
+    assert len(batch.fallback) == 0
+    assert len(batch.groups) > 1  # 隐藏层数不同的网络分到不同的组
+
+
+def test_batch_network_folds_links_from_unevaluated_nodes():
+    # activate 里来源不是输入、也不是前面算过的节点的连接读 values 里的常量（有的 neat 版本会留下这种连接，
+    # 如指向不影响输出的节点）；手动加几条，值非零，看 BatchNetwork 是否把它们并进偏置
+    config = load_config()
+    genomes = mutated_genomes(config, 30, 30, seed=7)
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+    rng = np.random.default_rng(7)
+    for net in nets[::2]:
+        for j, (node, act, agg, bias, response, links) in enumerate(net.node_evals):
+            source = 10000 + j
+            net.values[source] = float(rng.normal())
+            net.node_evals[j] = (node, act, agg, bias, response, links + [(source, float(rng.normal()))])
+    batch = assert_same_outputs(nets, seed=7)
+    assert len(batch.fallback) == 0
+
+
+def test_batch_network_falls_back_for_unvectorized_nodes():
+    config = load_config()
+    genomes = mutated_genomes(config, 12, 20, seed=11)
+    # 输出节点一般都会被求值；聚合不是 sum / 激活没有向量化版本的网络逐个 activate
+    for genome in genomes[::3]:
+        genome.nodes[config.genome_config.output_keys[0]].aggregation = "max"
+    for genome in genomes[1::3]:
+        genome.nodes[config.genome_config.output_keys[1]].activation = "inv"
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+    batch = assert_same_outputs(nets, seed=11)
+    assert 0 < len(batch.fallback) < len(nets)
+
+
+@pytest.mark.parametrize("dt, substeps, swept", [(1.0, 1, False), (2.0, 3, True)])
+def test_batch_kinematics_match_single_car(dt, substeps, swept):
+    settings = SimSettings.from_env(sim_dt=dt, physics_substeps=substeps, swept_collision=swept)
+    track = settings.make_track()
+    car_kwargs = settings.car_kwargs()
+    n, steps = 24, 400
+    rng = np.random.default_rng(5)
+    cars = [Car(index=i, car_img=None, **car_kwargs) for i in range(n)]
+    batch = CarBatch(n, **car_kwargs)
+
+    steer = rng.uniform(-1.0, 1.0, n)
+    accel = rng.uniform(-1.0, 1.0, n)
+    for step in range(steps):
+        # 指令缓慢随机游走，车会转弯、加减速、陆续撞墙
+        steer = np.clip(steer + rng.normal(0.0, 0.2, n), -1.0, 1.0)
+        accel = np.clip(accel + rng.normal(0.0, 0.2, n), -1.0, 1.0)
+        alive = batch.alive.copy()
+        track.update_batch_kinematics(batch, steer, accel)
+        for i, car in enumerate(cars):
+            assert car.alive == alive[i]
+            if car.alive:
+                track.update_car_kinematics(car, float(steer[i]), float(accel[i]))
+
+        assert batch.alive.tolist() == [car.alive for car in cars]
+        np.testing.assert_allclose(batch.x, [car.position[0] for car in cars], rtol=0.0, atol=1e-9)
+        np.testing.assert_allclose(batch.y, [car.position[1] for car in cars], rtol=0.0, atol=1e-9)
+        np.testing.assert_allclose(batch.angle, [car.angle for car in cars], rtol=0.0, atol=1e-9)
+        np.testing.assert_allclose(batch.speed, [car.speed for car in cars], rtol=0.0, atol=1e-9)
+        np.testing.assert_allclose(batch.distance, [car.distance for car in cars], rtol=0.0, atol=1e-6)
+        assert batch.radar_dists.tolist() == [car.radar_dists for car in cars]
+        if not batch.alive.any():
+            break
+    assert step > 50 and not batch.alive.all()  # 跑了足够多步，也有车撞墙
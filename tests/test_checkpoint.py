@@ -0,0 +1,60 @@
+"""训练断点：3 代 + 断点续训 3 代和一口气跑 6 代结果一致；只保留最近 keep 个断点。"""
+import os
+import random
+
+import neat
+
+from src.checkpoint import TrainingCheckpointer, latest_checkpoint, list_checkpoints, restore_checkpoint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_config():
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                              neat.DefaultStagnation, os.path.join(ROOT, "config_modified.txt"))
+
+
+def evaluate(genomes, config):
+    # 不跑仿真，确定性的假 fitness 就够检查进化状态有没有完整恢复
+    for _, genome in genomes:
+        genome.fitness = sum(c.weight for c in genome.connections.values() if c.enabled) + len(genome.nodes)
+
+
+def snapshot(population: neat.Population) -> list:
+    return sorted((gid, sorted(g.nodes), sorted((k, c.weight) for k, c in g.connections.items()))
+                  for gid, g in population.population.items())
+
+
+def new_population(config) -> tuple[neat.Population, neat.StatisticsReporter]:
+    random.seed(7)
+    population = neat.Population(config)
+    stats = neat.StatisticsReporter()
+    population.add_reporter(stats)
+    return population, stats
+
+
+def test_resume_matches_uninterrupted_run(tmp_path):
+    population, _ = new_population(load_config())
+    population.run(evaluate, 6)
+    straight = snapshot(population), population.best_genome.key, population.generation
+
+    population, stats = new_population(load_config())
+    population.add_reporter(TrainingCheckpointer(population, stats, str(tmp_path), every_n_generations=3))
+    population.run(evaluate, 3)
+    path = latest_checkpoint(str(tmp_path))
+    assert os.path.basename(path) == "neat-checkpoint-3.pkl.gz"
+
+    random.seed(12345)  # 续训的随机状态来自断点，不受这里影响
+    resumed, _ = restore_checkpoint(path, load_config())
+    resumed.run(evaluate, 3)
+    assert (snapshot(resumed), resumed.best_genome.key, resumed.generation) == straight
+
+
+def test_prune_keeps_latest(tmp_path):
+    population, stats = new_population(load_config())
+    checkpointer = TrainingCheckpointer(population, stats, str(tmp_path), keep=2)
+    for generation in (1, 2, 10, 3):
+        checkpointer.save(generation)
+    assert [os.path.basename(p) for p in list_checkpoints(str(tmp_path))] == [
+        "neat-checkpoint-3.pkl.gz", "neat-checkpoint-10.pkl.gz"]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
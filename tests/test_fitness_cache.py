@@ -0,0 +1,78 @@
+"""fitness 缓存：键只看影响仿真的基因组内容和地图 / 参数；命中、LRU 淘汰、写盘后重新读回。"""
+import copy
+import os
+import random
+
+import neat
+import pytest
+
+from src.fitness_cache import FitnessCache, genome_fingerprint, settings_fingerprint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAPS = os.path.join(ROOT, "maps")
+
+
+@pytest.fixture(scope="module")
+def config():
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                              neat.DefaultStagnation, os.path.join(ROOT, "config_modified.txt"))
+
+
+def make_genomes(config, n: int, seed: int = 0) -> list:
+    random.seed(seed)
+    genomes = []
+    for key in range(n):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        genome.mutate(config.genome_config)
+        genomes.append((key, genome))
+    return genomes
+
+
+def test_genome_fingerprint_ignores_key_and_fitness(config):
+    (_, genome), = make_genomes(config, 1)
+    clone = copy.deepcopy(genome)
+    clone.key, clone.fitness = 999, 123.0
+    assert genome_fingerprint(clone) == genome_fingerprint(genome)
+
+    conn = next(iter(clone.connections.values()))
+    conn.weight += 1e-12
+    assert genome_fingerprint(clone) != genome_fingerprint(genome)
+    conn.weight -= 1e-12
+    conn.enabled = not conn.enabled
+    assert genome_fingerprint(clone) != genome_fingerprint(genome)
+
+
+def test_settings_fingerprint_uses_map_content_and_params(tmp_path):
+    copied = tmp_path / "same.png"
+    copied.write_bytes(open(os.path.join(MAPS, "map.png"), "rb").read())
+    base = settings_fingerprint([os.path.join(MAPS, "map.png")], fps=60, turn_exp=1.6)
+    assert settings_fingerprint([str(copied)], turn_exp=1.6, fps=60) == base  # 路径、参数顺序无关
+    assert settings_fingerprint([os.path.join(MAPS, "map2.png")], fps=60, turn_exp=1.6) != base
+    assert settings_fingerprint([str(copied)], fps=60, turn_exp=1.2) != base
+
+
+def test_hits_eviction_and_persistence(config, tmp_path):
+    path = tmp_path / "fitness.tsv"
+    genomes = make_genomes(config, 6)
+    cache = FitnessCache("ctx", capacity=4, path=str(path))
+    assert cache.apply(genomes) == genomes and cache.misses == 6
+    for gid, genome in genomes:
+        genome.fitness = float(gid) + 0.5
+    cache.update(genomes)
+    assert len(cache) == 4  # LRU：最早的两个被挤掉
+
+    fresh = copy.deepcopy(genomes)
+    for _, genome in fresh:
+        genome.fitness = None
+    todo = cache.apply(fresh)
+    assert [gid for gid, _ in todo] == [0, 1]
+    assert [g.fitness for _, g in fresh[2:]] == [2.5, 3.5, 4.5, 5.5]
+    assert (cache.hits, cache.misses) == (4, 8)
+
+    # 另一个参数指纹下全部不命中；重新打开同一个文件能读回全部结果
+    assert len(FitnessCache("other", capacity=10, path=str(path)).apply(fresh)) == 6
+    reloaded = FitnessCache("ctx", capacity=10, path=str(path))
+    assert len(reloaded) == 6 and reloaded.get(genomes[0][1]) == 0.5
+
+    assert FitnessCache("ctx", capacity=0).apply(genomes) == genomes
@@ -0,0 +1,64 @@
+"""地图编译缓存：第二次直接读产物；PNG 改了自动重编，旧目录删掉；--force / 版本号变了也重编。"""
+import os
+
+import numpy as np
+import pygame
+
+from src import map_compiler
+from src.map_compiler import compile_map
+
+BORDER = (255, 255, 255, 255)
+
+
+def save_map(path, wall_x: int):
+    surface = pygame.Surface((40, 30))
+    surface.fill((0, 0, 0))
+    pygame.draw.rect(surface, BORDER, (wall_x, 0, 3, 30))
+    pygame.image.save(surface, str(path))
+
+
+def cache_dirs(cache):
+    return sorted(name for name in os.listdir(cache) if not name.endswith(".tmp"))
+
+
+def test_cache_reused_then_invalidated_when_png_changes(tmp_path, monkeypatch):
+    png, cache = tmp_path / "track.png", tmp_path / "cache"
+    save_map(png, 10)
+    first = compile_map(str(png), BORDER, str(cache))
+    assert first.wall_mask[11, 5] and not first.wall_mask[20, 5]
+    assert cache_dirs(cache) == [os.path.basename(first.directory)]
+
+    # 没改：直接内存映射已有产物，不重新解码 PNG
+    monkeypatch.setattr(pygame.image, "load", lambda *a: (_ for _ in ()).throw(AssertionError("recompiled")))
+    again = compile_map(str(png), BORDER, str(cache))
+    assert again.directory == first.directory
+    np.testing.assert_array_equal(again.wall_dist, first.wall_dist)
+    monkeypatch.undo()
+
+    # 改了 PNG：新目录、新内容，旧目录删掉
+    save_map(png, 20)
+    changed = compile_map(str(png), BORDER, str(cache))
+    assert changed.directory != first.directory
+    assert changed.wall_mask[21, 5] and not changed.wall_mask[11, 5]
+    assert cache_dirs(cache) == [os.path.basename(changed.directory)]
+
+    # 边界色不同是另一份产物，互不影响
+    other = compile_map(str(png), (0, 0, 0, 255), str(cache))
+    assert other.directory != changed.directory and len(cache_dirs(cache)) == 2
+
+
+def test_force_and_format_version_recompile(tmp_path, monkeypatch):
+    png, cache = tmp_path / "track.png", tmp_path / "cache"
+    save_map(png, 10)
+    first = compile_map(str(png), BORDER, str(cache))
+
+    loads = []
+    load = pygame.image.load
+    monkeypatch.setattr(pygame.image, "load", lambda *a: loads.append(a) or load(*a))
+    forced = compile_map(str(png), BORDER, str(cache), force=True)
+    assert forced.directory == first.directory and len(loads) == 1
+
+    monkeypatch.setattr(map_compiler, "FORMAT_VERSION", map_compiler.FORMAT_VERSION + 1)
+    bumped = compile_map(str(png), BORDER, str(cache))
+    assert bumped.directory != first.directory
+    assert cache_dirs(cache) == [os.path.basename(bumped.directory)]
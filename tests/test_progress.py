@@ -0,0 +1,66 @@
+"""进度场 / 圈数：在合成的环形赛道上绕圈，检查一圈长、圈数、倒着跨线和跑完判定；起跑线切不断赛道时编译报错。"""
+import math
+
+import numpy as np
+import pytest
+
+from src.map_compiler import _check_lap
+from src.progress import LapTracker, ProgressIndex, build_progress_field
+
+SIZE, CENTER, INNER, OUTER = 200, 100, 40, 80
+START = (CENTER + 60, CENTER)  # 环的右侧，朝上（航向 90°）逆时针跑
+
+
+def ring(island: bool = False) -> np.ndarray:
+    x, y = np.meshgrid(np.arange(SIZE), np.arange(SIZE), indexing="ij")
+    r = np.hypot(x - CENTER, y - CENTER)
+    wall = (r < INNER) | (r > OUTER)
+    if island:
+        # 起跑线右侧的小岛：起跑线走到岛上就停了，岛和外墙之间留着缺口
+        wall[CENTER + 66:CENTER + 70, CENTER - 2:CENTER + 3] = True
+    return wall
+
+
+def on_ring(turns: float) -> tuple[float, float]:
+    """从起点沿环逆时针（屏幕上 y 向下，所以角度取负）转 turns 圈后的位置。"""
+    a = -2 * math.pi * turns
+    return CENTER + 60 * math.cos(a), CENTER + 60 * math.sin(a)
+
+
+def test_progress_field_lap_length_matches_ring():
+    wall = ring()
+    dist, lap_length = build_progress_field(wall, START, 90)
+    # 最短路贴着内墙（周长约 251 px），棋盘距离在 周长/√2 和 周长 之间
+    assert 2 * math.pi * INNER / math.sqrt(2) <= lap_length <= 2 * math.pi * INNER + 8
+    _check_lap(dist, lap_length, START)
+
+    index = ProgressIndex.from_dist(dist, lap_length)
+    quarter = index.lookup(*map(int, on_ring(0.25)))
+    assert 0.2 < quarter < 0.3
+
+
+def test_lap_tracker_counts_laps_and_finishes():
+    dist, lap_length = build_progress_field(ring(), START, 90)
+    index = ProgressIndex.from_dist(dist, lap_length)
+    laps = LapTracker(index, 2, *START, target_laps=2, n_sectors=4)
+    idx = np.arange(2)
+    finished_at = None
+    for step in range(1, 401):
+        forward, backward = on_ring(step / 100), on_ring(-step / 400)
+        _, finished = laps.update(idx, [forward[0], backward[0]], [forward[1], backward[1]], [step, step])
+        if finished[0]:
+            finished_at = step
+            break
+    assert finished_at is not None and 195 <= finished_at <= 205
+    assert laps.laps_done.tolist() == [2, 0]
+    assert laps.finished.tolist() == [True, False]
+    # 倒着跨过起跑线算 -1 圈，best 不会因此变大
+    assert laps.progress[1] < 0 and laps.best[1] < 0.05
+    assert len(laps.lap_times(0)) == 2 and len(laps.sector_times(0)) == 8
+
+
+def test_compiler_rejects_start_line_that_does_not_cut_track():
+    dist, lap_length = build_progress_field(ring(island=True), START, 90)
+    assert lap_length < 50  # 从缺口直接绕到起跑线后面
+    with pytest.raises(ValueError, match="does not cut the track"):
+        _check_lap(dist, lap_length, START)
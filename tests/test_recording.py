@@ -0,0 +1,99 @@
+"""轨迹文件：写进去的每一帧原样读回来（压缩 / 不压缩、跨块、没写完的 .tmp）；录一局仿真和 CarBatch 的状态一致。"""
+import os
+
+import neat
+import numpy as np
+import pytest
+
+from src.recording import FIELDS, TrajectoryReader, TrajectoryWriter
+from src.settings import SimSettings
+from src.simulation import build_population, run_headless
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def random_frames(n_frames: int, n: int, seed: int = 0) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(n_frames):
+        frame = {}
+        for name, dtype in FIELDS:
+            values = rng.random(n) < 0.7 if dtype == "|b1" else rng.uniform(-500, 1500, n)
+            frame[name] = np.asarray(values).astype(dtype)  # 先转成存储类型，读回来应逐位相同
+        frames.append(frame)
+    return frames
+
+
+def write(path, frames, n, **kwargs) -> TrajectoryWriter:
+    writer = TrajectoryWriter(str(path), n, dt=2.0, index=range(10, 10 + n), chunk_frames=7, map="maps/x.png",
+                              **kwargs)
+    for frame in frames:
+        writer.append(*(frame[name] for name, _ in FIELDS))
+    return writer
+
+
+@pytest.mark.parametrize("compress", [0, 6])
+def test_round_trip(tmp_path, compress):
+    frames = random_frames(30, 5)
+    path = tmp_path / "run.traj"
+    write(path, frames, 5, compress=compress).close()
+
+    with TrajectoryReader(str(path), cache_chunks=2) as reader:
+        assert (len(reader), reader.n, reader.dt, reader.index) == (30, 5, 2.0, [10, 11, 12, 13, 14])
+        assert reader.header["map"] == "maps/x.png" and len(reader.chunk_starts) == 5  # 4 块满的 + 最后 2 帧
+        for k in (29, 0, 13, 7, 6):  # 乱序访问，超出块缓存
+            for name, _ in FIELDS:
+                np.testing.assert_array_equal(reader.frame(k)[name], frames[k][name])
+        part = reader.slice(5, 23)
+        for name, _ in FIELDS:
+            np.testing.assert_array_equal(part[name], np.stack([f[name] for f in frames[5:23]]))
+        assert reader.frame_at(8.0) == 3
+        snapshot = reader.snapshot(3)
+        assert snapshot["frame"] == 8.0
+        np.testing.assert_array_equal(snapshot["alive"], frames[3]["alive"] | frames[3]["finished"])
+        with pytest.raises(IndexError):
+            reader.frame(30)
+
+
+def test_unfinished_file_reads_complete_chunks(tmp_path):
+    frames = random_frames(20, 3, seed=1)
+    path = tmp_path / "run.traj"
+    writer = write(path, frames, 3)
+    writer._file.flush()  # 中途被杀掉：只有 .tmp，没有索引，最后 6 帧还在缓冲里
+    try:
+        with TrajectoryReader(writer._tmp_path) as reader:
+            assert len(reader) == 14
+            np.testing.assert_array_equal(reader.frame(13)["x"], frames[13]["x"])
+    finally:
+        writer.close()
+
+
+def test_recorded_run_matches_batch(tmp_path):
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                                neat.DefaultStagnation, os.path.join(ROOT, "config_modified.txt"))
+    genomes = []
+    for key in range(4):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        genomes.append((key, genome))
+    settings = SimSettings.from_env(map=os.path.join(ROOT, "maps", "K1_Real.png"), track_cache_dir=None)
+    track = settings.make_track()
+    nets, batch, _ = build_population(genomes, config, settings.car_kwargs())
+
+    path = tmp_path / "run.traj"
+    states = []
+
+    def record(counter, still_alive, laps):
+        writer.append_batch(batch)
+        states.append((batch.x.astype(np.float32), batch.angle.astype(np.float32), batch.alive.copy()))
+
+    with TrajectoryWriter(str(path), batch.n, dt=track.dt, index=[k for k, _ in genomes]) as writer:
+        run_headless(track, batch, nets, genomes, settings.input_normalization_denominator, settings.speed_norm,
+                     max_frames=300, on_frame=record)
+    with TrajectoryReader(str(path)) as reader:
+        assert len(reader) == len(states) > 0
+        for k, (x, angle, alive) in enumerate(states):
+            frame = reader.frame(k)
+            np.testing.assert_array_equal(frame["x"], x)
+            np.testing.assert_array_equal(frame["angle"], angle)
+            np.testing.assert_array_equal(frame["alive"], alive)
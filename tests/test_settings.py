@@ -0,0 +1,109 @@
+"""SimSettings / 参数扫描：派生参数跟着 v_max / fps 变，换地图带上地图相关字段，Track 用的就是这组参数，扫描结果和单独评估一致。"""
+import copy
+import os
+import random
+
+import neat
+import pytest
+
+import env_settings as env
+from src.my_env import Track
+from src.settings import SimSettings
+from src.sweep import evaluate_settings, grid, parse_values, run_sweep
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+K1 = os.path.join("maps", "K1_Real.png")
+MAP3 = os.path.join("maps", "map3.png")
+
+
+@pytest.fixture(scope="module")
+def config():
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                              neat.DefaultStagnation, os.path.join(ROOT, "config_modified.txt"))
+
+
+@pytest.fixture(autouse=True)
+def in_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+
+def test_from_env_matches_env_settings():
+    settings = SimSettings.from_env()
+    assert settings.map == env.MAP
+    assert settings.accel_per_step == pytest.approx(env.ACCEL_PER_STEP)
+    assert settings.brake_per_step == pytest.approx(env.BRAKE_PER_STEP)
+    assert settings.max_frames == env.FPS * env.MAX_SIM_SECONDS
+    assert settings.car_kwargs()["start_position"] == list(env.START_POSITION)
+
+
+def test_accel_and_brake_follow_v_max_and_fps():
+    base = SimSettings.from_env()
+    faster = base.replace(v_max=base.v_max * 2)
+    assert faster.accel_per_step == pytest.approx(base.accel_per_step * 2)
+    assert faster.brake_per_step == pytest.approx(base.brake_per_step * 2)
+
+    smoother = base.replace(fps=base.fps * 2)
+    assert smoother.accel_per_step == pytest.approx(base.accel_per_step / 2)
+    assert smoother.track_kwargs()["accel_per_step"] == smoother.accel_per_step
+    assert base.accel_per_step == pytest.approx(env.ACCEL_PER_STEP)  # 原对象不变
+
+
+def test_for_map_swaps_profile_fields():
+    base = SimSettings.from_env(map=K1)
+    other = base.for_map(MAP3)
+    profile = env.map_profile(MAP3)
+    assert other.map == MAP3
+    assert other.start_position == tuple(profile["start_position"])
+    assert other.starting_angle == profile["starting_angle"]
+    assert other.radar_max_len == profile["radar_max_len"]
+    assert other.input_normalization_denominator == profile["input_normalization_denominator"]
+    assert other.turn_exp == base.turn_exp
+    assert SimSettings.from_env(map=MAP3) == other
+
+
+def test_track_uses_settings_dynamics():
+    settings = SimSettings.from_env(v_max=6.0, alpha_steer=0.25, sim_dt=1.0, physics_substeps=1)
+    track = settings.make_track()
+    assert track.accel_per_step == settings.accel_per_step
+    assert track.brake_per_step == settings.brake_per_step
+    assert track.alpha_steer == 0.25
+
+    kwargs = settings.track_kwargs()
+    del kwargs["accel_per_step"]
+    with pytest.raises(TypeError):
+        Track(headless=True, **kwargs)
+
+
+def test_parse_values():
+    assert parse_values("1.2, 1.6,2") == [1.2, 1.6, 2]
+    assert parse_values("progress,speed") == ["progress", "speed"]
+    assert parse_values("True,0") == [True, 0]
+
+
+def test_grid_is_cartesian_product_with_map_axis():
+    base = SimSettings.from_env(map=K1)
+    variants = grid(base, {"map": [K1, MAP3], "turn_exp": [1.2, 2.0], "v_max": [4.0]})
+    assert [(s.map, s.turn_exp, s.v_max) for s in variants] == [
+        (K1, 1.2, 4.0), (K1, 2.0, 4.0), (MAP3, 1.2, 4.0), (MAP3, 2.0, 4.0)
+    ]
+    assert variants[2].start_position == base.for_map(MAP3).start_position
+    assert grid(base, {}) == [base]
+
+
+def test_sweep_matches_direct_evaluation(config):
+    random.seed(0)
+    genomes = []
+    for key in range(4):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        genome.mutate(config.genome_config)
+        genomes.append((key, genome))
+
+    base = SimSettings.from_env(map=K1, max_sim_seconds=3, track_cache_dir=None)
+    variants = grid(base, {"turn_exp": [1.2, 2.0], "alpha_steer": [0.2, 0.8]})
+    results = list(run_sweep(variants, config, genomes=copy.deepcopy(genomes)))
+    assert [settings for settings, _ in results] == variants
+    for settings, result in results:
+        direct = evaluate_settings(settings, copy.deepcopy(genomes), config)
+        assert result["fitness"] == direct["fitness"]
+        assert result["summary"]["frames"] == direct["summary"]["frames"]
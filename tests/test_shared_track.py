@@ -0,0 +1,54 @@
+"""共享内存里的赛道数据：worker 挂上后和主进程的数组一致、只读，且不向 resource_tracker 重复登记。"""
+import multiprocessing
+from multiprocessing import resource_tracker
+
+import numpy as np
+import pytest
+
+from src.map_compiler import CompiledMap
+from src.progress import ProgressIndex
+from src.shared_track import SharedTrackData, attach_shared_track
+
+
+def compiled_map() -> CompiledMap:
+    wall = np.zeros((30, 20), dtype=bool)
+    wall[10, :15] = True
+    dist = np.arange(600, dtype=np.int32).reshape(30, 20)
+    compiled = CompiledMap("track.png", "sha1", (255, 255, 255, 255), wall, dist)
+    fraction = np.linspace(0, 1, 600, endpoint=False, dtype=np.float32).reshape(30, 20)
+    centerline = np.arange(40, dtype=np.int32).reshape(20, 2)
+    compiled.progress_indexes[((5, 5), 180.0)] = ProgressIndex(fraction, 123, centerline, np.array([0, 41, 82]))
+    return compiled
+
+
+def wall_dist_sum(handle: dict) -> int:
+    compiled = attach_shared_track(handle)  # 数组只在 CompiledMap（持有共享内存块）活着时有效
+    return int(compiled.wall_dist.sum())
+
+
+def test_attach_round_trip(monkeypatch):
+    original = compiled_map()
+    with SharedTrackData(original) as shared:
+        registered = []
+        monkeypatch.setattr(resource_tracker, "register", lambda name, rtype: registered.append(name))
+        attached = attach_shared_track(shared.handle)
+        assert registered == []  # 主进程登记过了，挂上的一方不再登记
+
+        np.testing.assert_array_equal(attached.wall_mask, original.wall_mask)
+        np.testing.assert_array_equal(attached.wall_dist, original.wall_dist)
+        with pytest.raises(ValueError):
+            attached.wall_dist[0, 0] = 1
+        index = attached.progress_indexes[((5, 5), 180.0)]
+        expected = original.progress_indexes[((5, 5), 180.0)]
+        assert index.lap_length == 123
+        np.testing.assert_array_equal(index.fraction, expected.fraction)
+        np.testing.assert_array_equal(index.centerline, expected.centerline)
+        assert index.checkpoints.tolist() == [0, 41, 82]
+        del attached, index
+    assert shared.nbytes == 0
+
+
+def test_workers_read_shared_arrays():
+    original = compiled_map()
+    with SharedTrackData(original) as shared, multiprocessing.Pool(2) as pool:
+        assert pool.map(wall_dist_sum, [shared.handle] * 4) == [int(original.wall_dist.sum())] * 4
@@ -0,0 +1,57 @@
+"""停滞检测和分片统计的合并。"""
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.simulation import StallMonitor, merge_summaries
+
+
+def make_batch(n: int):
+    # StallMonitor 只用到车中心和 alive / stalled 标记
+    return SimpleNamespace(n=n, center_x=np.zeros(n), center_y=np.zeros(n),
+                           alive=np.ones(n, dtype=bool), stalled=np.zeros(n, dtype=bool))
+
+
+def test_stall_monitor_removes_cars_that_stay_inside_radius():
+    batch = make_batch(3)
+    monitor = StallMonitor(batch, window_frames=10, radius_px=50.0)
+    for frame in range(1, 21):
+        batch.center_x[0] = 10.0 * frame                # 一直往前走
+        batch.center_x[1] = 30.0 * np.cos(frame)        # 原地转圈
+        batch.center_y[1] = 30.0 * np.sin(frame)
+        batch.center_x[2] = 60.0 if frame == 5 else 0.0  # 窗口内走出过半径又回来，不算停滞
+        stalled = monitor.update(batch)
+        if frame == 10:
+            assert stalled == 1
+    assert batch.alive.tolist() == [True, False, False]
+    assert batch.stalled.tolist() == [False, True, True]
+
+
+def test_stall_monitor_disabled_and_fractional_frames():
+    batch = make_batch(1)
+    assert StallMonitor(batch, window_frames=0, radius_px=50.0).update(batch, frames=100) == 0
+    monitor = StallMonitor(batch, window_frames=10, radius_px=50.0)
+    assert sum(monitor.update(batch, frames=2.5) for _ in range(3)) == 0
+    assert monitor.update(batch, frames=2.5) == 1
+    assert batch.stalled[0]
+
+
+def summary(cars, frames, frames_saved, **counts):
+    return dict(dict(cars=cars, frames=frames, crashed=0, stalled=0, finished=0, stalled_car_frames=0,
+                     frames_saved=frames_saved, best_progress=None, best_lap_frames=None, seconds=1.0), **counts)
+
+
+def test_merge_two_early_shards_saves_frames_once():
+    shards = [summary(5, 300, 700, stalled=5, stalled_car_frames=40),
+              summary(4, 450, 550, stalled=3, crashed=1, best_progress=0.4, best_lap_frames=None)]
+    merged = merge_summaries(shards, seconds=2.0, max_frames=1000)
+    assert merged["frames"] == 450
+    assert merged["frames_saved"] == 550
+    assert (merged["cars"], merged["stalled"], merged["crashed"], merged["stalled_car_frames"]) == (9, 8, 1, 40)
+    assert merged["best_progress"] == 0.4
+    assert merged["seconds"] == 2.0
+
+
+def test_merge_with_a_full_length_shard_saves_nothing():
+    shards = [summary(5, 300, 700), summary(4, 1000, 0)]
+    assert merge_summaries(shards, seconds=2.0, max_frames=1000)["frames_saved"] == 0
@@ -0,0 +1,35 @@
+"""异步渲染的快照队列：只取最新的一个；keep_skipped 时跳过的快照按顺序跟着下一个快照交出来。"""
+from src.viewer import SnapshotQueue, make_snapshot
+
+
+def snapshot(frame: int) -> dict:
+    return make_snapshot(frame, [frame], [0.0], [0.0], [True], [0])
+
+
+def test_latest_drops_older_snapshots():
+    queue = SnapshotQueue(2)
+    for frame in range(5):
+        queue.publish(snapshot(frame))
+    latest = queue.latest(timeout=0)
+    assert latest["frame"] == 4 and latest["skipped"] == []
+    assert queue.latest(timeout=0) is None
+    assert (queue.published, queue.shown, queue.dropped) == (5, 1, 4)
+
+
+def test_keep_skipped_returns_every_frame_in_order():
+    queue = SnapshotQueue(2, keep_skipped=True)
+    seen = []
+    for frame in range(7):
+        queue.publish(snapshot(frame))
+        if frame in (4, 5):
+            latest = queue.latest(timeout=0)
+            seen += [s["frame"] for s in latest["skipped"]] + [latest["frame"]]
+    queue.close()
+    latest = queue.latest(timeout=0)
+    seen += [s["frame"] for s in latest["skipped"]] + [latest["frame"]]
+    assert seen == list(range(7))
+    assert queue.done
+
+    queue.publish(snapshot(7))
+    queue.stop()
+    assert queue.latest(timeout=0) is None and queue._skipped == []